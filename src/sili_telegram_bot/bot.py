@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 
+import asyncio
 import datetime
 from telegram import Update, User, error
 from telegram.constants import ParseMode
@@ -14,19 +15,23 @@ import sili_telegram_bot.dota_api as dota_api
 import json
 import logging
 import random
-import os
 
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.jobstores.memory import MemoryJobStore
 from apscheduler.triggers import date, interval
 from dataclasses import asdict
 
+from sili_telegram_bot.models.audio_cache import default_audio_cache
 from sili_telegram_bot.models.inline_whitelist import (
     default_whitelist as INLINE_WHITELIST,
 )
 from sili_telegram_bot.models.message import Message
 from sili_telegram_bot.models.patch_checker import PatchChecker
-from sili_telegram_bot.models.responses import parse_voiceline_args, Responses
+from sili_telegram_bot.models.response_store import get_voiceline_link
+from sili_telegram_bot.models.response_usage import default_response_usage
+from sili_telegram_bot.models.responses import parse_voiceline_args
+from sili_telegram_bot.models.search_executor import default_search_executor
+from sili_telegram_bot.models.voice_file_cache import default_voice_file_cache
 from sili_telegram_bot.models.birthdays import Birthdays
 from sili_telegram_bot.modules.config import config
 from sili_telegram_bot.modules.voiceline_inline import (
@@ -36,6 +41,9 @@ from sili_telegram_bot.modules.voiceline_inline import (
 from sili_telegram_bot.modules.voiceline_scraping import get_response_data
 
 RESOURCE_CONFIG = config["static_resources"]
+VL_CONFIG = config["voicelines"]
+DYNAMIC_CONFIG = config["dynamic_resources"]
+WARM_UP_CONFIG = config["audio_warm_up"]
 SECRETS = config["secrets"]
 
 CHAT_ID_FILTER = filters.Chat(int(SECRETS["chat_id"]))
@@ -46,11 +54,33 @@ logger = logging.getLogger(__name__)
 patch_checker = PatchChecker()
 
 
+def save_voiceline_data() -> None:
+    """
+    Write changed voiceline file ids and usage counts to disk.
+    """
+    default_voice_file_cache.save()
+    default_response_usage.save()
+
+
+async def save_voiceline_data_job(context: CallbackContext) -> None:
+    save_voiceline_data()
+
+
+async def shut_down_voicelines(application: Application) -> None:
+    await default_audio_cache.aclose()
+    save_voiceline_data()
+
+
 def get_app(bot_token: str) -> Application:
     """
     Build and return a telegram Application.
     """
-    return Application.builder().token(bot_token).build()
+    return (
+        Application.builder()
+        .token(bot_token)
+        .post_shutdown(shut_down_voicelines)
+        .build()
+    )
 
 
 def get_punlines(punline_path: str) -> dict:
@@ -162,9 +192,7 @@ async def voiceline(update: Update, context: CallbackContext) -> None:
         return None
 
     try:
-        responses = Responses()
-
-        vl_link = responses.get_link(**voiceline_args)
+        vl_link = await default_search_executor.run(get_voiceline_link, voiceline_args)
 
     except Exception as e:
         entity = voiceline_args["entity"]
@@ -177,38 +205,106 @@ async def voiceline(update: Update, context: CallbackContext) -> None:
 
         return None
 
-    vl_file_path = responses.download_mp3(vl_link)
-
+    # Delete /voiceline to make conversation more seamless
     try:
-        # Delete /voiceline to make conversation more seamless
+        await context.bot.delete_message(
+            chat_id=SECRETS["chat_id"],
+            message_id=update.message.message_id,
+        )
+    except error.BadRequest as e:
+        logger.error(
+            f"Error attempting to delete message: {e}. Likely "
+            f"insufficient permissions for the bot in this chat. Try "
+            f"giving it the `can_delete_messages` permission. See "
+            f"<https://docs.python-telegram-bot.org/en/stable/telegram.bot.html#telegram.Bot.delete_message> "
+            f"for more info."
+        )
+
+    sender_name = user_to_representation(update.message.from_user)
+
+    await context.bot.send_message(chat_id=SECRETS["chat_id"], text=sender_name + ":")
+    await send_voiceline(context, vl_link)
+    default_response_usage.record(vl_link)
+
+    logger.info("... voiceline delivered.")
+
+
+async def send_voiceline(context: CallbackContext, vl_link: str) -> None:
+    """
+    Send the voiceline at vl_link to the chat. Voicelines sent before are sent by
+    their Telegram file id, and ones in the audio cache are uploaded from there.
+    Others are, depending on the configured send mode, either handed to Telegram by
+    URL, or downloaded and uploaded. Uploading is also the fallback if Telegram can't
+    get a voiceline from its URL. Either way, the file id is remembered.
+    """
+    voice_file_id = default_voice_file_cache.get(vl_link)
+
+    if voice_file_id is not None:
         try:
-            await context.bot.delete_message(
-                chat_id=SECRETS["chat_id"],
-                message_id=update.message.message_id,
+            await context.bot.send_voice(
+                chat_id=SECRETS["chat_id"], voice=voice_file_id
             )
+
+            return None
+
         except error.BadRequest as e:
-            logger.error(
-                f"Error attempting to delete message: {e}. Likely "
-                f"insufficient permissions for the bot in this chat. Try "
-                f"giving it the `can_delete_messages` permission. See "
-                f"<https://docs.python-telegram-bot.org/en/stable/telegram.bot.html#telegram.Bot.delete_message> "
-                f"for more info."
+            logger.warning(
+                f"Telegram no longer accepts the file id of '{vl_link}': {e}. "
+                f"Uploading it again..."
             )
+            default_voice_file_cache.remove(vl_link)
 
-        sender_name = user_to_representation(update.message.from_user)
+    # Cached files are opened right away, so they can't be evicted in the meantime.
+    voice_file = default_audio_cache.open_cached_file(vl_link)
+    message = None
 
-        await context.bot.send_message(
-            chat_id=SECRETS["chat_id"], text=sender_name + ":"
-        )
-        await context.bot.send_voice(
-            chat_id=SECRETS["chat_id"],
-            voice=open(vl_file_path, "rb"),
-        )
-
-        logger.info("... voiceline delivered.")
+    try:
+        if voice_file is None and VL_CONFIG["send_mode"] == "url":
+            try:
+                message = await context.bot.send_voice(
+                    chat_id=SECRETS["chat_id"], voice=vl_link
+                )
+
+            except error.BadRequest as e:
+                logger.warning(
+                    f"Telegram could not send '{vl_link}' by URL: {e}. Uploading it..."
+                )
+
+        if message is None:
+            if voice_file is None:
+                voice_file = await default_audio_cache.open_file(vl_link)
+
+            message = await context.bot.send_voice(
+                chat_id=SECRETS["chat_id"], voice=voice_file
+            )
 
     finally:
-        os.remove(vl_file_path)
+        if voice_file is not None:
+            voice_file.close()
+
+    if message.voice is not None:
+        default_voice_file_cache.put(vl_link, message.voice.file_id)
+
+
+async def warm_up_audio_cache(context: CallbackContext) -> None:
+    """
+    Prefetch the most used voicelines into the audio cache, within the configured
+    download budget. Voicelines telegram already has a file id for are sent without
+    downloading them, so they are skipped in favor of the next most used ones.
+    """
+    n_responses = int(WARM_UP_CONFIG["n_responses"])
+    popular_links = [
+        link
+        for link in default_response_usage.top(len(default_response_usage))
+        if default_voice_file_cache.get(link) is None
+    ][:n_responses]
+    logger.info(f"Warming up audio cache with {len(popular_links)} voicelines...")
+
+    n_bytes = await default_audio_cache.prefetch(
+        popular_links, max_bytes=int(WARM_UP_CONFIG["max_bytes"])
+    )
+
+    logger.info(f"... audio cache warmed up, downloaded {n_bytes} bytes.")
 
 
 async def crawl(update: Update, context: CallbackContext):
@@ -329,6 +425,30 @@ def update_response_data() -> None:
     """
     get_response_data()
     LazyResponseDict.update_full_response_dict()
+    default_search_executor.reset()
+
+
+async def refresh_response_data(context: CallbackContext) -> None:
+    """
+    Update the response data without blocking the bot, then warm up the audio cache.
+    Runs in the telegram job queue, so the warm-up is started on the bot's event loop.
+    """
+    await asyncio.get_running_loop().run_in_executor(None, update_response_data)
+
+    # Voicelines might have moved, so check the popular ones again.
+    await warm_up_audio_cache(context)
+
+
+def next_patch_day() -> datetime.date:
+    """
+    Get the date of the next thursday, today included.
+    """
+    today_weekday = datetime.date.today().isoweekday()
+    thursday_weekday = 4
+
+    return datetime.date.today() + datetime.timedelta(
+        days=(thursday_weekday - today_weekday) % 7
+    )
 
 
 def get_and_config_scheduler() -> BackgroundScheduler:
@@ -339,24 +459,13 @@ def get_and_config_scheduler() -> BackgroundScheduler:
 
     # Right after startup, get all dynamic resources.
     scheduler.add_job(dota_api.update_heroes, trigger=date.DateTrigger())
-    scheduler.add_job(update_response_data, trigger=date.DateTrigger())
 
     # And repeating, trying to catch a new patch, assuming it is out on the night from
     # thursday to friday at 2AM.
     # FIXME Use an event from get_if_new_patch for this?
-    today_weekday = datetime.date.today().isoweekday()
-    thursday_weekday = 4
-    next_thursday = datetime.date.today() + datetime.timedelta(
-        days=(thursday_weekday - today_weekday) % 7
-    )
-
     scheduler.add_job(
         dota_api.update_heroes,
-        trigger=interval.IntervalTrigger(weeks=1, start_date=next_thursday),
-    )
-    scheduler.add_job(
-        get_response_data,
-        trigger=interval.IntervalTrigger(weeks=1, start_date=next_thursday),
+        trigger=interval.IntervalTrigger(weeks=1, start_date=next_patch_day()),
     )
 
     return scheduler
@@ -402,6 +511,22 @@ def main():
     job_queue.run_repeating(get_if_new_patch, interval=30, first=10)
     job_queue.run_daily(poll, datetime.time(0, 0, 0), days=(4,))
 
+    job_queue.run_once(warm_up_audio_cache, when=10)
+    job_queue.run_repeating(
+        save_voiceline_data_job,
+        interval=int(DYNAMIC_CONFIG["save_interval_secs"]),
+    )
+
+    # Response data is refreshed from the job queue instead of the non-telegram
+    # scheduler, as the audio cache warm-up after it has to run on the bot's loop.
+    job_queue.run_once(refresh_response_data, when=0)
+    job_queue.run_repeating(
+        refresh_response_data,
+        interval=datetime.timedelta(weeks=1),
+        # In local time, like the non-telegram scheduler.
+        first=datetime.datetime.combine(next_patch_day(), datetime.time()).astimezone(),
+    )
+
     job_queue.run_daily(upcomingBirthdays, datetime.time(0, 0, 0))
     job_queue.run_daily(todayBirthdays, datetime.time(0, 0, 0))
 
@@ -0,0 +1,425 @@
+"""
+Disk cache for voiceline audio files. Files are stored under the hash of their URL,
+along with the HTTP validators (ETag, Last-Modified) they were served with, so stale
+files can be revalidated with a conditional request instead of downloaded again.
+The cache is kept below a byte budget by evicting the least recently used files.
+
+Downloads are asynchronous, using one shared client with a pool of keep-alive
+connections, and streamed to disk in chunks.
+"""
+
+import httpx
+import json
+import logging
+import os
+import threading
+import time
+
+from collections import OrderedDict
+from hashlib import sha256
+from tempfile import NamedTemporaryFile
+from typing import BinaryIO
+
+from sili_telegram_bot.models.exceptions import (
+    AudioDownloadException,
+    AudioTooLargeException,
+)
+from sili_telegram_bot.modules.config import config
+
+AUDIO_CACHE_CONFIG = config["audio_cache"]
+
+LOGGER = logging.getLogger(__name__)
+
+AUDIO_SUFFIX = ".audio"
+META_SUFFIX = ".json"
+TEMP_SUFFIX = ".tmp"
+KEY_CHARS = frozenset("0123456789abcdef")
+
+
+class AudioCache:
+    """
+    Files are only re-validated with the server once they were last validated more
+    than revalidate_secs ago. The last use of a file is tracked via its modification
+    time, so the eviction order survives restarts.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = AUDIO_CACHE_CONFIG["cache_dir"],
+        max_bytes: int = int(AUDIO_CACHE_CONFIG["max_bytes"]),
+        revalidate_secs: float = float(AUDIO_CACHE_CONFIG["revalidate_secs"]),
+        timeout_secs: float = float(AUDIO_CACHE_CONFIG["request_timeout_secs"]),
+        max_connections: int = int(AUDIO_CACHE_CONFIG["max_connections"]),
+        chunk_bytes: int = int(AUDIO_CACHE_CONFIG["chunk_bytes"]),
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.revalidate_secs = revalidate_secs
+        self.timeout_secs = timeout_secs
+        self.max_connections = max_connections
+        self.chunk_bytes = chunk_bytes
+        self._transport = transport
+        self._client = None
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+        # Sizes of the cached files by key, least recently used first.
+        self._sizes = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_index()
+
+    @staticmethod
+    def key(url: str) -> str:
+        return sha256(bytes(url, encoding="utf-8")).hexdigest()
+
+    @staticmethod
+    def is_key(name: str) -> bool:
+        """
+        Check if name looks like a key, as returned by `key()`.
+        """
+        return len(name) == 2 * sha256().digest_size and set(name) <= KEY_CHARS
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.cache_dir, key + suffix)
+
+    def _load_index(self) -> None:
+        """
+        Index the files already in the cache dir, and clean up leftovers of
+        interrupted writes. Files the cache did not create are left alone.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entries = []
+
+        for file_name in os.listdir(self.cache_dir):
+            key, suffix = os.path.splitext(file_name)
+            file_path = os.path.join(self.cache_dir, file_name)
+
+            if suffix == AUDIO_SUFFIX and os.path.exists(self._path(key, META_SUFFIX)):
+                file_stat = os.stat(file_path)
+                entries.append((file_stat.st_mtime_ns, key, file_stat.st_size))
+
+            elif suffix == META_SUFFIX and os.path.exists(
+                self._path(key, AUDIO_SUFFIX)
+            ):
+                continue
+
+            elif suffix == TEMP_SUFFIX or (
+                suffix in (AUDIO_SUFFIX, META_SUFFIX) and self.is_key(key)
+            ):
+                LOGGER.info(f"Removing stray file '{file_path}' from audio cache.")
+                os.remove(file_path)
+
+        for _, key, size in sorted(entries):
+            self._sizes[key] = size
+
+        self._evict()
+
+    @property
+    def n_bytes(self) -> int:
+        return sum(self._sizes.values())
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "revalidations": self.revalidations,
+                "evictions": self.evictions,
+                "n_files": len(self._sizes),
+                "n_bytes": self.n_bytes,
+            }
+
+    def get_client(self) -> httpx.AsyncClient:
+        """
+        Get the shared client, created on first use.
+        """
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout_secs,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                transport=self._transport,
+                follow_redirects=True,
+            )
+
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _write_atomic(self, file_path: str, content: bytes) -> None:
+        """
+        Write content to a temp file first and rename it, so there are never partial
+        files at file_path.
+        """
+        with NamedTemporaryFile(
+            dir=self.cache_dir, suffix=TEMP_SUFFIX, delete=False
+        ) as temp_file:
+            temp_file.write(content)
+
+        os.replace(temp_file.name, file_path)
+
+    def _read_meta(self, key: str) -> dict | None:
+        if not key in self._sizes:
+            return None
+
+        try:
+            with open(self._path(key, META_SUFFIX), "r") as infile:
+                return json.load(infile)
+
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _write_meta(self, key: str, meta: dict) -> None:
+        self._write_atomic(
+            self._path(key, META_SUFFIX), bytes(json.dumps(meta), encoding="utf-8")
+        )
+
+    def _touch(self, key: str) -> None:
+        with self._lock:
+            if key in self._sizes:
+                self._sizes.move_to_end(key)
+                os.utime(self._path(key, AUDIO_SUFFIX))
+
+    def _evict(self) -> None:
+        """
+        Remove least recently used files until the cache fits its budget. The most
+        recently used file is always kept. Call with the lock held.
+        """
+        total_bytes = self.n_bytes
+
+        while total_bytes > self.max_bytes and len(self._sizes) > 1:
+            key, size = self._sizes.popitem(last=False)
+            total_bytes -= size
+            self.evictions += 1
+
+            for suffix in (AUDIO_SUFFIX, META_SUFFIX):
+                try:
+                    os.remove(self._path(key, suffix))
+
+                except FileNotFoundError:
+                    pass
+
+    def _is_fresh(self, meta: dict | None) -> bool:
+        return (
+            meta is not None
+            and time.time() - meta["validated_at"] < self.revalidate_secs
+        )
+
+    def cached_file(self, url: str) -> str | None:
+        """
+        Get the path of the cached file for url, if there is one that doesn't need to
+        be revalidated.
+        """
+        key = self.key(url)
+
+        if not self._is_fresh(self._read_meta(key)):
+            return None
+
+        self.hits += 1
+        self._touch(key)
+
+        return self._path(key, AUDIO_SUFFIX)
+
+    def _open(self, key: str) -> BinaryIO | None:
+        """
+        Open the cached file of key, if it is still in the cache. The file is opened
+        with the lock held, so it can't be evicted in between, and stays readable
+        through the returned handle even if it is evicted afterwards.
+        """
+        with self._lock:
+            if not key in self._sizes:
+                return None
+
+            try:
+                return open(self._path(key, AUDIO_SUFFIX), "rb")
+
+            except FileNotFoundError:
+                return None
+
+    def open_cached_file(self, url: str) -> BinaryIO | None:
+        """
+        Like `cached_file`, but open the file for reading. Unlike a path, the returned
+        file can't be evicted while it's used. The caller has to close it.
+        """
+        key = self.key(url)
+
+        if self.cached_file(url) is None:
+            return None
+
+        return self._open(key)
+
+    async def prefetch(self, urls: list[str], max_bytes: int) -> int:
+        """
+        Make sure the files for urls are cached, in order, downloading at most
+        max_bytes. Files that don't fit into what is left of the budget are skipped.
+        Returns the number of bytes downloaded.
+        """
+        n_bytes = 0
+
+        for url in urls:
+            if n_bytes >= max_bytes:
+                LOGGER.info("Reached the download budget, stopping prefetch.")
+                break
+
+            if self.cached_file(url) is not None:
+                continue
+
+            n_misses = self.misses
+
+            try:
+                file_path = await self.get_file(url, max_bytes=max_bytes - n_bytes)
+
+            except AudioTooLargeException:
+                LOGGER.info(f"Not prefetching '{url}', it exceeds the download budget.")
+                continue
+
+            except AudioDownloadException as e:
+                LOGGER.warning(f"Could not prefetch '{url}': {e}")
+                continue
+
+            # Only actual downloads count, not revalidations.
+            if self.misses > n_misses:
+                n_bytes += os.path.getsize(file_path)
+
+        return n_bytes
+
+    async def _download(
+        self, url: str, key: str, headers: dict, max_bytes: int | None = None
+    ) -> httpx.Response:
+        """
+        Download url to the cache, streaming it to a temp file that is only moved into
+        place once complete. Returns the response, without the body if it was not a
+        200 (OK). Files larger than max_bytes are not downloaded, as far as the
+        Content-Length tells, or dropped as soon as they exceed it otherwise.
+        """
+        async with self.get_client().stream("GET", url, headers=headers) as response:
+            if response.status_code != 200:
+                return response
+
+            content_length = response.headers.get("Content-Length")
+
+            if (
+                max_bytes is not None
+                and content_length is not None
+                and int(content_length) > max_bytes
+            ):
+                raise AudioTooLargeException(
+                    f"{url} has {content_length} bytes, more than {max_bytes}."
+                )
+
+            with NamedTemporaryFile(
+                dir=self.cache_dir, suffix=TEMP_SUFFIX, delete=False
+            ) as temp_file:
+                try:
+                    n_bytes = 0
+
+                    async for chunk in response.aiter_bytes(self.chunk_bytes):
+                        n_bytes += len(chunk)
+
+                        if max_bytes is not None and n_bytes > max_bytes:
+                            raise AudioTooLargeException(
+                                f"{url} has more than {max_bytes} bytes."
+                            )
+
+                        temp_file.write(chunk)
+
+                except BaseException:
+                    temp_file.close()
+                    os.remove(temp_file.name)
+                    raise
+
+        os.replace(temp_file.name, self._path(key, AUDIO_SUFFIX))
+
+        return response
+
+    async def get_file(self, url: str, max_bytes: int | None = None) -> str:
+        """
+        Get the path of the cached file for url, downloading it first if needed. If
+        max_bytes is given, larger files are not downloaded, but raise an
+        `AudioTooLargeException`.
+        """
+        key = self.key(url)
+        audio_path = self._path(key, AUDIO_SUFFIX)
+        meta = self._read_meta(key)
+
+        if self._is_fresh(meta):
+            self.hits += 1
+            self._touch(key)
+
+            return audio_path
+
+        headers = {}
+
+        if meta is not None and meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+
+        if meta is not None and meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+        try:
+            dl_response = await self._download(url, key, headers, max_bytes)
+
+        except httpx.HTTPError as e:
+            raise AudioDownloadException(f"Could not download {url}: {e}") from e
+
+        if meta is not None and dl_response.status_code == 304:
+            LOGGER.info(f"Cached audio for '{url}' is still valid.")
+            self.hits += 1
+            self.revalidations += 1
+            meta["validated_at"] = time.time()
+            self._write_meta(key, meta)
+            self._touch(key)
+
+            return audio_path
+
+        if not dl_response.status_code == 200:
+            raise AudioDownloadException(
+                f"Could not get a positive response from {url} "
+                f"(status {dl_response.status_code})."
+            )
+
+        self.misses += 1
+        self._write_meta(
+            key,
+            {
+                "url": url,
+                "etag": dl_response.headers.get("ETag"),
+                "last_modified": dl_response.headers.get("Last-Modified"),
+                "validated_at": time.time(),
+            },
+        )
+
+        with self._lock:
+            self._sizes[key] = os.path.getsize(audio_path)
+            self._sizes.move_to_end(key)
+            self._evict()
+
+        return audio_path
+
+    async def open_file(self, url: str) -> BinaryIO:
+        """
+        Like `get_file`, but open the file for reading, see `open_cached_file`. The
+        caller has to close it.
+        """
+        await self.get_file(url)
+        audio_file = self._open(self.key(url))
+
+        # Another thread might have evicted the file right after it was downloaded.
+        if audio_file is None:
+            await self.get_file(url)
+            audio_file = self._open(self.key(url))
+
+        if audio_file is None:
+            raise AudioDownloadException(f"Audio for {url} was evicted right away.")
+
+        return audio_file
+
+
+default_audio_cache = AudioCache()
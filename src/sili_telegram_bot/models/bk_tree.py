@@ -0,0 +1,109 @@
+"""
+BK-tree over strings, to find all keys within some edit distance of a query without
+comparing the query to every key.
+"""
+
+from typing import Any
+
+
+def levenshtein(a: str, b: str, max_dist: int | None = None) -> int:
+    """
+    Get the edit distance (insertions, deletions, substitutions) between two strings.
+    If max_dist is given, any distance above it may be returned as max_dist + 1.
+    """
+    if len(a) < len(b):
+        a, b = b, a
+
+    if max_dist is not None and len(a) - len(b) > max_dist:
+        return max_dist + 1
+
+    previous_row = list(range(len(b) + 1))
+
+    for i, char_a in enumerate(a, start=1):
+        current_row = [i]
+
+        for j, char_b in enumerate(b, start=1):
+            current_row.append(
+                min(
+                    previous_row[j] + 1,
+                    current_row[j - 1] + 1,
+                    previous_row[j - 1] + (char_a != char_b),
+                )
+            )
+
+        if max_dist is not None and min(current_row) > max_dist:
+            return max_dist + 1
+
+        previous_row = current_row
+
+    return previous_row[-1]
+
+
+class BKTree:
+    """
+    Each node holds a key, the values added under it, and its children by their
+    distance to the key. By the triangle inequality, a search within max_dist of a
+    query only has to descend into children at distance d +- max_dist, with d the
+    distance of the query to the node's key.
+    """
+
+    def __init__(self) -> None:
+        self._root = None
+        self._n_keys = 0
+
+    def __len__(self) -> int:
+        return self._n_keys
+
+    def add(self, key: str, value: Any) -> None:
+        if self._root is None:
+            self._root = (key, [value], {})
+            self._n_keys += 1
+
+            return None
+
+        node = self._root
+
+        while True:
+            node_key, node_values, children = node
+            dist = levenshtein(key, node_key)
+
+            if dist == 0:
+                node_values.append(value)
+
+                return None
+
+            child = children.get(dist)
+
+            if child is None:
+                children[dist] = (key, [value], {})
+                self._n_keys += 1
+
+                return None
+
+            node = child
+
+    def search(self, query: str, max_dist: int) -> list[tuple[int, str, Any]]:
+        """
+        Get (distance, key, value) of all values with keys within max_dist of query,
+        closest first and by key otherwise.
+        """
+        if self._root is None:
+            return []
+
+        matches = []
+        stack = [self._root]
+
+        while stack:
+            node_key, node_values, children = stack.pop()
+            dist = levenshtein(query, node_key)
+
+            if dist <= max_dist:
+                matches.extend((dist, node_key, value) for value in node_values)
+
+            for child_dist, child in children.items():
+                if dist - max_dist <= child_dist <= dist + max_dist:
+                    stack.append(child)
+
+        matches.sort(key=lambda match: (match[0], match[1]))
+
+        return matches
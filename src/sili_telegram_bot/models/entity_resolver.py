@@ -0,0 +1,182 @@
+"""
+Resolve user supplied entity names (like "am", "Natures Prophet" or "legion") to the
+entities of one type. Exact names and aliases are looked up in a prebuilt table,
+everything else is matched via the similarity of the names' trigrams.
+"""
+
+import json
+import logging
+import regex
+
+from collections import Counter, defaultdict
+
+from sili_telegram_bot.models.trigram_index import ngrams
+from sili_telegram_bot.modules.config import config
+
+ENTITY_ALIAS_PATH = config["static_resources"]["entity_alias_path"]
+
+LOGGER = logging.getLogger(__name__)
+
+WORD_SEPARATOR_RE = regex.compile(r"[\s\-]+")
+NON_ALNUM_RE = regex.compile(r"[^\p{L}\p{N}]+")
+
+
+def fold_name(name: str) -> str:
+    return " ".join(name.split()).casefold()
+
+
+def strip_name(name: str) -> str:
+    """
+    Fold a name and remove everything but letters and digits from it.
+    """
+    return NON_ALNUM_RE.sub("", name.casefold())
+
+
+def name_initials(name: str) -> str:
+    """
+    Get the initials of a name's words, e.g. "kotl" for "Keeper of the Light".
+    """
+    words = [strip_name(word) for word in WORD_SEPARATOR_RE.split(name)]
+
+    return "".join(word[0] for word in words if word)
+
+
+def load_entity_aliases(alias_path: str = ENTITY_ALIAS_PATH) -> dict[str, dict]:
+    """
+    Load the manually maintained aliases, by short entity type.
+    """
+    try:
+        with open(alias_path, "r", encoding="utf8") as infile:
+            return json.load(infile)
+
+    except FileNotFoundError:
+        LOGGER.warning(f"No entity aliases found at '{alias_path}'.")
+
+        return {}
+
+
+class NameSimilarityIndex:
+    """
+    Rank names by the similarity of their trigram sets with a query, looking only at
+    names sharing at least one trigram with it. The similarity is the mean of the
+    share of query trigrams found in the name (so partial names like "legion" score
+    high) and their Dice coefficient (so closer matching lengths win ties).
+    """
+
+    def __init__(self, names: list[str]) -> None:
+        self.names = names
+        self._n_trigrams = []
+        self._postings = defaultdict(list)
+
+        for name_id, name in enumerate(names):
+            trigrams = self._trigrams(name)
+            self._n_trigrams.append(len(trigrams))
+
+            for trigram in trigrams:
+                self._postings[trigram].append(name_id)
+
+    @staticmethod
+    def _trigrams(name: str) -> set[str]:
+        words = NON_ALNUM_RE.split(name.casefold())
+
+        # Padding makes word starts count more, and short names have trigrams at all.
+        return ngrams(f"  {' '.join(word for word in words if word)} ")
+
+    def ranked(self, query: str, cutoff: float = 0.0) -> list[tuple[float, str]]:
+        """
+        Get (similarity, name) of all names at least cutoff similar to query, most
+        similar first.
+        """
+        query_trigrams = self._trigrams(query)
+        shared_counts = Counter()
+
+        for trigram in query_trigrams:
+            shared_counts.update(self._postings.get(trigram, ()))
+
+        ranked_names = []
+
+        for name_id, n_shared in shared_counts.items():
+            coverage = n_shared / len(query_trigrams)
+            dice = 2 * n_shared / (len(query_trigrams) + self._n_trigrams[name_id])
+            similarity = (coverage + dice) / 2
+
+            if similarity >= cutoff:
+                ranked_names.append((similarity, self.names[name_id]))
+
+        ranked_names.sort(key=lambda ranked_name: -ranked_name[0])
+
+        return ranked_names
+
+
+class EntityResolver:
+    """
+    Alias table and similarity index over the names of the entities of one type.
+    Aliases are, in order of precedence: the folded names themselves, manual aliases,
+    names without punctuation and spaces, and the initials of multi word names.
+    Initials shared by multiple entities are left out.
+    """
+
+    def __init__(
+        self, entity_names: list[str], manual_aliases: dict[str, str] | None = None
+    ) -> None:
+        self._aliases = {}
+
+        for entity_name in entity_names:
+            self._aliases.setdefault(fold_name(entity_name), entity_name)
+
+        known_names = set(entity_names)
+
+        for alias, entity_name in (manual_aliases or {}).items():
+            if entity_name in known_names:
+                self._aliases.setdefault(fold_name(alias), entity_name)
+
+        for entity_name in entity_names:
+            self._aliases.setdefault(strip_name(entity_name), entity_name)
+
+        initials = {
+            entity_name: name_initials(entity_name)
+            for entity_name in entity_names
+            if len(WORD_SEPARATOR_RE.split(entity_name.strip())) > 1
+        }
+        initial_counts = Counter(initials.values())
+
+        for entity_name, name_initial in initials.items():
+            if initial_counts[name_initial] == 1:
+                self._aliases.setdefault(name_initial, entity_name)
+
+        self._similarity_index = NameSimilarityIndex(entity_names)
+
+    def resolve_exact(self, name: str) -> str | None:
+        """
+        Get the entity name for a name or alias, or None if there is no such alias.
+        """
+        entity_name = self._aliases.get(fold_name(name))
+
+        if entity_name is None:
+            entity_name = self._aliases.get(strip_name(name))
+
+        return entity_name
+
+    def similar_names(self, name: str, cutoff: float = 0.4) -> list[str]:
+        """
+        Get the entity names at least cutoff similar to name, most similar first.
+        """
+        return [
+            entity_name
+            for _, entity_name in self._similarity_index.ranked(name, cutoff=cutoff)
+        ]
+
+    def resolve(self, name: str, cutoff: float = 0.4) -> str | None:
+        """
+        Get the entity name for a name or alias, falling back to the most similar
+        entity name. None if no name is at least cutoff similar.
+        """
+        entity_name = self.resolve_exact(name)
+
+        if entity_name is None:
+            similar_names = self.similar_names(name, cutoff=cutoff)
+
+            if similar_names:
+                entity_name = similar_names[0]
+
+        return entity_name
@@ -4,3 +4,35 @@ class MissingResponseUrlException(Exception):
     """
 
     pass
+
+
+class SearchTimeoutException(Exception):
+    """
+    When a search takes longer than its deadline.
+    """
+
+    pass
+
+
+class SearchCancelledException(Exception):
+    """
+    When a search is stopped, because nobody waits for its result anymore.
+    """
+
+    pass
+
+
+class AudioDownloadException(Exception):
+    """
+    When an audio file could not be downloaded.
+    """
+
+    pass
+
+
+class AudioTooLargeException(AudioDownloadException):
+    """
+    When an audio file is larger than the number of bytes allowed to download.
+    """
+
+    pass
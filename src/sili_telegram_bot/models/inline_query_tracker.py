@@ -0,0 +1,49 @@
+"""
+Track in-flight inline queries per user, so outdated ones can be dropped. Telegram
+sends a new inline query for almost every keystroke, but only the latest one of a user
+is still shown to them.
+
+Meant to be used from the event loop only, so this is NOT thread safe.
+"""
+
+import asyncio
+import logging
+
+LOGGER = logging.getLogger(__name__)
+
+
+class InlineQueryTracker:
+
+    def __init__(self) -> None:
+        self.superseded_count = 0
+        self._tasks = {}
+
+    def start(self, user_id: int, task: asyncio.Task) -> None:
+        """
+        Register task as the one handling the latest query of a user, cancelling the
+        task handling the previous one if it's still running.
+        """
+        previous_task = self._tasks.get(user_id)
+
+        if previous_task is not None and not previous_task.done():
+            previous_task.cancel()
+            self.superseded_count += 1
+            LOGGER.info(
+                f"Cancelled superseded inline query of user {user_id} "
+                f"({self.superseded_count} superseded so far)."
+            )
+
+        self._tasks[user_id] = task
+
+    def is_current(self, user_id: int, task: asyncio.Task) -> bool:
+        """
+        Check if task is handling the latest query of a user.
+        """
+        return self._tasks.get(user_id) is task
+
+    def finish(self, user_id: int, task: asyncio.Task) -> None:
+        """
+        Unregister task, if it is still the latest one of the user.
+        """
+        if self.is_current(user_id, task):
+            del self._tasks[user_id]
@@ -1,6 +1,10 @@
 """
 Container module for the project wide mediawiki object. There should be only one to
 ensure rate-limiting is not exceeded.
+
+Every request costs a rate limit slot, so besides the object itself, this provides
+requests that get more done per call than the `mediawiki` page objects: page metadata
+is queried for many titles at once, and page HTML is fetched with a single request.
 """
 
 import mediawiki
@@ -20,6 +24,7 @@ _api_url = vl_config["base_url"] + "/api.php"
 _api_rate_limit_wait = datetime.timedelta(
     seconds=int(vl_config["secs_between_requests"])
 )
+_titles_per_request = int(vl_config["titles_per_request"])
 
 
 class APIWrapper:
@@ -40,3 +45,86 @@ class APIWrapper:
             )
 
         return cls._mediawiki_api
+
+    @classmethod
+    def query_titles(
+        cls,
+        titles: list[str],
+        params: dict,
+        mediawiki_api: mediawiki.MediaWiki | None = None,
+        batch_size: int = _titles_per_request,
+    ) -> dict[str, dict]:
+        """
+        Make `action=query` requests with params for titles, packing batch_size titles
+        into each request. Returns the page info by requested title, missing pages
+        are left out.
+        """
+        mediawiki_api = mediawiki_api or cls.get_or_create_mediawiki_api()
+        pages = {}
+
+        for batch_start in range(0, len(titles), batch_size):
+            batch_titles = titles[batch_start : batch_start + batch_size]
+            result = mediawiki_api.wiki_request(
+                {
+                    **params,
+                    "action": "query",
+                    "titles": "|".join(batch_titles),
+                    "formatversion": 2,
+                }
+            )
+            query = result.get("query", {})
+            # The API returns pages under their normalized titles, e.g. with the first
+            # letter upper-cased, so map them back to the requested ones.
+            requested_titles = {
+                normalized["to"]: normalized["from"]
+                for normalized in query.get("normalized", [])
+            }
+
+            for page in query.get("pages", []):
+                if not page.get("missing"):
+                    pages[requested_titles.get(page["title"], page["title"])] = page
+
+        return pages
+
+    @classmethod
+    def page_revisions(
+        cls, titles: list[str], mediawiki_api: mediawiki.MediaWiki | None = None
+    ) -> dict[str, int]:
+        """
+        Get the id of the latest revision of each page. Missing pages are left out.
+        """
+        pages = cls.query_titles(
+            titles, {"prop": "revisions", "rvprop": "ids"}, mediawiki_api
+        )
+
+        return {
+            title: page["revisions"][0]["revid"]
+            for title, page in pages.items()
+            if page.get("revisions")
+        }
+
+    @classmethod
+    def page_html(
+        cls, title: str, mediawiki_api: mediawiki.MediaWiki | None = None
+    ) -> str:
+        """
+        Get the HTML of a page via `action=parse`, following redirects. Unlike
+        `MediaWiki.page().html`, this takes one request instead of two.
+        """
+        mediawiki_api = mediawiki_api or cls.get_or_create_mediawiki_api()
+        result = mediawiki_api.wiki_request(
+            {
+                "action": "parse",
+                "page": title,
+                "prop": "text",
+                "redirects": 1,
+                "disableeditsection": 1,
+                "disablelimitreport": 1,
+                "formatversion": 2,
+            }
+        )
+
+        if "parse" not in result:
+            raise mediawiki.PageError(title=title)
+
+        return result["parse"]["text"]
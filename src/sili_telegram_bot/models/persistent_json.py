@@ -0,0 +1,57 @@
+"""
+Data kept in a JSON file across restarts. Changes are only written when saving, so
+frequent changes can be batched into one write, e.g. by saving periodically and on
+shutdown.
+
+Meant to be used from the event loop only, so this is NOT thread safe.
+"""
+
+import json
+import logging
+import os
+
+LOGGER = logging.getLogger(__name__)
+
+
+class PersistentJson:
+    """
+    Holds the data of the JSON file at file_path, or an empty dict if there is no
+    readable file. Changes to data have to be marked via `changed()` to be saved.
+    """
+
+    def __init__(self, file_path: str, description: str) -> None:
+        self.file_path = file_path
+        self.data = {}
+        self._is_changed = False
+
+        try:
+            with open(file_path, "r") as infile:
+                self.data = json.load(infile)
+
+        except FileNotFoundError:
+            pass
+
+        except json.JSONDecodeError as e:
+            LOGGER.error(
+                f"Error when attempting to read {description} at '{file_path}': {e}. "
+                f"Starting from scratch."
+            )
+
+    def changed(self) -> None:
+        self._is_changed = True
+
+    def save(self) -> None:
+        """
+        Write the data to its file, if it changed since the last save.
+        """
+        if not self._is_changed:
+            return None
+
+        # Write to a temp file first, so an ill-timed shutdown can't corrupt the file.
+        temp_path = self.file_path + ".tmp"
+
+        with open(temp_path, "w") as outfile:
+            json.dump(self.data, outfile)
+
+        os.replace(temp_path, self.file_path)
+        self._is_changed = False
@@ -0,0 +1,67 @@
+"""
+Bounded cache for the results of search queries.
+"""
+
+import threading
+import time
+
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+class QueryResultCache:
+    """
+    Thread safe LRU cache whose entries additionally expire after ttl_secs.
+    """
+
+    def __init__(self, max_size: int, ttl_secs: float) -> None:
+        self.max_size = max_size
+        self.ttl_secs = ttl_secs
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Any | None:
+        """
+        Get the cached value for key, or None if there is no (current) entry.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expiry, value = entry
+
+            if expiry < time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        Cache value for key, evicting the least recently used entry if full.
+        """
+        if self.max_size <= 0:
+            return None
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_secs, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
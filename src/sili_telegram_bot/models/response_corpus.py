@@ -0,0 +1,297 @@
+"""
+Compact in-memory storage for response data. Instead of a dict of lists of dicts (as
+loaded from the responses JSON), responses are stored column-wise in flat arrays, with
+interned strings and a de-duplicated URL table.
+"""
+
+import sys
+
+from array import array
+from collections.abc import Iterator, Mapping
+from hashlib import md5
+
+from sili_telegram_bot.models.response_types import (
+    EntityData,
+    EntityResponse,
+    ResponseRecord,
+)
+
+# Id of a missing URL (a response level without a file on the wiki).
+NO_URL = 2**32 - 1
+
+
+class UrlTable:
+    """
+    De-duplicated URLs, each stored as a shared prefix (everything up to the last
+    slash) and its own suffix. Response audio files share a handful of directories, so
+    most of every URL is only stored once.
+    """
+
+    def __init__(self) -> None:
+        self._prefixes = []
+        self._url_prefix_ids = array("I")
+        self._suffixes = []
+        # Only needed while adding URLs, see `freeze()`.
+        self._prefix_ids = {}
+        self._url_ids = {}
+
+    def __len__(self) -> int:
+        return len(self._suffixes)
+
+    def __getitem__(self, url_id: int) -> str:
+        return self._prefixes[self._url_prefix_ids[url_id]] + self._suffixes[url_id]
+
+    def add(self, url: str) -> int:
+        """
+        Add url to the table if it's not in there yet, and return its id.
+        """
+        url_id = self._url_ids.get(url)
+
+        if url_id is None:
+            split_pos = url.rfind("/") + 1
+            prefix = url[:split_pos]
+            prefix_id = self._prefix_ids.setdefault(prefix, len(self._prefixes))
+
+            if prefix_id == len(self._prefixes):
+                self._prefixes.append(prefix)
+
+            url_id = len(self._suffixes)
+            self._url_prefix_ids.append(prefix_id)
+            self._suffixes.append(url[split_pos:])
+            self._url_ids[url] = url_id
+
+        return url_id
+
+    def freeze(self) -> None:
+        """
+        Drop the lookup tables used for de-duplication. No URLs can be added after.
+        """
+        self._prefix_ids = None
+        self._url_ids = None
+
+    def to_columns(self) -> dict:
+        """
+        Get the table as a dict of lists and bytes, e.g. to be serialized.
+        """
+        return {
+            "prefixes": self._prefixes,
+            "url_prefix_ids": self._url_prefix_ids.tobytes(),
+            "suffixes": self._suffixes,
+        }
+
+    @classmethod
+    def from_columns(cls, columns: dict) -> "UrlTable":
+        """
+        Re-create a frozen table from the output of `to_columns()`.
+        """
+        url_table = cls()
+        url_table._prefixes = columns["prefixes"]
+        url_table._url_prefix_ids.frombytes(columns["url_prefix_ids"])
+        url_table._suffixes = columns["suffixes"]
+        url_table.freeze()
+
+        return url_table
+
+
+class ResponseCorpus(Mapping):
+    """
+    Read-only mapping of page titles to the responses on them, in the same format as
+    the responses JSON. Responses are given ids in page order, and page responses are
+    re-assembled on access.
+    """
+
+    def __init__(
+        self, response_data: Mapping[str, list[EntityResponse]] | None = None
+    ) -> None:
+        self.page_titles = []
+        self.texts = []
+        self.urls = UrlTable()
+        self._page_ids = {}
+        # Responses of page i are the ones in [_page_starts[i], _page_starts[i + 1]),
+        # the URL ids of response j are in _url_ids[_url_starts[j]:_url_starts[j + 1]].
+        self._page_starts = array("I", [0])
+        self._url_starts = array("I", [0])
+        self._url_ids = array("I")
+
+        for page_title, responses in (response_data or {}).items():
+            self._page_ids[page_title] = len(self.page_titles)
+            self.page_titles.append(page_title)
+
+            for response in responses:
+                # Generic lines ("Haha!") are shared by lots of entities.
+                self.texts.append(sys.intern(response["text"]))
+
+                for url in response["urls"]:
+                    self._url_ids.append(NO_URL if url is None else self.urls.add(url))
+
+                self._url_starts.append(len(self._url_ids))
+
+            self._page_starts.append(len(self.texts))
+
+        self.urls.freeze()
+
+    def to_columns(self) -> dict:
+        """
+        Get the corpus as a dict of lists and bytes, e.g. to be serialized. The arrays
+        are stored as their raw bytes, so they can be restored without a copy per item.
+        """
+        return {
+            "page_titles": self.page_titles,
+            "texts": self.texts,
+            "urls": self.urls.to_columns(),
+            "page_starts": self._page_starts.tobytes(),
+            "url_starts": self._url_starts.tobytes(),
+            "url_ids": self._url_ids.tobytes(),
+        }
+
+    @classmethod
+    def from_columns(cls, columns: dict) -> "ResponseCorpus":
+        """
+        Re-create a corpus from the output of `to_columns()`.
+        """
+        corpus = cls()
+        corpus.page_titles = columns["page_titles"]
+        corpus.texts = [sys.intern(text) for text in columns["texts"]]
+        corpus.urls = UrlTable.from_columns(columns["urls"])
+        corpus._page_ids = {
+            page_title: page_id for page_id, page_title in enumerate(corpus.page_titles)
+        }
+        corpus._page_starts = array("I")
+        corpus._page_starts.frombytes(columns["page_starts"])
+        corpus._url_starts = array("I")
+        corpus._url_starts.frombytes(columns["url_starts"])
+        corpus._url_ids.frombytes(columns["url_ids"])
+
+        return corpus
+
+    def __getitem__(self, page_title: str) -> list[EntityResponse]:
+        return [
+            EntityResponse(
+                text=self.texts[response_id], urls=self.response_urls(response_id)
+            )
+            for response_id in self.page_response_ids(page_title)
+        ]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.page_titles)
+
+    def __len__(self) -> int:
+        return len(self.page_titles)
+
+    def page_response_ids(self, page_title: str) -> range:
+        """
+        Get the ids of the responses on a page. Raises a KeyError for unknown pages.
+        """
+        page_id = self._page_ids[page_title]
+
+        return range(self._page_starts[page_id], self._page_starts[page_id + 1])
+
+    def response_urls(self, response_id: int) -> list[str | None]:
+        """
+        Get the URLs of all levels of a response, None for levels without a file.
+        """
+        url_ids = self._url_ids[
+            self._url_starts[response_id] : self._url_starts[response_id + 1]
+        ]
+
+        return [None if url_id == NO_URL else self.urls[url_id] for url_id in url_ids]
+
+    def last_url(self, response_id: int) -> tuple[int, str] | None:
+        """
+        Get level and URL of the last level of a response with a file, if any.
+        """
+        start = self._url_starts[response_id]
+
+        for url_pos in reversed(range(start, self._url_starts[response_id + 1])):
+            url_id = self._url_ids[url_pos]
+
+            if url_id != NO_URL:
+                return url_pos - start, self.urls[url_id]
+
+        return None
+
+
+class ResponseRecordTable:
+    """
+    Flat table of the voiced responses of all entities, as searched by the inline
+    search. Only the full responses ("Entity name: Response text") are stored as
+    strings, records are created on access.
+
+    If the same full response occurs multiple times, the last occurrence wins, but
+    keeps the position of the first.
+    """
+
+    def __init__(
+        self,
+        corpus: ResponseCorpus,
+        entity_data: dict[str, dict[str, EntityData]],
+        type_lookup: dict[str, str],
+    ) -> None:
+        self.corpus = corpus
+        self.full_responses = []
+        # Length of the "Entity name: " part of each full response.
+        self.text_starts = array("I")
+        self._entities = []
+        self._entity_ids = array("I")
+        self._response_ids = array("I")
+        record_ids = {}
+
+        for type_name, type_data in entity_data.items():
+            entity_type = sys.intern(type_lookup.get(type_name, type_name))
+
+            for entity_name, entity_dict in type_data.items():
+                entity_id = len(self._entities)
+                self._entities.append((sys.intern(entity_name), entity_type))
+
+                for response_id in corpus.page_response_ids(entity_dict["title"]):
+                    if corpus.last_url(response_id) is None:
+                        continue
+
+                    full_response = f"{entity_name}: {corpus.texts[response_id]}"
+                    record_id = record_ids.get(full_response)
+
+                    if record_id is None:
+                        record_ids[full_response] = len(self.full_responses)
+                        self.full_responses.append(full_response)
+                        self.text_starts.append(len(entity_name) + len(": "))
+                        self._entity_ids.append(entity_id)
+                        self._response_ids.append(response_id)
+
+                    else:
+                        self._entity_ids[record_id] = entity_id
+                        self._response_ids[record_id] = response_id
+
+    def __len__(self) -> int:
+        return len(self.full_responses)
+
+    def entity_name(self, record_id: int) -> str:
+        return self._entities[self._entity_ids[record_id]][0]
+
+    def entity_names(self) -> Iterator[str]:
+        """
+        Get the entity names of all records, in the order of their ids.
+        """
+        return (self.entity_name(record_id) for record_id in range(len(self)))
+
+    def full_response(self, record_id: int) -> str:
+        return self.full_responses[record_id]
+
+    def text(self, record_id: int) -> str:
+        return self.corpus.texts[self._response_ids[record_id]]
+
+    def record(self, record_id: int) -> ResponseRecord:
+        """
+        Create the record of a response, referring to its last level with a URL.
+        """
+        entity_name, entity_type = self._entities[self._entity_ids[record_id]]
+        level, url = self.corpus.last_url(self._response_ids[record_id])
+        full_response = self.full_responses[record_id]
+
+        return ResponseRecord(
+            entity=entity_name,
+            type=entity_type,
+            text=self.text(record_id),
+            level=level,
+            url=url,
+            result_id=md5(bytes(full_response, encoding="utf-8")).hexdigest(),
+        )
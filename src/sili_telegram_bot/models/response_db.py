@@ -0,0 +1,443 @@
+"""
+SQLite storage for response data. Entities, responses and their per-level URLs are
+kept in normalized tables, with an FTS5 index on the response texts. The records
+offered by the inline search are stored as well, with an FTS5 index on their full
+responses. This allows for indexed lookups without parsing (and keeping in memory) the
+whole response JSON.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+
+from collections.abc import Iterator, Mapping
+from hashlib import md5
+
+from sili_telegram_bot.models.response_corpus import ResponseCorpus, ResponseRecordTable
+from sili_telegram_bot.models.response_types import (
+    EntityData,
+    EntityResponse,
+    ResponseRecord,
+)
+from sili_telegram_bot.models.trigram_index import NGRAM_SIZE, split_query
+
+LOGGER = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE entity_types (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE entities (
+    id INTEGER PRIMARY KEY,
+    type_id INTEGER NOT NULL REFERENCES entity_types (id),
+    name TEXT NOT NULL,
+    title TEXT NOT NULL,
+    url TEXT NOT NULL
+);
+CREATE TABLE pages (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL UNIQUE
+);
+CREATE TABLE responses (
+    id INTEGER PRIMARY KEY,
+    page_id INTEGER NOT NULL REFERENCES pages (id),
+    position INTEGER NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX responses_by_page ON responses (page_id, position);
+CREATE TABLE response_urls (
+    response_id INTEGER NOT NULL REFERENCES responses (id),
+    level INTEGER NOT NULL,
+    url TEXT,
+    PRIMARY KEY (response_id, level)
+) WITHOUT ROWID;
+CREATE VIRTUAL TABLE responses_fts USING fts5 (
+    text, content='responses', content_rowid='id', tokenize='trigram'
+);
+CREATE TABLE records (
+    id INTEGER PRIMARY KEY,
+    entity_id INTEGER NOT NULL REFERENCES entities (id),
+    full_response TEXT NOT NULL,
+    search_text TEXT NOT NULL,
+    text_start INTEGER NOT NULL,
+    level INTEGER NOT NULL,
+    url TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE records_fts USING fts5 (
+    search_text, content='records', content_rowid='id',
+    tokenize='trigram case_sensitive 1'
+);
+"""
+
+
+def fts_phrase(text: str) -> str:
+    """
+    Quote text as an FTS5 phrase, which the trigram tokenizer matches as substring.
+    """
+    return '"' + text.replace('"', '""') + '"'
+
+
+class EntityResponsesView(Mapping):
+    """
+    Read-only mapping of page titles to the responses on them, backed by the database.
+    Behaves like the dict loaded from the responses JSON, but only fetches what is
+    accessed.
+    """
+
+    def __init__(self, database: "ResponseDatabase") -> None:
+        self._database = database
+
+    def __getitem__(self, page_title: str) -> list[EntityResponse]:
+        if not page_title in self:
+            raise KeyError(page_title)
+
+        return self._database.get_page_responses(page_title)
+
+    def __contains__(self, page_title: object) -> bool:
+        row = (
+            self._database.connection()
+            .execute("SELECT 1 FROM pages WHERE title = ?", (page_title,))
+            .fetchone()
+        )
+
+        return row is not None
+
+    def __iter__(self) -> Iterator[str]:
+        rows = self._database.connection().execute(
+            "SELECT title FROM pages ORDER BY id"
+        )
+
+        return (row[0] for row in rows)
+
+    def __len__(self) -> int:
+        return (
+            self._database.connection()
+            .execute("SELECT COUNT(*) FROM pages")
+            .fetchone()[0]
+        )
+
+
+class RecordTableView:
+    """
+    Read-only view of the response records in the database, with the interface of
+    `ResponseRecordTable`. Records are only fetched when accessed.
+    """
+
+    def __init__(
+        self, database: "ResponseDatabase", type_lookup: dict[str, str]
+    ) -> None:
+        self._database = database
+        self._type_lookup = type_lookup
+        self._n_records = (
+            database.connection().execute("SELECT COUNT(*) FROM records").fetchone()[0]
+        )
+
+    def __len__(self) -> int:
+        return self._n_records
+
+    def _get_column(self, column: str, record_id: int):
+        row = (
+            self._database.connection()
+            .execute(f"SELECT {column} FROM records WHERE id = ?", (record_id,))
+            .fetchone()
+        )
+
+        if row is None:
+            raise IndexError(f"No record with id {record_id}.")
+
+        return row[0]
+
+    def entity_names(self) -> Iterator[str]:
+        """
+        Get the entity names of all records, in the order of their ids.
+        """
+        rows = self._database.connection().execute(
+            "SELECT entities.name FROM records "
+            "JOIN entities ON records.entity_id = entities.id ORDER BY records.id"
+        )
+
+        return (row[0] for row in rows)
+
+    def full_response(self, record_id: int) -> str:
+        return self._get_column("full_response", record_id)
+
+    def text(self, record_id: int) -> str:
+        return self._get_column("substr(full_response, text_start + 1)", record_id)
+
+    def record(self, record_id: int) -> ResponseRecord:
+        row = (
+            self._database.connection()
+            .execute(
+                "SELECT entities.name, entity_types.name, records.full_response, "
+                "records.text_start, records.level, records.url FROM records "
+                "JOIN entities ON records.entity_id = entities.id "
+                "JOIN entity_types ON entities.type_id = entity_types.id "
+                "WHERE records.id = ?",
+                (record_id,),
+            )
+            .fetchone()
+        )
+
+        if row is None:
+            raise IndexError(f"No record with id {record_id}.")
+
+        entity_name, type_name, full_response, text_start, level, url = row
+
+        return ResponseRecord(
+            entity=entity_name,
+            type=self._type_lookup.get(type_name, type_name),
+            text=full_response[text_start:],
+            level=level,
+            url=url,
+            result_id=md5(bytes(full_response, encoding="utf-8")).hexdigest(),
+        )
+
+
+class RecordSearchPool:
+    """
+    The full responses of all records in the database, as a pool for the inline
+    search (see `SearchPool`). Candidates for a query are narrowed down via the FTS
+    index, and fetched along with it.
+    """
+
+    def __init__(self, database: "ResponseDatabase") -> None:
+        self._database = database
+        self._n_records = (
+            database.connection().execute("SELECT COUNT(*) FROM records").fetchone()[0]
+        )
+
+    def __len__(self) -> int:
+        return self._n_records
+
+    def candidates(
+        self, query: str, tolerance: int = 1
+    ) -> Iterator[tuple[int, str, int]]:
+        """
+        Get id, full response and text start of all records that might contain query
+        with at most tolerance errors, in ascending order of ids.
+        """
+        sql = "SELECT id, full_response, text_start FROM records"
+        params = []
+        # Any match with up to tolerance errors contains one of tolerance + 1 pieces
+        # of the query verbatim, see `TrigramIndex`.
+        pieces = split_query(query.lower(), tolerance + 1)
+
+        if all(pieces):
+            long_pieces = [piece for piece in pieces if len(piece) >= NGRAM_SIZE]
+            # The trigram tokenizer can't match pieces shorter than a trigram.
+            short_pieces = [piece for piece in pieces if len(piece) < NGRAM_SIZE]
+            conditions = ["instr(search_text, ?) > 0" for _ in short_pieces]
+            params += short_pieces
+
+            if long_pieces:
+                conditions.append(
+                    "id IN (SELECT rowid FROM records_fts WHERE records_fts MATCH ?)"
+                )
+                params.append(" OR ".join(fts_phrase(piece) for piece in long_pieces))
+
+            sql += " WHERE " + " OR ".join(conditions)
+
+        sql += " ORDER BY id"
+
+        return self._database.connection().execute(sql, params)
+
+
+class ResponseDatabase:
+    """
+    Access to a response database file. Connections are opened read-only, per thread
+    and process, as sqlite connections must not be shared between them.
+    """
+
+    def __init__(self, database_file: str) -> None:
+        if not os.path.exists(database_file):
+            raise FileNotFoundError(
+                f"Error when attempting to open response database at "
+                f"'{database_file}'. The resources have likely not finished "
+                f"downloading yet."
+            )
+
+        self.database_file = database_file
+        self._local = threading.local()
+
+    def connection(self) -> sqlite3.Connection:
+        pid = os.getpid()
+
+        if getattr(self._local, "pid", None) != pid:
+            self._local.connection = sqlite3.connect(
+                f"file:{self.database_file}?mode=ro", uri=True
+            )
+            self._local.pid = pid
+
+        return self._local.connection
+
+    def has_records(self) -> bool:
+        """
+        Check if the database has the records of the inline search, which databases
+        written by older versions lack.
+        """
+        row = (
+            self.connection()
+            .execute("SELECT 1 FROM sqlite_master WHERE name = 'records_fts'")
+            .fetchone()
+        )
+
+        return row is not None
+
+    def load_entity_data(self) -> dict[str, dict[str, EntityData]]:
+        """
+        Load the entity data, in the same format as the entity data JSON.
+        """
+        rows = self.connection().execute(
+            "SELECT entity_types.name, entities.name, entities.url, entities.title "
+            "FROM entities JOIN entity_types ON entities.type_id = entity_types.id "
+            "ORDER BY entities.id"
+        )
+
+        entity_data = {}
+
+        for type_name, name, url, title in rows:
+            entity_data.setdefault(type_name, {})[name] = EntityData(
+                name=name, url=url, title=title
+            )
+
+        return entity_data
+
+    def get_page_responses(
+        self, page_title: str, text: str | None = None, tolerance: int = 1
+    ) -> list[EntityResponse]:
+        """
+        Get the responses on a page in their original order. If text is given, only
+        responses that might contain it with up to tolerance errors are returned (a
+        superset of the actual matches), narrowed down via the FTS index.
+        """
+        query = (
+            "SELECT responses.id, responses.text, response_urls.level, "
+            "response_urls.url FROM pages "
+            "JOIN responses ON responses.page_id = pages.id "
+            "LEFT JOIN response_urls ON response_urls.response_id = responses.id "
+            "WHERE pages.title = ?"
+        )
+        params = [page_title]
+
+        if text is not None:
+            # Any match with up to tolerance errors contains one of tolerance + 1
+            # pieces of the text verbatim, see `TrigramIndex`.
+            pieces = split_query(text, tolerance + 1)
+
+            if all(len(piece) >= NGRAM_SIZE for piece in pieces):
+                query += (
+                    " AND responses.id IN (SELECT rowid FROM responses_fts "
+                    "WHERE responses_fts MATCH ?)"
+                )
+                params.append(" OR ".join(fts_phrase(piece) for piece in pieces))
+
+        query += " ORDER BY responses.position, response_urls.level"
+
+        responses = []
+        last_id = None
+
+        for response_id, response_text, level, url in self.connection().execute(
+            query, params
+        ):
+            if response_id != last_id:
+                responses.append(EntityResponse(text=response_text, urls=[]))
+                last_id = response_id
+
+            if level is not None:
+                responses[-1]["urls"].append(url)
+
+        return responses
+
+    @staticmethod
+    def write(
+        database_file: str,
+        entity_data: dict[str, dict[str, EntityData]],
+        response_data: dict[str, list[EntityResponse]],
+    ) -> None:
+        """
+        Write entity and response data (in the format of their JSON files) to a new
+        database file.
+        """
+        LOGGER.info(f"Writing response database to '{database_file}'...")
+
+        if os.path.exists(database_file):
+            os.remove(database_file)
+
+        connection = sqlite3.connect(database_file)
+
+        try:
+            with connection:
+                connection.executescript(SCHEMA)
+
+                entity_ids = {}
+
+                for type_name, type_data in entity_data.items():
+                    type_id = connection.execute(
+                        "INSERT INTO entity_types (name) VALUES (?)", (type_name,)
+                    ).lastrowid
+
+                    for entity_name, entity in type_data.items():
+                        entity_ids[type_name, entity_name] = connection.execute(
+                            "INSERT INTO entities (type_id, name, title, url) "
+                            "VALUES (?, ?, ?, ?)",
+                            (type_id, entity["name"], entity["title"], entity["url"]),
+                        ).lastrowid
+
+                for page_title, responses in response_data.items():
+                    page_id = connection.execute(
+                        "INSERT INTO pages (title) VALUES (?)", (page_title,)
+                    ).lastrowid
+
+                    for position, response in enumerate(responses):
+                        response_id = connection.execute(
+                            "INSERT INTO responses (page_id, position, text) "
+                            "VALUES (?, ?, ?)",
+                            (page_id, position, response["text"]),
+                        ).lastrowid
+                        connection.executemany(
+                            "INSERT INTO response_urls (response_id, level, url) "
+                            "VALUES (?, ?, ?)",
+                            [
+                                (response_id, level, url)
+                                for level, url in enumerate(response["urls"])
+                            ],
+                        )
+
+                connection.execute(
+                    "INSERT INTO responses_fts (responses_fts) VALUES ('rebuild')"
+                )
+
+                # Records keep the ids they have in memory, so results are the same
+                # with either storage backend. Without a type lookup, the record types
+                # are the type names of the entity data.
+                record_table = ResponseRecordTable(
+                    ResponseCorpus(response_data), entity_data, type_lookup={}
+                )
+                records = (
+                    record_table.record(record_id)
+                    for record_id in range(len(record_table))
+                )
+                connection.executemany(
+                    "INSERT INTO records (id, entity_id, full_response, search_text, "
+                    "text_start, level, url) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (
+                            record_id,
+                            entity_ids[record.type, record.entity],
+                            record.full_response,
+                            record.full_response.lower(),
+                            record_table.text_starts[record_id],
+                            record.level,
+                            record.url,
+                        )
+                        for record_id, record in enumerate(records)
+                    ],
+                )
+                connection.execute(
+                    "INSERT INTO records_fts (records_fts) VALUES ('rebuild')"
+                )
+
+        finally:
+            connection.close()
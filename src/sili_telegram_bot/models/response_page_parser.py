@@ -0,0 +1,201 @@
+"""
+Streaming extraction of responses from the HTML of a response page. Instead of
+building a full BeautifulSoup tree and selecting the response list items from it,
+list items are picked up while the page is tokenized, keeping only their text and
+audio buttons.
+
+The results are the same as with `bs4.BeautifulSoup(html, features="html.parser")`
+and the selectors in `voiceline_scraping.response_tags_from_soup()`, so tags are
+nested and closed like that tree builder does: void elements never contain anything,
+and an end tag closes the most recently opened tag of that name, along with
+everything opened after it.
+"""
+
+from html.parser import HTMLParser
+
+# Elements closed right after they are opened, see `bs4.builder.HTMLTreeBuilder`.
+VOID_ELEMENTS = frozenset(
+    {
+        "area",
+        "base",
+        "basefont",
+        "bgsound",
+        "br",
+        "col",
+        "command",
+        "embed",
+        "frame",
+        "hr",
+        "image",
+        "img",
+        "input",
+        "isindex",
+        "keygen",
+        "link",
+        "menuitem",
+        "meta",
+        "nextid",
+        "param",
+        "source",
+        "spacer",
+        "track",
+        "wbr",
+    }
+)
+
+# Text inside these elements is not part of a tag's text in BeautifulSoup.
+NON_TEXT_ELEMENTS = frozenset({"rp", "rt", "script", "style", "template"})
+
+AUDIO_BUTTON_CLASS = "ext-audiobutton"
+
+
+class _Element:
+    __slots__ = ("name", "classes", "parent", "first_source", "list_item")
+
+    def __init__(self, name: str, classes: list[str], parent: "_Element | None"):
+        self.name = name
+        self.classes = classes
+        self.parent = parent
+        # Attributes of the first <source> inside the element, if any.
+        self.first_source = None
+        self.list_item = None
+
+
+class _ListItem:
+    __slots__ = ("text_parts", "buttons")
+
+    def __init__(self) -> None:
+        self.text_parts = []
+        # Attributes and parent element of each audio button in the item.
+        self.buttons = []
+
+
+class ResponsePageParser(HTMLParser):
+    """
+    Collects the list items that are response candidates, in the order of
+    `response_tags_from_soup()`: items in bullet lists of the page body, then items
+    in tables, then items in tabs. Items in more than one of these are included once
+    per group.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self._stack = []
+        self._open_items = []
+        self._n_non_text = 0
+        self._bullet_items = []
+        self._table_items = []
+        self._tab_items = []
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        attr_dict = {name: "" if value is None else value for name, value in attrs}
+        parent = self._stack[-1] if self._stack else None
+        element = _Element(tag, attr_dict.get("class", "").split(), parent)
+
+        if tag == "source":
+            # Every open element contains the source, and once one element has seen
+            # a source, so have all elements opened before it.
+            for open_element in reversed(self._stack):
+                if open_element.first_source is not None:
+                    break
+
+                open_element.first_source = attr_dict
+
+        elif tag == "a" and AUDIO_BUTTON_CLASS in element.classes:
+            for list_item in self._open_items:
+                list_item.buttons.append((attr_dict, parent))
+
+        elif tag == "li":
+            self._add_list_item(element)
+
+        if tag in VOID_ELEMENTS:
+            return None
+
+        self._stack.append(element)
+
+        if tag in NON_TEXT_ELEMENTS:
+            self._n_non_text += 1
+
+    def handle_startendtag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        self.handle_starttag(tag, attrs)
+
+        if tag not in VOID_ELEMENTS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag: str) -> None:
+        for stack_pos in range(len(self._stack) - 1, -1, -1):
+            if self._stack[stack_pos].name == tag:
+                break
+
+        else:
+            return None
+
+        while len(self._stack) > stack_pos:
+            element = self._stack.pop()
+
+            if element.list_item is not None:
+                self._open_items.remove(element.list_item)
+
+            if element.name in NON_TEXT_ELEMENTS:
+                self._n_non_text -= 1
+
+    def handle_data(self, data: str) -> None:
+        if self._n_non_text:
+            return None
+
+        for list_item in self._open_items:
+            list_item.text_parts.append(data)
+
+    def _add_list_item(self, element: _Element) -> None:
+        in_bullets = in_table = in_tab = False
+        ancestor = element.parent
+
+        while ancestor is not None:
+            if (
+                ancestor.name == "ul"
+                and ancestor.parent is not None
+                and "mw-parser-output" in ancestor.parent.classes
+            ):
+                in_bullets = True
+
+            if "wikitable" in ancestor.classes:
+                in_table = True
+
+            if "tabs-content" in ancestor.classes:
+                in_tab = True
+
+            ancestor = ancestor.parent
+
+        if not (in_bullets or in_table or in_tab):
+            return None
+
+        list_item = _ListItem()
+        element.list_item = list_item
+        self._open_items.append(list_item)
+
+        for is_member, items in (
+            (in_bullets, self._bullet_items),
+            (in_table, self._table_items),
+            (in_tab, self._tab_items),
+        ):
+            if is_member:
+                items.append(list_item)
+
+    def responses(self) -> list[tuple[str, list[str | None]]]:
+        """
+        Get raw text and audio URLs (None for missing files) of each list item with
+        at least one audio button.
+        """
+        responses = []
+
+        for list_item in self._bullet_items + self._table_items + self._tab_items:
+            if not list_item.buttons:
+                continue
+
+            urls = [
+                parent.first_source["src"] if button["data-state"] == "play" else None
+                for button, parent in list_item.buttons
+            ]
+            responses.append(("".join(list_item.text_parts), urls))
+
+        return responses
@@ -0,0 +1,151 @@
+"""
+Binary snapshot of the response data, loaded at startup instead of parsing the JSON
+files. The snapshot holds the entity data and the columns of the response corpus,
+serialized with `marshal`, behind a header of:
+
+- a magic string, to tell snapshots from other files
+- the format version, bumped whenever the layout of the payload changes
+- the SHA-256 checksum of the payload, to detect truncated or corrupted files
+
+The payload also records size and modification time of the JSON files the snapshot
+was created from. If they don't match the current files anymore, the snapshot is
+stale and the JSON files have to be loaded instead.
+"""
+
+import logging
+import marshal
+import os
+
+from array import array
+from hashlib import sha256
+from typing import NamedTuple
+
+from sili_telegram_bot.models.response_corpus import ResponseCorpus
+from sili_telegram_bot.models.response_types import EntityData
+
+LOGGER = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b"SILIRESP"
+SNAPSHOT_VERSION = 1
+# The corpus arrays are stored as raw bytes, so they can only be read back on
+# platforms with the same item size.
+ITEM_SIZE = array("I").itemsize
+
+VERSION_END = len(SNAPSHOT_MAGIC) + 2
+HEADER_SIZE = VERSION_END + sha256().digest_size
+
+
+class SnapshotData(NamedTuple):
+    entity_data: dict[str, dict[str, EntityData]]
+    corpus: ResponseCorpus
+
+
+def source_stamps(*file_paths: str) -> list[list[int] | None]:
+    """
+    Get modification time and size of the files a snapshot is created from, None for
+    missing files.
+    """
+    stamps = []
+
+    for file_path in file_paths:
+        try:
+            file_stat = os.stat(file_path)
+            stamps.append([file_stat.st_mtime_ns, file_stat.st_size])
+
+        except FileNotFoundError:
+            stamps.append(None)
+
+    return stamps
+
+
+def write_snapshot(
+    snapshot_file: str,
+    entity_data: dict[str, dict[str, EntityData]],
+    corpus: ResponseCorpus,
+    stamps: list[list[int] | None],
+) -> None:
+    """
+    Write a snapshot of entity_data and corpus, created from source files with the
+    given stamps (see `source_stamps()`).
+    """
+    payload = marshal.dumps(
+        {
+            "item_size": ITEM_SIZE,
+            "stamps": stamps,
+            "entity_data": entity_data,
+            "corpus": corpus.to_columns(),
+        }
+    )
+
+    with open(snapshot_file, "wb") as outfile:
+        outfile.write(SNAPSHOT_MAGIC)
+        outfile.write(SNAPSHOT_VERSION.to_bytes(2, "little"))
+        outfile.write(sha256(payload).digest())
+        outfile.write(payload)
+
+
+def read_snapshot(
+    snapshot_file: str, stamps: list[list[int] | None]
+) -> SnapshotData | None:
+    """
+    Read a snapshot, if it exists, is intact, and was created from source files with
+    the given stamps. Returns None otherwise, so the caller can fall back to the
+    source files.
+    """
+    try:
+        with open(snapshot_file, "rb") as infile:
+            content = infile.read()
+
+    except FileNotFoundError:
+        LOGGER.info(f"No response snapshot at '{snapshot_file}'.")
+
+        return None
+
+    magic = content[: len(SNAPSHOT_MAGIC)]
+    version = int.from_bytes(content[len(SNAPSHOT_MAGIC) : VERSION_END], "little")
+    checksum = content[VERSION_END:HEADER_SIZE]
+    payload = content[HEADER_SIZE:]
+
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        LOGGER.warning(
+            f"'{snapshot_file}' is not a response snapshot of version "
+            f"{SNAPSHOT_VERSION}, ignoring it."
+        )
+
+        return None
+
+    if sha256(payload).digest() != checksum:
+        LOGGER.warning(
+            f"Response snapshot '{snapshot_file}' is corrupted, ignoring it."
+        )
+
+        return None
+
+    try:
+        snapshot = marshal.loads(payload)
+
+    # The marshal format may change between Python versions.
+    except (EOFError, ValueError, TypeError) as e:
+        LOGGER.warning(
+            f"Could not read response snapshot '{snapshot_file}': {e}. Ignoring it."
+        )
+
+        return None
+
+    if snapshot["item_size"] != ITEM_SIZE:
+        LOGGER.warning(
+            f"Response snapshot '{snapshot_file}' was created on a different "
+            f"platform, ignoring it."
+        )
+
+        return None
+
+    if snapshot["stamps"] != stamps:
+        LOGGER.info(f"Response snapshot '{snapshot_file}' is stale, ignoring it.")
+
+        return None
+
+    return SnapshotData(
+        entity_data=snapshot["entity_data"],
+        corpus=ResponseCorpus.from_columns(snapshot["corpus"]),
+    )
@@ -0,0 +1,116 @@
+"""
+Process wide store for the response data, shared by everything that needs a
+`Responses` object. The data is only re-read from disk when the underlying files
+changed, and replaced as a whole, so readers never see a half-loaded state.
+"""
+
+import logging
+import os
+import threading
+
+from typing import NamedTuple
+
+from sili_telegram_bot.models.responses import Responses
+from sili_telegram_bot.modules.config import config
+
+VL_CONFIG = config["voicelines"]
+
+LOGGER = logging.getLogger(__name__)
+
+
+class ResponseSnapshot(NamedTuple):
+    responses: Responses
+    # Increases by one every time the data is re-loaded.
+    generation: int
+    file_stamps: tuple
+
+
+class ResponseStore:
+    """
+    With database_file set, responses are read from that response database instead
+    of the JSON files. Otherwise, they are loaded from snapshot_file if it is up to
+    date with the JSON files.
+    """
+
+    def __init__(
+        self,
+        entity_data_file: str = VL_CONFIG["entity_data_file"],
+        resource_file: str = VL_CONFIG["resource_file"],
+        database_file: str | None = (
+            VL_CONFIG["database_file"]
+            if VL_CONFIG["storage_backend"] == "sqlite"
+            else None
+        ),
+        snapshot_file: str | None = VL_CONFIG["snapshot_file"],
+    ) -> None:
+        self.entity_data_file = entity_data_file
+        self.resource_file = resource_file
+        self.database_file = database_file
+        self.snapshot_file = snapshot_file
+        self._snapshot = None
+        self._load_lock = threading.Lock()
+
+    def _get_file_stamps(self) -> tuple:
+        """
+        Get modification time and size of the data files, None for missing files.
+        """
+        stamps = []
+
+        if self.database_file is not None:
+            file_paths = (self.database_file,)
+
+        else:
+            file_paths = (self.entity_data_file, self.resource_file)
+
+        for file_path in file_paths:
+            try:
+                file_stat = os.stat(file_path)
+                stamps.append((file_stat.st_mtime_ns, file_stat.st_size))
+
+            except FileNotFoundError:
+                stamps.append(None)
+
+        return tuple(stamps)
+
+    def get_snapshot(self) -> ResponseSnapshot:
+        """
+        Get the current response data, re-loading it first if the files changed.
+        """
+        file_stamps = self._get_file_stamps()
+        snapshot = self._snapshot
+
+        if snapshot is not None and snapshot.file_stamps == file_stamps:
+            return snapshot
+
+        with self._load_lock:
+            # Another thread might have loaded the data while this one waited.
+            snapshot = self._snapshot
+
+            if snapshot is None or snapshot.file_stamps != file_stamps:
+                LOGGER.info("Response data changed on disk, loading it...")
+                responses = Responses(
+                    entity_data_file=self.entity_data_file,
+                    resource_file=self.resource_file,
+                    database_file=self.database_file,
+                    snapshot_file=self.snapshot_file,
+                )
+                generation = snapshot.generation + 1 if snapshot is not None else 1
+                snapshot = ResponseSnapshot(responses, generation, file_stamps)
+                self._snapshot = snapshot
+
+        return snapshot
+
+    def get_responses(self) -> Responses:
+        return self.get_snapshot().responses
+
+
+default_response_store = ResponseStore()
+
+
+def get_voiceline_link(voiceline_args: dict) -> str:
+    """
+    Look up the link to a voiceline in the shared response store, with voiceline_args
+    as returned by `parse_voiceline_args()`. Defined on module level, so it can be run
+    in a search process pool.
+    """
+    return default_response_store.get_responses().get_link(**voiceline_args)
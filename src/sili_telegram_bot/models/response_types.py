@@ -2,6 +2,7 @@
 Type definitions related to responses & voicelines.
 """
 
+from dataclasses import dataclass
 from typing import TypedDict
 
 
@@ -14,3 +15,24 @@ class EntityData(TypedDict):
     name: str
     title: str
     url: str
+
+
+@dataclass(frozen=True, slots=True)
+class ResponseRecord:
+    """
+    A single response with a playable URL, as offered by the inline search.
+    """
+
+    entity: str
+    type: str
+    text: str
+    level: int
+    url: str
+    result_id: str
+
+    @property
+    def full_response(self) -> str:
+        """
+        Entity name and response text in the format of the voiceline command.
+        """
+        return f"{self.entity}: {self.text}"
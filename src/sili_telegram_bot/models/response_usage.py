@@ -0,0 +1,46 @@
+"""
+Persistent counts of how often each voiceline was sent, by URL, to find the popular
+ones worth keeping at hand.
+
+Meant to be used from the event loop only, so this is NOT thread safe.
+"""
+
+import heapq
+
+from sili_telegram_bot.models.persistent_json import PersistentJson
+from sili_telegram_bot.modules.config import config
+
+RESPONSE_USAGE_PATH = config["dynamic_resources"]["response_usage_path"]
+
+
+class ResponseUsage:
+    """
+    Changes are only written to disk by `save()`.
+    """
+
+    def __init__(self, usage_path: str = RESPONSE_USAGE_PATH) -> None:
+        self._counts = PersistentJson(usage_path, "response usage")
+
+    def __len__(self) -> int:
+        return len(self._counts.data)
+
+    def save(self) -> None:
+        self._counts.save()
+
+    def record(self, url: str) -> None:
+        self._counts.data[url] = self._counts.data.get(url, 0) + 1
+        self._counts.changed()
+
+    def count(self, url: str) -> int:
+        return self._counts.data.get(url, 0)
+
+    def top(self, n: int) -> list[str]:
+        """
+        Get the URLs of the n most used voicelines, most used first.
+        """
+        counts = self._counts.data
+
+        return heapq.nlargest(n, counts, key=counts.get)
+
+
+default_response_usage = ResponseUsage()
@@ -1,20 +1,29 @@
 import json
 import logging
-import os
 import regex
-import requests
 
 from dataclasses import dataclass
-from difflib import get_close_matches
+from functools import lru_cache
 
 from sili_telegram_bot.modules.voiceline_scraping import (
     save_entity_table,
     save_resource,
 )
+from sili_telegram_bot.models.audio_cache import default_audio_cache
+from sili_telegram_bot.models.bk_tree import BKTree
+from sili_telegram_bot.models.entity_resolver import (
+    EntityResolver,
+    load_entity_aliases,
+    strip_name,
+)
 from sili_telegram_bot.models.exceptions import MissingResponseUrlException
+from sili_telegram_bot.models.response_corpus import ResponseCorpus
+from sili_telegram_bot.models.response_db import EntityResponsesView, ResponseDatabase
+from sili_telegram_bot.models.response_snapshot import read_snapshot, source_stamps
 from sili_telegram_bot.modules.config import config
 
 VL_CONFIG = config["voicelines"]
+ENTITY_ALIASES = load_entity_aliases()
 
 LOGGER = logging.getLogger(__name__)
 
@@ -92,9 +101,27 @@ def parse_voiceline_args(args: list[str]) -> dict:
     return ResponseArgs(**args)
 
 
+@lru_cache(maxsize=int(VL_CONFIG["pattern_cache_size"]))
+def compile_line_pattern(
+    line: str, flags: int = regex.IGNORECASE, fuzziness: int | None = None
+) -> regex.Pattern:
+    """
+    Compile the pattern to search a voiceline with. If fuzziness is given, line is
+    matched literally with up to that many errors, otherwise it is used as a regex.
+    Compiled patterns are cached, as the same lines tend to be requested repeatedly.
+    """
+    if fuzziness is not None:
+        line = f"(?:{regex.escape(line)}){{e<={fuzziness}}}"
+
+    return regex.compile(line, flags=flags)
+
+
 class Responses:
     """
-    Interface with the comprehensive response json to retrieve individual lines.
+    Interface with the comprehensive response json to retrieve individual lines. If
+    database_file is given, the data is read from that response database instead. If
+    snapshot_file is given, the JSON data is loaded from that snapshot if it is still
+    up to date with the JSON files.
     """
 
     entity_type_lookup = {
@@ -112,10 +139,46 @@ class Responses:
         self,
         entity_data_file: str = VL_CONFIG["entity_data_file"],
         resource_file: str = VL_CONFIG["resource_file"],
+        database_file: str | None = None,
+        snapshot_file: str | None = None,
     ):
         self.entity_data_file = entity_data_file
         self.resource_file = resource_file
+        self.database_file = database_file
+        self.snapshot_file = snapshot_file
+        self._database = None
+        self._entity_resolvers = {}
+        self._name_tree = None
+
+        if database_file is not None:
+            self._database = ResponseDatabase(database_file)
+            self.entity_data = self._database.load_entity_data()
+            self.entity_responses = EntityResponsesView(self._database)
+
+        elif not self._load_snapshot(snapshot_file):
+            self._load_json_files(entity_data_file, resource_file)
 
+    def _load_snapshot(self, snapshot_file: str | None) -> bool:
+        """
+        Load the data from snapshot_file, if given and up to date. Returns whether the
+        data was loaded.
+        """
+        if snapshot_file is None:
+            return False
+
+        snapshot = read_snapshot(
+            snapshot_file, source_stamps(self.entity_data_file, self.resource_file)
+        )
+
+        if snapshot is None:
+            return False
+
+        self.entity_data = snapshot.entity_data
+        self.entity_responses = snapshot.corpus
+
+        return True
+
+    def _load_json_files(self, entity_data_file: str, resource_file: str) -> None:
         try:
             with open(entity_data_file, "r") as infile:
                 self.entity_data = json.load(infile)
@@ -138,7 +201,7 @@ class Responses:
 
         try:
             with open(resource_file, "r") as infile:
-                self.entity_responses = json.load(infile)
+                self.entity_responses = ResponseCorpus(json.load(infile))
 
         except FileNotFoundError as e:
             raise FileNotFoundError(
@@ -168,39 +231,121 @@ class Responses:
 
         return self.entity_data[key]
 
-    def _get_response_list(
-        self, name: str, fuzzy_match: bool = False, *args, **kwargs
-    ) -> list | None:
-        type_data = self._get_type_data(*args, **kwargs)
+    def _get_page_responses(self, page_title: str, text: str | None = None) -> list:
+        """
+        Get the responses on a page. If text is given and the data comes from the
+        response database, only responses that might fuzzily contain it are fetched.
+        """
+        if self._database is not None:
+            return self._database.get_page_responses(page_title, text)
 
-        if fuzzy_match:
-            all_names = [entity["name"] for entity in type_data.values()]
-            match_names = get_close_matches(name, all_names, n=int(1e9), cutoff=0.2)
+        return self.entity_responses[page_title]
 
-            matches = [type_data[name] for name in match_names]
+    def get_corpus(self) -> ResponseCorpus:
+        """
+        Get all responses as a corpus. With the response database, this loads all of
+        them into memory.
+        """
+        if isinstance(self.entity_responses, ResponseCorpus):
+            return self.entity_responses
 
-        else:
-            matches = [
-                value for key, value in type_data.items() if key.lower() == name.lower()
-            ]
+        return ResponseCorpus(self.entity_responses)
+
+    def _get_entity_resolver(self, entity_type: str) -> EntityResolver:
+        """
+        Get the resolver for the names of the entities of a type, created on first use.
+        """
+        resolver = self._entity_resolvers.get(entity_type)
+
+        if resolver is None:
+            resolver = EntityResolver(
+                [*self._get_type_data(entity_type).keys()],
+                ENTITY_ALIASES.get(entity_type),
+            )
+            self._entity_resolvers[entity_type] = resolver
+
+        return resolver
+
+    def _get_name_tree(self) -> BKTree:
+        """
+        Get the BK-tree over the (stripped) names of the entities of all types, with
+        (entity type, entity name) as values. Created on first use.
+        """
+        if self._name_tree is None:
+            name_tree = BKTree()
 
-        if matches:
-            # Ignore potential multi-matches for now.
-            # FIXME No longer do that.
-            return matches[0]
+            for entity_type, type_name in self.entity_type_lookup.items():
+                for entity_name in self.entity_data.get(type_name, {}):
+                    name_tree.add(strip_name(entity_name), (entity_type, entity_name))
+
+            self._name_tree = name_tree
+
+        return self._name_tree
+
+    def get_entity_candidates(
+        self, name: str, entity_type: str = "hero", max_n: int = 5
+    ) -> list[str]:
+        """
+        Get the names of the entities of a type that name might refer to, best first:
+        The exact or alias match, names within a few edits of it (closest first), and
+        names sharing the most trigrams with it.
+        """
+        resolver = self._get_entity_resolver(entity_type)
+        candidates = []
+        exact_name = resolver.resolve_exact(name)
+
+        if exact_name is not None:
+            candidates.append(exact_name)
+
+        stripped_name = strip_name(name)
+        # Short names are within a few edits of way too many others.
+        max_edits = min(int(VL_CONFIG["max_name_edits"]), len(stripped_name) // 4)
+
+        for _, _, (match_type, entity_name) in self._get_name_tree().search(
+            stripped_name, max_edits
+        ):
+            if match_type == entity_type and not entity_name in candidates:
+                candidates.append(entity_name)
+
+        for entity_name in resolver.similar_names(name):
+            if not entity_name in candidates:
+                candidates.append(entity_name)
+
+        return candidates[:max_n]
+
+    def _get_response_list(
+        self, name: str, fuzzy_match: bool = False, entity_type: str = "hero"
+    ) -> dict | None:
+        type_data = self._get_type_data(entity_type)
+
+        if fuzzy_match:
+            candidates = self.get_entity_candidates(name, entity_type, max_n=1)
+            entity_name = candidates[0] if candidates else None
 
         else:
+            entity_name = self._get_entity_resolver(entity_type).resolve_exact(name)
+
+        if entity_name is None:
             return None
 
+        return type_data[entity_name]
+
     def get_response_url(
         self,
         name: str,
         pattern: str | regex.Pattern,
         entity_type: str = "hero",
         level: int = 0,
+        text: str | None = None,
     ) -> str:
-        """Retrieve the response url for a particular response."""
-        re_pattern = regex.compile(pattern)
+        """
+        Retrieve the response url for a particular response. text is the plain line
+        pattern fuzzily matches, if known. Responses containing text verbatim are
+        looked for first, and the pattern is only used if there are none.
+        """
+        if not isinstance(pattern, regex.Pattern):
+            pattern = compile_line_pattern(pattern, flags=0)
+
         name_match = self._get_response_list(
             name, entity_type=entity_type, fuzzy_match=True
         )
@@ -210,23 +355,44 @@ class Responses:
 
         matched_name = name_match["name"]
 
-        name_responses = self.entity_responses[name_match["title"]]
+        name_responses = self._get_page_responses(name_match["title"], text)
 
-        match_responses = [
-            resp for resp in name_responses if regex.search(re_pattern, resp["text"])
-        ]
+        response = None
+
+        if text is not None:
+            lower_text = text.lower()
+            response = next(
+                (resp for resp in name_responses if lower_text in resp["text"].lower()),
+                None,
+            )
 
-        if not match_responses:
+        if response is None:
+            response = next(
+                (resp for resp in name_responses if pattern.search(resp["text"])),
+                None,
+            )
+
+        if response is None:
             response_url = name_match["url"]
-            raise Exception(
+            exception_text = (
                 f"Could not find line for '{matched_name}'. Check the responses page to see "
                 f"if you typed it correctly: {response_url}"
             )
+            other_names = [
+                entity_name
+                for entity_name in self.get_entity_candidates(name, entity_type)
+                if entity_name != matched_name
+            ]
+
+            if other_names:
+                exception_text += (
+                    f" Other entities matching '{name}': {', '.join(other_names)}."
+                )
+
+            raise Exception(exception_text)
 
         # FIXME In the future, return all matched responses and let the user choose
         # which they want.
-        response = match_responses[0]
-
         response_urls = response["urls"]
 
         available_urls = [
@@ -262,38 +428,23 @@ class Responses:
         return response_urls[level]
 
     def get_link(self, entity, line, type="hero", level=0):
-        fuzzy_rules = "{e<=1}"
+        text = None
 
         if regex.search(r"^\".+\"", line):
-            line = line.strip('"')
-            line_re = regex.compile(line, flags=regex.IGNORECASE)
+            line_re = compile_line_pattern(line.strip('"'))
 
         else:
-            line_re = regex.compile(
-                f"(?:{regex.escape(line)}){fuzzy_rules}", flags=regex.IGNORECASE
-            )
+            text = line
+            line_re = compile_line_pattern(line, fuzziness=1)
 
         return self.get_response_url(
-            name=entity, entity_type=type, pattern=line_re, level=level
+            name=entity, entity_type=type, pattern=line_re, level=level, text=text
         )
 
-    def download_mp3(self, link):
-        file_name_match = regex.search(r"[^\/]*.mp3", link)
-
-        if not file_name_match:
-            raise (
-                f"Could not extract file name from link. Is the link "
-                f"correct? {link}"
-            )
-
-        file_path = os.path.join("resources", file_name_match.group())
-
-        dl_response = requests.get(link)
-
-        if not dl_response.status_code == 200:
-            raise (f"Could not get a positive response from {link}")
-
-        dl_file_handle = open(file_path, "wb")
-        dl_file_handle.write(dl_response.content)
-
-        return file_path
+    @staticmethod
+    async def download_mp3(link: str) -> str:
+        """
+        Get the path of the audio file at link, from the audio cache. The file belongs
+        to the cache, so it must not be removed.
+        """
+        return await default_audio_cache.get_file(link)
@@ -0,0 +1,113 @@
+"""
+Checkpoint of the response pages scraped so far, so an interrupted scrape can resume
+instead of starting over. Pages are appended to a JSON lines file as they are done,
+each with the revision it was scraped at, and only count as done as long as that is
+still the page's latest revision.
+"""
+
+import json
+import logging
+import os
+
+from sili_telegram_bot.models.response_types import EntityResponse
+from sili_telegram_bot.modules.config import config
+
+VL_CONFIG = config["voicelines"]
+
+LOGGER = logging.getLogger(__name__)
+
+
+class ScrapeCheckpoint:
+
+    def __init__(self, checkpoint_file: str = VL_CONFIG["checkpoint_file"]) -> None:
+        self.checkpoint_file = checkpoint_file
+        # Revision id and responses by page title.
+        self._pages = {}
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._pages)
+
+    def _load(self) -> None:
+        """
+        Read the pages checkpointed so far. A partially written last line, left by an
+        interruption, is cut off so new pages can be appended after it.
+        """
+        try:
+            with open(self.checkpoint_file, "rb") as infile:
+                content = infile.read()
+
+        except FileNotFoundError:
+            return None
+
+        valid_end = 0
+
+        for line in content.splitlines(keepends=True):
+            try:
+                page = json.loads(line)
+
+            except json.JSONDecodeError:
+                break
+
+            if not line.endswith(b"\n"):
+                break
+
+            self._pages[page["title"]] = (page["revision"], page["responses"])
+            valid_end += len(line)
+
+        if valid_end < len(content):
+            LOGGER.warning(
+                f"Discarding a partially written page in '{self.checkpoint_file}'."
+            )
+
+            with open(self.checkpoint_file, "r+b") as outfile:
+                outfile.truncate(valid_end)
+
+        LOGGER.info(
+            f"Resuming from {len(self._pages)} checkpointed pages in "
+            f"'{self.checkpoint_file}'."
+        )
+
+    def get(self, page_title: str, revision: int | None) -> list[EntityResponse] | None:
+        """
+        Get the checkpointed responses of a page, if they were scraped at revision.
+        """
+        page = self._pages.get(page_title)
+
+        if revision is None or page is None or page[0] != revision:
+            return None
+
+        return page[1]
+
+    def add(
+        self, page_title: str, revision: int | None, responses: list[EntityResponse]
+    ) -> None:
+        """
+        Checkpoint the responses of a page scraped at revision. Pages without a known
+        revision can't be checked for changes later, so they are not checkpointed.
+        """
+        if revision is None:
+            return None
+
+        line = json.dumps(
+            {"title": page_title, "revision": revision, "responses": responses}
+        )
+
+        with open(self.checkpoint_file, "a") as outfile:
+            outfile.write(line + "\n")
+            outfile.flush()
+            os.fsync(outfile.fileno())
+
+        self._pages[page_title] = (revision, responses)
+
+    def clear(self) -> None:
+        """
+        Remove the checkpoint, once the scraped data is in place.
+        """
+        self._pages = {}
+
+        try:
+            os.remove(self.checkpoint_file)
+
+        except FileNotFoundError:
+            pass
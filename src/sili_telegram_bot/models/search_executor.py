@@ -0,0 +1,136 @@
+"""
+Run CPU-bound searches (matching responses, looking up voicelines) outside of the
+asyncio event loop, so a single slow search can't stall every other update.
+
+Searches run either in a thread pool, or in a process pool. With a process pool, each
+worker holds its own copy of the response data, so the pool has to be reset whenever
+that data is updated.
+
+Searches nobody waits for anymore, as they missed their deadline or their caller was
+cancelled, are abandoned. Running searches can't be interrupted from the outside, but
+searches run in a thread pool can be asked to stop via a cancel event (see `run()`).
+Abandoned searches keep occupying a worker until they are done. While all workers are
+busy with them, new searches fail right away instead of queueing up behind them.
+"""
+
+import asyncio
+import logging
+import threading
+
+from concurrent.futures import (
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from functools import partial
+from typing import Any, Callable
+
+from sili_telegram_bot.models.exceptions import SearchTimeoutException
+from sili_telegram_bot.modules.config import config
+
+EXECUTOR_CONFIG = config["search_executor"]
+
+LOGGER = logging.getLogger(__name__)
+
+
+class SearchExecutor:
+
+    executor_types = {"thread": ThreadPoolExecutor, "process": ProcessPoolExecutor}
+
+    def __init__(
+        self,
+        kind: str = EXECUTOR_CONFIG["kind"],
+        max_workers: int = int(EXECUTOR_CONFIG["max_workers"]),
+        deadline_secs: float = float(EXECUTOR_CONFIG["deadline_secs"]),
+    ) -> None:
+        if not kind in self.executor_types:
+            raise ValueError(f"Unknown search executor kind: '{kind}'")
+
+        self.kind = kind
+        self.max_workers = max_workers
+        self.deadline_secs = deadline_secs
+        self._executor = None
+        # Futures of searches that were abandoned but are still running.
+        self._abandoned = set()
+
+    def _get_or_create_executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = self.executor_types[self.kind](
+                max_workers=self.max_workers
+            )
+
+        return self._executor
+
+    async def run(
+        self, func: Callable, *args, cancellable: bool = False, **kwargs
+    ) -> Any:
+        """
+        Run func in the pool and wait for the result, for at most the deadline. When
+        using a process pool, func and its arguments need to be picklable.
+
+        If cancellable, func is passed a `cancel_event` keyword argument, which is set
+        once the search is abandoned, and func should then stop as soon as possible.
+        Events can't be shared with a process pool, so it's None there.
+        """
+        if len(self._abandoned) >= self.max_workers:
+            raise SearchTimeoutException(
+                f"All {self.max_workers} search workers are still busy with searches "
+                f"that were abandoned."
+            )
+
+        cancel_event = None
+
+        if cancellable:
+            cancel_event = threading.Event() if self.kind == "thread" else None
+            kwargs["cancel_event"] = cancel_event
+
+        future = self._get_or_create_executor().submit(partial(func, *args, **kwargs))
+
+        try:
+            return await asyncio.wait_for(
+                asyncio.wrap_future(future), timeout=self.deadline_secs
+            )
+
+        except asyncio.TimeoutError:
+            self._abandon(future, cancel_event)
+
+            raise SearchTimeoutException(
+                f"Search did not finish within {self.deadline_secs} seconds."
+            )
+
+        except asyncio.CancelledError:
+            self._abandon(future, cancel_event)
+
+            raise
+
+    def _abandon(self, future: Future, cancel_event: threading.Event | None) -> None:
+        """
+        Stop waiting for a search. If it is running already, it keeps its worker busy
+        until it stops or is done.
+        """
+        if cancel_event is not None:
+            cancel_event.set()
+
+        if not future.done():
+            self._abandoned.add(future)
+            future.add_done_callback(self._abandoned.discard)
+            LOGGER.warning(
+                f"{len(self._abandoned)} of {self.max_workers} search workers busy "
+                f"with abandoned searches."
+            )
+
+    def reset(self) -> None:
+        """
+        Replace the pool with a fresh one on next use. Process pool workers thereby
+        drop their copies of outdated response data.
+        """
+        if self.kind == "process" and self._executor is not None:
+            LOGGER.info("Resetting search process pool...")
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            # Searches still running in the old pool don't occupy the new one.
+            self._abandoned = set()
+
+
+default_search_executor = SearchExecutor()
@@ -0,0 +1,33 @@
+"""
+In-memory pool of strings for the inline search to find matches in.
+"""
+
+from collections.abc import Iterator, Sequence
+
+from sili_telegram_bot.models.trigram_index import TrigramIndex
+
+
+class SearchPool:
+    """
+    Strings to search, each with the position its response text starts at (0 for a
+    bare response text). The id of a string is its position in texts. Candidates for
+    a query are narrowed down via a `TrigramIndex` over the strings.
+    """
+
+    def __init__(self, texts: list[str], text_starts: Sequence[int]) -> None:
+        self.texts = texts
+        self.text_starts = text_starts
+        self.trigram_index = TrigramIndex(texts)
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def candidates(
+        self, query: str, tolerance: int = 1
+    ) -> Iterator[tuple[int, str, int]]:
+        """
+        Get id, string and text start of all strings that might contain query with at
+        most tolerance errors, in ascending order of ids.
+        """
+        for text_id in self.trigram_index.candidates(query, tolerance=tolerance):
+            yield text_id, self.texts[text_id], self.text_starts[text_id]
@@ -0,0 +1,113 @@
+"""
+Trigram inverted index to narrow down candidates for fuzzy substring searches. Shorter
+grams are indexed as well, so short queries can be narrowed down too.
+"""
+
+from array import array
+from collections import defaultdict
+from typing import Iterable
+
+NGRAM_SIZE = 3
+
+
+def ngrams(text: str, n: int = NGRAM_SIZE) -> set[str]:
+    """
+    Get the set of all n-grams of a string.
+    """
+    return {text[i : i + n] for i in range(len(text) - n + 1)}
+
+
+def split_query(query: str, n_pieces: int) -> list[str]:
+    """
+    Split a query into n_pieces contiguous, (almost) equally long pieces.
+    """
+    piece_len, remainder = divmod(len(query), n_pieces)
+
+    pieces = []
+    start = 0
+
+    for i in range(n_pieces):
+        end = start + piece_len + (1 if i < remainder else 0)
+        pieces.append(query[start:end])
+        start = end
+
+    return pieces
+
+
+class TrigramIndex:
+    """
+    Map each trigram of a list of (lower cased) strings to the sorted ids of the
+    strings containing it. The id of a string is its position in the list it was
+    built from.
+
+    Candidates for a search with up to k errors are found via the pigeonhole
+    principle: If the query is split into k + 1 pieces, any match with at most k
+    errors has to contain at least one of these pieces verbatim. Every string
+    containing a piece also contains all trigrams of that piece. Pieces shorter than
+    a trigram are looked up directly, as all 1- and 2-grams are indexed as well.
+    """
+
+    def __init__(self, texts: Iterable[str]) -> None:
+        postings = defaultdict(lambda: array("I"))
+        n_texts = 0
+
+        for text_id, text in enumerate(texts):
+            text = text.lower()
+
+            for n in range(1, NGRAM_SIZE + 1):
+                for gram in ngrams(text, n):
+                    postings[gram].append(text_id)
+
+            n_texts += 1
+
+        # Ids are added in ascending order, so every posting list is sorted.
+        self._postings = dict(postings)
+        self._n_texts = n_texts
+
+    def __len__(self) -> int:
+        return self._n_texts
+
+    def _ids_containing(self, piece: str) -> set[int]:
+        """
+        Get the ids of all strings containing every trigram of piece, or the piece
+        itself if it's shorter than a trigram.
+        """
+        posting_lists = []
+
+        for gram in ngrams(piece) if len(piece) >= NGRAM_SIZE else {piece}:
+            posting_list = self._postings.get(gram)
+
+            if posting_list is None:
+                return set()
+
+            posting_lists.append(posting_list)
+
+        # Start with the rarest trigram to keep the intermediate sets small.
+        posting_lists.sort(key=len)
+        ids = set(posting_lists[0])
+
+        for posting_list in posting_lists[1:]:
+            ids.intersection_update(posting_list)
+
+            if not ids:
+                break
+
+        return ids
+
+    def candidates(self, query: str, tolerance: int = 1) -> list[int] | range:
+        """
+        Get the sorted ids of all strings that might contain query with at most
+        tolerance errors. If the query is too short to be split into tolerance + 1
+        non-empty pieces, all ids are returned.
+        """
+        pieces = split_query(query.lower(), tolerance + 1)
+
+        if not all(pieces):
+            return range(self._n_texts)
+
+        candidate_ids = set()
+
+        for piece in pieces:
+            candidate_ids |= self._ids_containing(piece)
+
+        return sorted(candidate_ids)
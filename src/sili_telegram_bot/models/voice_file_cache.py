@@ -0,0 +1,46 @@
+"""
+Persistent map of voiceline URLs to the ids Telegram assigned to them once uploaded.
+Voicelines sent by file id don't need to be downloaded and uploaded again.
+
+Meant to be used from the event loop only, so this is NOT thread safe.
+"""
+
+from sili_telegram_bot.models.persistent_json import PersistentJson
+from sili_telegram_bot.modules.config import config
+
+VOICE_FILE_ID_PATH = config["dynamic_resources"]["voice_file_id_path"]
+
+
+class VoiceFileCache:
+    """
+    Changes are only written to disk by `save()`.
+    """
+
+    def __init__(self, cache_path: str = VOICE_FILE_ID_PATH) -> None:
+        self._file_ids = PersistentJson(cache_path, "voice file ids")
+
+    def __len__(self) -> int:
+        return len(self._file_ids.data)
+
+    def save(self) -> None:
+        self._file_ids.save()
+
+    def get(self, url: str) -> str | None:
+        return self._file_ids.data.get(url)
+
+    def put(self, url: str, file_id: str) -> None:
+        if self._file_ids.data.get(url) == file_id:
+            return None
+
+        self._file_ids.data[url] = file_id
+        self._file_ids.changed()
+
+    def remove(self, url: str) -> None:
+        """
+        Forget the file id of url, e.g. because Telegram doesn't accept it anymore.
+        """
+        if self._file_ids.data.pop(url, None) is not None:
+            self._file_ids.changed()
+
+
+default_voice_file_cache = VoiceFileCache()
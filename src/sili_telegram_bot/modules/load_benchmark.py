@@ -0,0 +1,73 @@
+"""
+Benchmark loading the response data from the JSON files against loading it from a
+binary snapshot of the same data.
+"""
+
+import os
+import time
+
+from tempfile import TemporaryDirectory
+
+from sili_telegram_bot.models.response_snapshot import source_stamps, write_snapshot
+from sili_telegram_bot.models.responses import Responses
+from sili_telegram_bot.modules.config import config
+
+VL_CONFIG = config["voicelines"]
+
+
+def time_loading(n_runs: int, **responses_kwargs) -> float:
+    """
+    Get the fastest of n_runs times (in seconds) to create a `Responses` object.
+    """
+    timings = []
+
+    for _ in range(n_runs):
+        start = time.perf_counter()
+        Responses(**responses_kwargs)
+        timings.append(time.perf_counter() - start)
+
+    return min(timings)
+
+
+def load_benchmark(
+    entity_data_file: str = VL_CONFIG["entity_data_file"],
+    resource_file: str = VL_CONFIG["resource_file"],
+    n_runs: int = 5,
+) -> dict[str, float]:
+    """
+    Time loading the response data from JSON and from a snapshot. The snapshot is
+    created in a temp dir, so the benchmark works without one being configured.
+    """
+    json_files = {"entity_data_file": entity_data_file, "resource_file": resource_file}
+    responses = Responses(**json_files)
+
+    with TemporaryDirectory() as temp_dir:
+        snapshot_file = os.path.join(temp_dir, "responses.snapshot")
+        write_snapshot(
+            snapshot_file,
+            entity_data=responses.entity_data,
+            corpus=responses.get_corpus(),
+            stamps=source_stamps(entity_data_file, resource_file),
+        )
+
+        return {
+            "json_bytes": sum(os.path.getsize(file) for file in json_files.values()),
+            "snapshot_bytes": os.path.getsize(snapshot_file),
+            "json_secs": time_loading(n_runs, **json_files),
+            "snapshot_secs": time_loading(
+                n_runs, snapshot_file=snapshot_file, **json_files
+            ),
+        }
+
+
+def print_load_benchmark() -> None:
+    report = load_benchmark()
+    mib = 2**20
+
+    print(
+        f"JSON:     {report['json_secs'] * 1000:8.1f} ms "
+        f"({report['json_bytes'] / mib:.2f} MiB)\n"
+        f"Snapshot: {report['snapshot_secs'] * 1000:8.1f} ms "
+        f"({report['snapshot_bytes'] / mib:.2f} MiB, "
+        f"{report['json_secs'] / report['snapshot_secs']:.1f}x faster)"
+    )
@@ -0,0 +1,141 @@
+"""
+Report the memory footprint of the response data, comparing the compact corpus to
+the plain JSON data plus a dict of records per full response it replaced.
+"""
+
+import json
+import sys
+
+from hashlib import md5
+from types import FunctionType, ModuleType
+
+from sili_telegram_bot.models.response_corpus import ResponseRecordTable
+from sili_telegram_bot.models.response_types import ResponseRecord
+from sili_telegram_bot.models.responses import Responses
+from sili_telegram_bot.modules.config import config
+
+VL_CONFIG = config["voicelines"]
+
+
+def deep_sizeof(*objs: object) -> int:
+    """
+    Get the size in bytes of objects and everything reachable from them. Objects
+    reachable multiple times (like interned strings) are only counted once.
+    """
+    seen = set()
+    stack = list(objs)
+    total_size = 0
+
+    while stack:
+        obj = stack.pop()
+
+        if id(obj) in seen or isinstance(obj, (type, ModuleType, FunctionType)):
+            continue
+
+        seen.add(id(obj))
+        total_size += sys.getsizeof(obj)
+
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+
+        if hasattr(obj, "__dict__"):
+            stack.append(obj.__dict__)
+
+        for cls in type(obj).__mro__:
+            for slot in getattr(cls, "__slots__", ()):
+                if hasattr(obj, slot):
+                    stack.append(getattr(obj, slot))
+
+    return total_size
+
+
+def legacy_search_records(
+    entity_data: dict, response_data: dict, type_lookup: dict[str, str]
+) -> dict[str, ResponseRecord]:
+    """
+    Create the dict of full responses to their records, as kept by the inline search
+    before the compact corpus.
+    """
+    full_response_dict = {}
+
+    for type_name, type_data in entity_data.items():
+        entity_type = type_lookup.get(type_name, type_name)
+
+        for entity_name, entity_dict in type_data.items():
+            for response_dict in response_data[entity_dict["title"]]:
+                available_levels = [
+                    (level, url)
+                    for level, url in enumerate(response_dict["urls"])
+                    if url
+                ]
+
+                if not available_levels:
+                    continue
+
+                level, url = available_levels[-1]
+                full_response = f"{entity_name}: {response_dict['text']}"
+                full_response_dict[full_response] = ResponseRecord(
+                    entity=entity_name,
+                    type=entity_type,
+                    text=response_dict["text"],
+                    level=level,
+                    url=url,
+                    result_id=md5(bytes(full_response, encoding="utf-8")).hexdigest(),
+                )
+
+    return full_response_dict
+
+
+def memory_report(
+    entity_data_file: str = VL_CONFIG["entity_data_file"],
+    resource_file: str = VL_CONFIG["resource_file"],
+) -> dict[str, int]:
+    """
+    Measure the bytes taken up by the response data in the legacy and the compact
+    layout. The search index is the same for both, so it's left out.
+    """
+    type_lookup = {
+        long_name: short_name
+        for short_name, long_name in Responses.entity_type_lookup.items()
+    }
+
+    with open(entity_data_file, "r") as infile:
+        entity_data = json.load(infile)
+
+    with open(resource_file, "r") as infile:
+        response_data = json.load(infile)
+
+    legacy_records = legacy_search_records(entity_data, response_data, type_lookup)
+    legacy_size = deep_sizeof(entity_data, response_data, legacy_records)
+    del entity_data, response_data, legacy_records
+
+    responses = Responses(
+        entity_data_file=entity_data_file, resource_file=resource_file
+    )
+    corpus = responses.get_corpus()
+    record_table = ResponseRecordTable(corpus, responses.entity_data, type_lookup)
+
+    return {
+        "legacy_bytes": legacy_size,
+        "compact_bytes": deep_sizeof(responses.entity_data, corpus, record_table),
+        "n_responses": len(corpus.texts),
+        "n_records": len(record_table),
+        "n_urls": len(corpus.urls),
+    }
+
+
+def print_memory_report() -> None:
+    report = memory_report()
+    mib = 2**20
+
+    print(
+        f"{report['n_responses']} responses, {report['n_records']} searchable "
+        f"records, {report['n_urls']} distinct URLs.\n"
+        f"Legacy layout:  {report['legacy_bytes'] / mib:8.2f} MiB\n"
+        f"Compact layout: {report['compact_bytes'] / mib:8.2f} MiB "
+        f"({report['compact_bytes'] / report['legacy_bytes']:.0%})"
+    )
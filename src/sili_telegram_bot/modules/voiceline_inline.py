@@ -2,177 +2,855 @@
 Provide in-line searching for responses.
 """
 
+import asyncio
+import heapq
 import logging
 import regex
-
-from hashlib import md5
-from itertools import islice
-from telegram import InlineQueryResultVoice, Update
+import threading
+
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from telegram import InlineQuery, InlineQueryResultVoice, Update
 from telegram.error import BadRequest
-from telegram.ext import Application, CallbackContext, InlineQueryHandler
+from telegram.ext import (
+    Application,
+    CallbackContext,
+    ChosenInlineResultHandler,
+    InlineQueryHandler,
+)
+
+
+from sili_telegram_bot.models.exceptions import (
+    SearchCancelledException,
+    SearchTimeoutException,
+)
+from sili_telegram_bot.models.inline_query_tracker import InlineQueryTracker
+from sili_telegram_bot.models.query_cache import QueryResultCache
+from sili_telegram_bot.models.response_corpus import ResponseRecordTable
+from sili_telegram_bot.models.response_db import (
+    RecordSearchPool,
+    RecordTableView,
+    ResponseDatabase,
+)
+from sili_telegram_bot.models.response_store import (
+    default_response_store,
+    ResponseSnapshot,
+)
+from sili_telegram_bot.models.response_types import ResponseRecord
+from sili_telegram_bot.models.response_usage import default_response_usage
+from sili_telegram_bot.models.responses import Responses
+from sili_telegram_bot.models.search_executor import (
+    default_search_executor,
+    SearchExecutor,
+)
+from sili_telegram_bot.models.search_pool import SearchPool
+from sili_telegram_bot.modules.config import config
+
+INLINE_CONFIG = config["inline_voicelines"]
 
+LOGGER = logging.getLogger(__name__)
 
-from sili_telegram_bot.models.responses import Responses, parse_voiceline_args
+QUERY_CACHE = QueryResultCache(
+    max_size=int(INLINE_CONFIG["cache_size"]),
+    ttl_secs=float(INLINE_CONFIG["cache_ttl_secs"]),
+)
+# Ranks of all matches of queries that were paged past their first page.
+RANKED_MATCH_CACHE = QueryResultCache(
+    max_size=int(INLINE_CONFIG["ranked_cache_size"]),
+    ttl_secs=float(INLINE_CONFIG["cache_ttl_secs"]),
+)
+QUERY_TRACKER = InlineQueryTracker()
 
-LOGGER = logging.getLogger(__name__)
 
+@dataclass(frozen=True)
+class ResponseSearchData:
+    """
+    Everything the inline search works on, created together from the same response
+    data. Swapped out as a whole on updates, so queries never see a mix of old and new
+    data. With the response database, records and the pool of full responses are
+    read from it, instead of being kept in memory.
+    """
 
-class LazyResponseDict:
+    generation: int
+    record_table: ResponseRecordTable | RecordTableView
+    search_pool: SearchPool | RecordSearchPool
+    # Ids of the responses of each entity, by lower cased entity name.
+    entity_response_ids: dict[str, array]
+    entity_searches: dict[str, "EntitySearchData"] = field(default_factory=dict)
+    voice_results: dict[str, InlineQueryResultVoice] = field(default_factory=dict)
+
+    def get_or_create_voice_result(
+        self, record: ResponseRecord
+    ) -> InlineQueryResultVoice:
+        """
+        Get the inline result for a response record. Results are created on first use
+        and shared between all queries until the next update.
+        """
+        voice_result = self.voice_results.get(record.result_id)
 
-    _RESPONSES = None
-    _FULL_RESPONSE_DICT = None
+        if voice_result is None:
+            voice_result = create_voice_result(record)
+            self.voice_results[record.result_id] = voice_result
 
-    @classmethod
-    def _get_or_create_response_obj(cls) -> Responses:
-        if cls._RESPONSES is None:
-            cls._RESPONSES = Responses()
+        return voice_result
 
-        return cls._RESPONSES
+    def get_or_create_entity_search(self, entity_key: str) -> "EntitySearchData":
+        """
+        Get the search data for the responses of a single entity. These are created
+        on first use.
+        """
+        entity_search = self.entity_searches.get(entity_key)
+
+        if entity_search is None:
+            response_ids = self.entity_response_ids[entity_key]
+            texts = [
+                self.record_table.text(response_id) for response_id in response_ids
+            ]
+            entity_search = EntitySearchData(
+                response_ids=response_ids,
+                search_pool=SearchPool(texts, array("I", bytes(4 * len(texts)))),
+            )
+            self.entity_searches[entity_key] = entity_search
+
+        return entity_search
+
+
+@dataclass(frozen=True)
+class EntitySearchData:
+    """
+    Sub-index over the response texts of a single entity. Ids refer to positions in
+    response_ids, which hold the ids in the full search data.
+    """
+
+    response_ids: Sequence[int]
+    search_pool: SearchPool
+
+
+@dataclass(frozen=True)
+class SearchPage:
+    """
+    One page of inline results. An empty next_offset means there are no more pages.
+    """
+
+    records: list[ResponseRecord]
+    next_offset: str
+
+
+class LazyResponseDict:
+
+    _RESPONSE_STORE = default_response_store
+    _SOURCE_SNAPSHOT = None
+    _SEARCH_DATA = None
+    _BUILD_LOCK = threading.Lock()
+    # Check for changed response data started from the event loop, if any.
+    _REFRESH_FUTURE = None
 
     @classmethod
-    def _create_full_response_dict(
-        cls, entity_data: dict, response_data: dict
-    ) -> dict[str, str]:
+    def _build_search_data(cls, snapshot: ResponseSnapshot) -> None:
         """
-        Create a dict mapping full response info to the response url. The info
-        consists of: Entity name (entity_type): Response text (url_level)
-        This corresponds to the format of the voiceline command.
+        Build the search data for the current responses. With the response database,
+        records are looked up in it and candidates narrowed down via its FTS index.
+        Otherwise (or if the database predates the records), the records are kept in
+        memory, with an in-memory index.
         """
-        full_response_dict = {}
+        responses = snapshot.responses
+        short_type_lookup = {
+            long_name: short_name
+            for short_name, long_name in Responses.entity_type_lookup.items()
+        }
+
+        database = (
+            ResponseDatabase(responses.database_file)
+            if responses.database_file is not None
+            else None
+        )
 
-        # FIXME Switch to SQLite DB and remove these ghastly loops.
-        for type_data in entity_data.values():
-            for entity_name, entity_dict in type_data.items():
-                entity_title = entity_dict["title"]
-                for response_dict in response_data[entity_title]:
-                    response_text = response_dict["text"]
+        if database is not None and not database.has_records():
+            LOGGER.warning(
+                "Response database has no records for inline search, falling back "
+                "to loading all responses. Scrape the responses again to fix this."
+            )
+            database = None
 
-                    for url in response_dict["urls"]:
-                        full_response = f"{entity_name}: {response_text}"
+        if database is not None:
+            record_table = RecordTableView(database, short_type_lookup)
+            search_pool = RecordSearchPool(database)
 
-                        if url:
-                            full_response_dict[full_response] = url
+        else:
+            record_table = ResponseRecordTable(
+                responses.get_corpus(), responses.entity_data, short_type_lookup
+            )
+            search_pool = SearchPool(
+                record_table.full_responses, record_table.text_starts
+            )
+
+        entity_response_ids = defaultdict(lambda: array("I"))
+
+        for response_id, entity_name in enumerate(record_table.entity_names()):
+            entity_key = normalize_query(entity_name)
+            entity_response_ids[entity_key].append(response_id)
 
-        return full_response_dict
+        previous_generation = (
+            cls._SEARCH_DATA.generation if cls._SEARCH_DATA is not None else 0
+        )
+
+        # Cached results are keyed by generation, so entries for the old data can't
+        # be returned anymore even if they are added after clearing.
+        cls._SEARCH_DATA = ResponseSearchData(
+            generation=previous_generation + 1,
+            record_table=record_table,
+            search_pool=search_pool,
+            entity_response_ids=dict(entity_response_ids),
+        )
+        cls._SOURCE_SNAPSHOT = snapshot
+        QUERY_CACHE.clear()
+        RANKED_MATCH_CACHE.clear()
 
     @classmethod
     def update_full_response_dict(cls) -> None:
         """
-        Re-load the full responses dict after an update.
+        Re-load the full responses dict after an update, rebuild the search index and
+        invalidate cached query results.
         """
-        responses = cls._get_or_create_response_obj()
-        cls._FULL_RESPONSE_DICT = cls._create_full_response_dict(
-            responses.entity_data, responses.entity_responses
-        )
+        with cls._BUILD_LOCK:
+            cls._build_search_data(cls._RESPONSE_STORE.get_snapshot())
+
+    @classmethod
+    def get_or_create_search_data(cls) -> ResponseSearchData:
+        """
+        Get the current search data, rebuilding it if the response data changed.
+        """
+        snapshot = cls._RESPONSE_STORE.get_snapshot()
+
+        if snapshot is not cls._SOURCE_SNAPSHOT:
+            with cls._BUILD_LOCK:
+                if snapshot is not cls._SOURCE_SNAPSHOT:
+                    cls._build_search_data(snapshot)
+
+        return cls._SEARCH_DATA
 
     @classmethod
-    def get_or_create_full_resp_dict(cls):
-        if cls._FULL_RESPONSE_DICT is None:
-            responses = cls._get_or_create_response_obj()
-            cls._FULL_RESPONSE_DICT = cls._create_full_response_dict(
-                responses.entity_data, responses.entity_responses
+    def get_last_search_data(cls) -> ResponseSearchData | None:
+        """
+        Get the search data built last, if any, without checking for changes.
+        """
+        return cls._SEARCH_DATA
+
+    @classmethod
+    async def get_search_data_nonblocking(cls) -> ResponseSearchData:
+        """
+        Get the search data without blocking the event loop, which building it would.
+        The search data built last is returned right away, while a check for changed
+        response data runs in a thread and swaps in rebuilt search data once done. Only
+        the first call has to wait for the search data, which is built in a thread as
+        well.
+        """
+        loop = asyncio.get_running_loop()
+        search_data = cls._SEARCH_DATA
+
+        if search_data is None:
+            return await loop.run_in_executor(None, cls.get_or_create_search_data)
+
+        if cls._REFRESH_FUTURE is None or cls._REFRESH_FUTURE.done():
+            cls._REFRESH_FUTURE = loop.run_in_executor(
+                None, cls.get_or_create_search_data
             )
+            cls._REFRESH_FUTURE.add_done_callback(cls._log_refresh_error)
+
+        return search_data
+
+    @staticmethod
+    def _log_refresh_error(future: asyncio.Future) -> None:
+        if not future.cancelled() and future.exception() is not None:
+            LOGGER.error(f"Error refreshing inline search data: {future.exception()}")
+
+
+def normalize_query(query_text: str) -> str:
+    """
+    Normalize an inline query for searching and caching. Matching ignores case, and
+    runs of whitespace are treated as a single space.
+    """
+    return " ".join(query_text.split()).lower()
 
-        return cls._FULL_RESPONSE_DICT
+
+# Classes of match positions, from best to worst.
+MATCH_CLASSES = (
+    "entity_prefix",
+    "entity_word",
+    "text_prefix",
+    "text_word",
+    "entity_infix",
+    "text_infix",
+)
+
+WORD_START_PATTERN = regex.compile(r"\m")
+
+
+def match_class(candidate: str, match_pos: int, text_start: int) -> int:
+    """
+    Classify where in a full response ("Entity name: Response text") a match starts,
+    with the response text starting at text_start (0 for a bare response text).
+    Matches at the start of a word beat matches inside one, and at equal footing,
+    matches in the entity name beat matches in the response text.
+    """
+    in_entity = match_pos < text_start
+
+    if match_pos == 0 or match_pos == text_start:
+        return MATCH_CLASSES.index("entity_prefix" if in_entity else "text_prefix")
+
+    if not candidate[match_pos - 1].isalnum():
+        return MATCH_CLASSES.index("entity_word" if in_entity else "text_word")
+
+    return MATCH_CLASSES.index("entity_infix" if in_entity else "text_infix")
+
+
+def fuzzy_match_class(
+    candidate: str, match_pos: int, word_pattern: regex.Pattern, text_start: int
+) -> int:
+    """
+    Classify a fuzzy match, given the start of the leftmost match in candidate and the
+    pattern anchored at word starts. A match at the start or at a word start is found
+    as the leftmost match already, so only candidates with their leftmost match inside
+    a word are searched again for a later match at a word start.
+
+    Matches are classed no better than the pattern they were found with, as a fuzzy
+    match may start at a space or punctuation, which `match_class` counts as a word
+    start although it's no word start for the pattern.
+    """
+    if match_pos == 0:
+        pattern_class = MATCH_CLASSES.index("entity_prefix")
+
+    elif WORD_START_PATTERN.match(candidate, match_pos):
+        pattern_class = MATCH_CLASSES.index("entity_word")
+
+    else:
+        word_res = word_pattern.search(candidate, match_pos + 1)
+
+        if word_res:
+            match_pos = word_res.start()
+            pattern_class = MATCH_CLASSES.index("entity_word")
+
+        else:
+            pattern_class = MATCH_CLASSES.index("entity_infix")
+
+    return max(pattern_class, match_class(candidate, match_pos, text_start))
+
+
+def match_rank(n_edits: int, position_class: int, candidate_id: int, n: int) -> int:
+    """
+    Combine the sort keys of a match into a single int, unique for each candidate.
+    Fewer edits beat a better match position, which beats an earlier candidate id.
+    """
+    return (n_edits * len(MATCH_CLASSES) + position_class) * n + candidate_id
+
+
+class _BestMatches:
+    """
+    Bounded max heap (via negated ranks) keeping the n_keep best ranks that are not
+    better than start_rank.
+    """
+
+    def __init__(self, n_keep: int, start_rank: int) -> None:
+        self.n_keep = n_keep
+        self.start_rank = start_rank
+        self._heap = []
+
+    def add(self, rank: int) -> None:
+        if rank < self.start_rank:
+            return None
+
+        if len(self._heap) < self.n_keep:
+            heapq.heappush(self._heap, -rank)
+        elif rank < -self._heap[0]:
+            heapq.heapreplace(self._heap, -rank)
+
+    def cannot_improve(self, best_possible_rank: int) -> bool:
+        """
+        Check if a match ranked best_possible_rank or worse can't make it in anymore.
+        """
+        return len(self._heap) == self.n_keep and -self._heap[0] < best_possible_rank
+
+    def ranks(self) -> list[int]:
+        return sorted(-neg_rank for neg_rank in self._heap)
+
+
+def check_cancelled(cancel_event: threading.Event | None) -> None:
+    """
+    Stop a search with a `SearchCancelledException` once cancel_event is set.
+    """
+    if cancel_event is not None and cancel_event.is_set():
+        raise SearchCancelledException("Search was abandoned.")
+
+
+def rank_substring_matches(
+    query: str,
+    match_pool: SearchPool | RecordSearchPool,
+    tolerance: int = 1,
+    cancel_event: threading.Event | None = None,
+) -> list[int]:
+    """
+    Get the ranks of all matches of query, best first, as described in
+    `get_substring_matches`. Without a limit, no search can exit early, so this takes
+    as long as searching for the last page of matches.
+    """
+    return _rank_matches(query, match_pool, tolerance, len(match_pool), 0, cancel_event)
 
 
 def get_substring_matches(
-    query: str, match_pool: list[str], tolerance: int = 1, max_n: int = 50
-) -> list[str]:
+    query: str,
+    match_pool: SearchPool | RecordSearchPool,
+    tolerance: int = 1,
+    max_n: int = 50,
+    start_rank: int = 0,
+    cancel_event: threading.Event | None = None,
+) -> tuple[list[int], int | None]:
     """
     Search for substring matches of query in a pool of potential matches with some
-    tolerance for errors. Since this is intended for retrieving inline results, which
-    can't exceed more than some number of results, the search terminates early if that
-    many results are found to speed up running time.
+    tolerance for errors, and return the ids of the best max_n of them in order of
+    their rank (see `match_rank`). The pool narrows down the candidates first, via
+    its trigram or FTS index.
+
+    Exact matches are cheap to find, so all of them are ranked. Fuzzy matches are
+    searched for with increasing numbers of edits, scanning each remaining candidate
+    once per number of edits (see `fuzzy_match_class`). A number of edits is only
+    searched for if its matches can still make it among the best max_n, and the search
+    stops as soon as no remaining candidate can.
+
+    Only matches ranked at start_rank or worse are returned. Along with the matches,
+    the rank to continue a search from is returned, or None if there are no more
+    matches. Once cancel_event is set, the search stops with a
+    `SearchCancelledException`.
     """
-    fuzzy_rules = f"{{e<={tolerance}}}"
-    pattern = regex.compile(f"{query}{fuzzy_rules}", flags=regex.IGNORECASE)
+    n = len(match_pool)
+    # Get one more than needed, to tell if there are any more matches.
+    ranks = _rank_matches(
+        query, match_pool, tolerance, max_n + 1, start_rank, cancel_event
+    )
+    next_rank = ranks[max_n - 1] + 1 if len(ranks) > max_n else None
+
+    return [rank % n for rank in ranks[:max_n]], next_rank
+
+
+def _rank_matches(
+    query: str,
+    match_pool: SearchPool | RecordSearchPool,
+    tolerance: int,
+    n_keep: int,
+    start_rank: int,
+    cancel_event: threading.Event | None = None,
+) -> list[int]:
+    n = len(match_pool)
+    query = query.lower()
+    escaped_query = regex.escape(query)
+    best = _BestMatches(n_keep, start_rank)
+    # Candidates without an exact match, as (id, candidate, text start).
+    unmatched = []
+
+    exact_word_pattern = regex.compile(rf"\m{escaped_query}")
+
+    for candidate_id, candidate, text_start in match_pool.candidates(
+        query, tolerance=tolerance
+    ):
+        check_cancelled(cancel_event)
+
+        # Candidates are in ascending order, so later ones can't do better.
+        if best.cannot_improve(match_rank(0, 0, candidate_id, n)):
+            break
+
+        lower_candidate = candidate.lower()
+        match_pos = lower_candidate.find(query)
+
+        if match_pos < 0:
+            unmatched.append((candidate_id, candidate, text_start))
+            continue
+
+        # Prefer any match at a word start over the leftmost match.
+        if match_pos > 0:
+            word_res = exact_word_pattern.search(lower_candidate, 1)
 
-    matches = []
-    n_found = 0
+            if word_res:
+                match_pos = word_res.start()
 
-    for candidate in match_pool:
-        search_res = regex.search(pattern, candidate)
+        position_class = match_class(lower_candidate, match_pos, text_start)
+        best.add(match_rank(0, position_class, candidate_id, n))
+
+    for n_edits in range(1, tolerance + 1):
+        fuzzy_rules = f"{{e<={n_edits}}}"
+        pattern = regex.compile(
+            f"(?:{escaped_query}){fuzzy_rules}", flags=regex.IGNORECASE
+        )
+        word_pattern = regex.compile(
+            rf"\m(?:{escaped_query}){fuzzy_rules}", flags=regex.IGNORECASE
+        )
 
-        if search_res:
-            n_found += 1
-            matches.append(candidate)
+        prefix_class = MATCH_CLASSES.index("entity_prefix")
 
-        if n_found >= max_n:
+        if best.cannot_improve(match_rank(n_edits, prefix_class, 0, n)):
             break
 
-    return matches
+        still_unmatched = []
+
+        for i, (candidate_id, candidate, text_start) in enumerate(unmatched):
+            check_cancelled(cancel_event)
+
+            # Candidates are in ascending order, so later ones can't do better.
+            if best.cannot_improve(match_rank(n_edits, prefix_class, candidate_id, n)):
+                still_unmatched += unmatched[i:]
+                break
+
+            search_res = pattern.search(candidate)
+
+            if search_res:
+                position_class = fuzzy_match_class(
+                    candidate, search_res.start(), word_pattern, text_start
+                )
+                best.add(match_rank(n_edits, position_class, candidate_id, n))
+
+            else:
+                still_unmatched.append((candidate_id, candidate, text_start))
+
+        unmatched = still_unmatched
+
+    return best.ranks()
 
 
-def create_voice_result(full_response: str, url: str) -> InlineQueryResultVoice:
+def create_voice_result(record: ResponseRecord) -> InlineQueryResultVoice:
     """
     Create a Voiceline result to be sent of to a chat requesting responses.
     """
-    # Silly hack to get around retrieving all the info again from the Response object.
-    # Would probably not be needed if the response data was kept in a relational DB.
-    parsed_response_data = parse_voiceline_args(full_response.split(" "))
-    response_hash = md5(bytes(full_response, encoding="utf-8")).hexdigest()
+    return InlineQueryResultVoice(
+        id=record.result_id, voice_url=record.url, title=record.full_response
+    )
 
-    response_title = f"{parsed_response_data.entity}: {parsed_response_data.line}"
 
-    return InlineQueryResultVoice(id=response_hash, voice_url=url, title=response_title)
+def records_to_voice_results(
+    search_data: ResponseSearchData, records: list[ResponseRecord]
+) -> list[InlineQueryResultVoice]:
+    return [search_data.get_or_create_voice_result(record) for record in records]
 
 
-def matched_response_dict_to_voice_results(
-    response_dict: dict,
-) -> list[InlineQueryResultVoice]:
+def parse_offset(offset: str, generation: int) -> int | None:
+    """
+    Parse the offset of an inline query into the rank to resume the search from. Returns
+    None if the offset is invalid, or refers to an older generation of search data.
+    """
+    if not offset:
+        return 0
+
+    try:
+        offset_generation, start_rank = (int(part) for part in offset.split("-"))
+
+    except ValueError:
+        return None
+
+    if offset_generation != generation:
+        return None
+
+    return start_rank
+
+
+def split_entity_query(
+    search_data: ResponseSearchData, query_text: str
+) -> tuple[str | None, str]:
+    """
+    Split an (already normalized) query of the form "Entity[: text]" into the key of
+    the entity and the text query. If the query doesn't start with a known entity,
+    the entity key is None and the whole query is the text query.
+    """
+    entity_part, separator, text_part = query_text.partition(":")
+    entity_key = entity_part.strip()
+
+    if not entity_key in search_data.entity_response_ids:
+        return None, query_text
+
+    return entity_key, text_part.strip() if separator else ""
+
+
+def _slice_matches(
+    response_ids: Sequence[int], start_rank: int, max_matches: int
+) -> tuple[list[int], int | None]:
+    """
+    Without a query, every response is an equally good match, so the rank is just the
+    position.
+    """
+    next_rank = start_rank + max_matches
+
+    if next_rank >= len(response_ids):
+        next_rank = None
+
+    return response_ids[start_rank : start_rank + max_matches], next_rank
+
+
+def _match_page(
+    cache_key: tuple[int, str],
+    query: str,
+    match_pool: SearchPool | RecordSearchPool,
+    start_rank: int,
+    max_matches: int,
+    cancel_event: threading.Event | None = None,
+) -> tuple[list[int], int | None]:
+    """
+    Get a page of substring matches of query, as `get_substring_matches`. The first
+    page is searched for directly, as most queries never get past it. The ranks of all
+    matches are only computed once a later page is requested, and cached under
+    cache_key, so every further page is a slice of them.
+    """
+    if start_rank == 0:
+        return get_substring_matches(
+            query, match_pool, max_n=max_matches, cancel_event=cancel_event
+        )
+
+    ranks = RANKED_MATCH_CACHE.get(cache_key)
+
+    if ranks is None:
+        ranks = array(
+            "Q",
+            rank_substring_matches(query, match_pool, cancel_event=cancel_event),
+        )
+        RANKED_MATCH_CACHE.put(cache_key, ranks)
+
+    page_start = bisect_left(ranks, start_rank)
+    page_end = page_start + max_matches
+    next_rank = ranks[page_end] if page_end < len(ranks) else None
+
+    return [rank % len(match_pool) for rank in ranks[page_start:page_end]], next_rank
+
+
+def match_responses(
+    search_data: ResponseSearchData,
+    query_text: str,
+    start_rank: int,
+    max_matches: int,
+    cancel_event: threading.Event | None = None,
+) -> tuple[list[int], int | None]:
+    """
+    Get the ids of the responses matching an (already normalized) query, starting at
+    start_rank, along with the rank to continue from (None if there are no more).
+    Queries starting with an entity only search the responses of that entity. Once
+    cancel_event is set, the search stops with a `SearchCancelledException`.
+    """
+    entity_key, text_query = split_entity_query(search_data, query_text)
+
+    if entity_key is not None:
+        LOGGER.info(f"Matching '{text_query}' in responses of '{entity_key}'")
+        entity_search = search_data.get_or_create_entity_search(entity_key)
+
+        if len(text_query) > 0:
+            entity_match_ids, next_rank = _match_page(
+                (search_data.generation, query_text),
+                text_query,
+                entity_search.search_pool,
+                start_rank,
+                max_matches,
+                cancel_event,
+            )
+
+        else:
+            entity_match_ids, next_rank = _slice_matches(
+                range(len(entity_search.search_pool)), start_rank, max_matches
+            )
+
+        match_ids = [
+            entity_search.response_ids[entity_match_id]
+            for entity_match_id in entity_match_ids
+        ]
+
+    elif len(query_text) > 0:
+        LOGGER.info(f"Matching responses for '{query_text}'")
+        match_ids, next_rank = _match_page(
+            (search_data.generation, query_text),
+            query_text,
+            search_data.search_pool,
+            start_rank,
+            max_matches,
+            cancel_event,
+        )
+
+    else:
+        LOGGER.info(f"Query has no length, returning next {max_matches} responses...")
+        match_ids, next_rank = _slice_matches(
+            range(len(search_data.record_table)), start_rank, max_matches
+        )
+
+    return list(match_ids), next_rank
+
+
+def match_current_responses(
+    query_text: str,
+    start_rank: int,
+    max_matches: int,
+    cancel_event: threading.Event | None = None,
+) -> tuple[list[tuple[int, str]], int | None]:
+    """
+    Like `match_responses`, using the search data of the current process, and with
+    the full response of each matched id. Defined on module level, so it can be run in
+    a search process pool.
+    """
+    search_data = LazyResponseDict.get_or_create_search_data()
+    match_ids, next_rank = match_responses(
+        search_data, query_text, start_rank, max_matches, cancel_event
+    )
+    record_table = search_data.record_table
+
     return [
-        create_voice_result(response, url) for response, url in response_dict.items()
+        (match_id, record_table.full_response(match_id)) for match_id in match_ids
+    ], next_rank
+
+
+def page_from_matches(
+    search_data: ResponseSearchData,
+    matches: list[tuple[int, str]],
+    next_rank: int | None,
+) -> SearchPage:
+    """
+    Look up the records of matched responses, given as (id, full response) pairs, and
+    build the offset of the next page.
+    """
+    record_table = search_data.record_table
+
+    # Responses matched in a worker process may come from different data during an
+    # update, so their ids are only used if they still refer to the same response.
+    records = [
+        record_table.record(match_id)
+        for match_id, full_response in matches
+        if match_id < len(record_table)
+        and record_table.full_response(match_id) == full_response
     ]
+    next_offset = "" if next_rank is None else f"{search_data.generation}-{next_rank}"
 
+    return SearchPage(records=records, next_offset=next_offset)
 
-async def handle_inline_vl_query(update: Update, context: CallbackContext) -> None:
+
+def search_records(
+    search_data: ResponseSearchData, query_text: str, offset: str, max_matches: int
+) -> SearchPage:
     """
-    Inline query handler to provide responses.
+    Get the page of records of responses matching an (already normalized) query,
+    starting at offset.
     """
-    max_matches = 50
+    start_rank = parse_offset(offset, search_data.generation)
+
+    if start_rank is None:
+        LOGGER.info(f"Offset '{offset}' is outdated or invalid, returning no results.")
+        return SearchPage(records=[], next_offset="")
+
+    match_ids, next_rank = match_responses(
+        search_data, query_text, start_rank, max_matches
+    )
+    record_table = search_data.record_table
+    matches = [
+        (match_id, record_table.full_response(match_id)) for match_id in match_ids
+    ]
 
-    query = update.inline_query
+    return page_from_matches(search_data, matches, next_rank)
+
+
+async def search_records_in_executor(
+    search_data: ResponseSearchData,
+    query_text: str,
+    offset: str,
+    max_matches: int,
+    executor: SearchExecutor = default_search_executor,
+) -> SearchPage:
+    """
+    Like `search_records`, but with the matching running in the search executor, off
+    the event loop.
+    """
+    start_rank = parse_offset(offset, search_data.generation)
+
+    if start_rank is None:
+        LOGGER.info(f"Offset '{offset}' is outdated or invalid, returning no results.")
+        return SearchPage(records=[], next_offset="")
+
+    # Searches for superseded or timed out queries are stopped.
+    matches, next_rank = await executor.run(
+        match_current_responses,
+        query_text,
+        start_rank,
+        max_matches,
+        cancellable=True,
+    )
+
+    return page_from_matches(search_data, matches, next_rank)
 
-    if not str(query.from_user.id) in context.application.bot_data["inline_whitelist"]:
-        # We don't talk to strangers.
-        return None
 
+async def answer_without_results(query: InlineQuery) -> None:
+    """
+    Answer a query that failed without results. Telegram must neither hand the answer
+    out to other users, nor keep it for the same query once the problem is gone.
+    """
+    await query.answer(results=[], cache_time=0, is_personal=True)
+
+
+async def answer_inline_vl_query(
+    query: InlineQuery, context: CallbackContext, task: asyncio.Task
+) -> None:
+    """
+    Search for responses matching an inline query and answer it, unless a newer query
+    of the same user came in before the search.
+    """
+    max_matches = int(INLINE_CONFIG["max_results"])
+    user_id = query.from_user.id
     query_text = query.query
 
     try:
-        full_resp_dict = LazyResponseDict.get_or_create_full_resp_dict()
+        search_data = await LazyResponseDict.get_search_data_nonblocking()
 
     except Exception as e:
         err_text = f"Error getting response data: {e}."
         LOGGER.error(f"{err_text} Informing whoever sent the query...")
-        await query.answer(results=[])
-        await context.bot.send_message(chat_id=query.from_user.id, text=err_text)
+        await answer_without_results(query)
+        await context.bot.send_message(chat_id=user_id, text=err_text)
+
+        return None
 
     LOGGER.info(f"Recieved query '{query_text}'")
 
-    if len(query_text) > 0:
-        LOGGER.info(f"Matching responses for '{query_text}'")
-        matching_responses = get_substring_matches(
-            query_text, full_resp_dict.keys(), max_n=max_matches
-        )
+    # Give newer queries that are already waiting a chance to supersede this one.
+    await asyncio.sleep(0)
+
+    if not QUERY_TRACKER.is_current(user_id, task):
+        LOGGER.info(f"Dropping superseded query '{query_text}'")
+        return None
+
+    normalized_query = normalize_query(query_text)
+    cache_key = (search_data.generation, normalized_query, query.offset)
+    search_page = QUERY_CACHE.get(cache_key)
+
+    if search_page is None:
+        try:
+            search_page = await search_records_in_executor(
+                search_data, normalized_query, query.offset, max_matches
+            )
+
+        except SearchTimeoutException as e:
+            LOGGER.error(f"Giving up on query '{query_text}': {e}")
+            await answer_without_results(query)
+
+            return None
+
+        QUERY_CACHE.put(cache_key, search_page)
 
     else:
-        LOGGER.info(f"Query has no length, returning first {max_matches} responses...")
-        n_keys = min(max_matches, len(full_resp_dict.keys()))
-        matching_responses = islice(full_resp_dict.keys(), n_keys)
+        LOGGER.info(f"Using cached results for '{query_text}'")
 
-    LOGGER.info(f"Back-searching response URLs for '{query_text}'")
-    matched_response_dict = {
-        matching_response: full_resp_dict[matching_response]
-        for matching_response in matching_responses
-    }
+    if not QUERY_TRACKER.is_current(user_id, task):
+        LOGGER.info(f"Dropping superseded query '{query_text}'")
+        return None
 
     LOGGER.info(f"Compiling and sending VL results for '{query_text}'")
 
     try:
+        # Results are personal, since Telegram would otherwise hand out cached results
+        # to users that are not on the whitelist.
         await query.answer(
-            results=matched_response_dict_to_voice_results(matched_response_dict)
+            results=records_to_voice_results(search_data, search_page.records),
+            next_offset=search_page.next_offset,
+            cache_time=int(INLINE_CONFIG["telegram_cache_secs"]),
+            is_personal=True,
         )
 
     except BadRequest as e:
@@ -182,8 +860,57 @@ async def handle_inline_vl_query(update: Update, context: CallbackContext) -> No
         )
 
 
+async def handle_inline_vl_query(update: Update, context: CallbackContext) -> None:
+    """
+    Inline query handler to provide responses. Each query cancels the handling of the
+    previous query of the same user, if it's still running.
+    """
+    query = update.inline_query
+    user_id = query.from_user.id
+
+    if not str(user_id) in context.application.bot_data["inline_whitelist"]:
+        # We don't talk to strangers.
+        return None
+
+    task = asyncio.current_task()
+    QUERY_TRACKER.start(user_id, task)
+
+    try:
+        await answer_inline_vl_query(query, context, task)
+
+    except asyncio.CancelledError:
+        # Only swallow cancellations by newer queries, not e.g. the ones on shutdown.
+        if QUERY_TRACKER.is_current(user_id, task):
+            raise
+
+        LOGGER.info(f"Handling of superseded query '{query.query}' was cancelled.")
+
+    finally:
+        QUERY_TRACKER.finish(user_id, task)
+
+
+async def handle_chosen_vl_result(update: Update, context: CallbackContext) -> None:
+    """
+    Count a chosen inline voiceline towards its usage. Telegram only sends these if
+    inline feedback is enabled for the bot (via BotFather's /setinlinefeedback).
+    """
+    result_id = update.chosen_inline_result.result_id
+    search_data = LazyResponseDict.get_last_search_data()
+
+    if search_data is None:
+        return None
+
+    voice_result = search_data.voice_results.get(result_id)
+
+    # Results are only known for the current response data.
+    if voice_result is not None:
+        default_response_usage.record(voice_result.voice_url)
+
+
 def add_inline_handlers(application: Application) -> None:
     """
     Add handlers related to voiceline parsing to the application.
     """
-    application.add_handler(InlineQueryHandler(handle_inline_vl_query))
+    # Queries are handled concurrently, so newer ones can cancel outdated ones.
+    application.add_handler(InlineQueryHandler(handle_inline_vl_query, block=False))
+    application.add_handler(ChosenInlineResultHandler(handle_chosen_vl_result))
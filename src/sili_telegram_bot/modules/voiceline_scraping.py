@@ -7,14 +7,23 @@ so this will need to be adapted to changes there.
 import bs4
 import json
 import logging
+import os
 import re
 import unicodedata
 
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from shutil import move
 from tempfile import TemporaryDirectory
+from typing import Callable
 
 from sili_telegram_bot.models.mediawiki_api import APIWrapper
+from sili_telegram_bot.models.response_corpus import ResponseCorpus
+from sili_telegram_bot.models.response_db import ResponseDatabase
+from sili_telegram_bot.models.response_page_parser import ResponsePageParser
+from sili_telegram_bot.models.response_snapshot import source_stamps, write_snapshot
 from sili_telegram_bot.models.response_types import EntityData, EntityResponse
+from sili_telegram_bot.models.scrape_checkpoint import ScrapeCheckpoint
 from sili_telegram_bot.modules.config import config
 
 VL_CONFIG = config["voicelines"]
@@ -141,13 +150,13 @@ def response_tags_from_soup(response_soup: bs4.BeautifulSoup) -> list[bs4.elemen
     return bullet_li_tags + table_li_tags + tab_content_li_tags
 
 
-def extract_entity_response_urls(entity_page_html: str) -> list[EntityResponse]:
+def extract_entity_response_urls_from_soup(
+    entity_page_html: str,
+) -> list[EntityResponse]:
     """
-    Extract all response urls (to audio files) of an entity from the html of its
-    responses pageand return them as a dict oflists. The first item will (almost)
-    always be the basic voiceline URL, but if the entity has an altered voice
-    (i.e. an arcana) the second item of the list will be for that. The list may
-    contain None in the case of missing files.
+    Same as `extract_entity_response_urls()`, but via a full BeautifulSoup tree of
+    the page. Slower, but kept as the reference the streaming parser is tested
+    against.
     """
     entity_soup = bs4.BeautifulSoup(entity_page_html, features="html.parser")
 
@@ -163,18 +172,79 @@ def extract_entity_response_urls(entity_page_html: str) -> list[EntityResponse]:
     return responses
 
 
+def extract_entity_response_urls(entity_page_html: str) -> list[EntityResponse]:
+    """
+    Extract all response urls (to audio files) of an entity from the html of its
+    responses pageand return them as a dict oflists. The first item will (almost)
+    always be the basic voiceline URL, but if the entity has an altered voice
+    (i.e. an arcana) the second item of the list will be for that. The list may
+    contain None in the case of missing files.
+    """
+    page_parser = ResponsePageParser()
+    page_parser.feed(entity_page_html)
+    page_parser.close()
+
+    return [
+        EntityResponse({"text": process_response_text(text), "urls": urls})
+        for text, urls in page_parser.responses()
+    ]
+
+
 def extract_response_urls_from_titles(
-    page_titles: list[str], mediawiki_api=APIWrapper.get_or_create_mediawiki_api()
+    page_titles: list[str],
+    mediawiki_api=APIWrapper.get_or_create_mediawiki_api(),
+    parse_workers: int = int(VL_CONFIG["parse_workers"]),
+    on_page_done: Callable[[str, list[EntityResponse]], None] | None = None,
 ) -> dict[str, list[EntityResponse]]:
     """
-    Retrieve page html and extract response urls for a list of page titles.
+    Retrieve page html and extract response urls for a list of page titles. If given,
+    on_page_done is called with title and responses of each page once it is done, in
+    the order of page_titles.
+
+    Pages are fetched one after the other, as the API wrapper rate limits requests,
+    and handed to a pool of parse_workers processes. Earlier pages are thereby parsed
+    while waiting to fetch the next one, instead of adding to the total time. With
+    parse_workers set to 0, pages are parsed right after fetching them instead.
     """
     out = {}
 
-    for page_title in page_titles:
-        LOGGER.info(f"Getting responses for page '{page_title}'...")
-        page_html = mediawiki_api.page(page_title, auto_suggest=False).html
-        out[page_title] = extract_entity_response_urls(page_html)
+    def finish_page(page_title: str, responses: list[EntityResponse]) -> None:
+        out[page_title] = responses
+
+        if on_page_done is not None:
+            on_page_done(page_title, responses)
+
+    if parse_workers == 0:
+        for page_title in page_titles:
+            LOGGER.info(f"Getting responses for page '{page_title}'...")
+            page_html = APIWrapper.page_html(page_title, mediawiki_api)
+            finish_page(page_title, extract_entity_response_urls(page_html))
+
+        return out
+
+    with ProcessPoolExecutor(max_workers=parse_workers) as executor:
+        parse_futures = deque()
+
+        try:
+            for page_title in page_titles:
+                LOGGER.info(f"Getting responses for page '{page_title}'...")
+                page_html = APIWrapper.page_html(page_title, mediawiki_api)
+                parse_futures.append(
+                    (
+                        page_title,
+                        executor.submit(extract_entity_response_urls, page_html),
+                    )
+                )
+
+                # Finish pages as soon as they are parsed, without waiting for any.
+                while parse_futures and parse_futures[0][1].done():
+                    done_title, parse_future = parse_futures.popleft()
+                    finish_page(done_title, parse_future.result())
+
+        finally:
+            # Pages fetched before an error are still finished, so none get lost.
+            for page_title, parse_future in parse_futures:
+                finish_page(page_title, parse_future.result())
 
     return out
 
@@ -186,8 +256,8 @@ def extract_entity_table(
     """
     Parse data for every response entity from the responses navbar on the wiki.
     """
-    navbar_page = mediawiki_api.page(navbar_title)
-    navbar_soup = bs4.BeautifulSoup(navbar_page.html, features="html.parser")
+    navbar_html = APIWrapper.page_html(navbar_title, mediawiki_api)
+    navbar_soup = bs4.BeautifulSoup(navbar_html, features="html.parser")
     url_table = navbar_soup.find(class_="nowraplinks").contents[0]
 
     categories = url_table.contents
@@ -198,8 +268,7 @@ def extract_entity_table(
     }
 
     entry_counts = {
-        cat_name: len(cat_entities)
-        for cat_name, cat_entities in entity_table.items()
+        cat_name: len(cat_entities) for cat_name, cat_entities in entity_table.items()
     }
 
     if any([count == 0 for count in entry_counts.items()]):
@@ -237,14 +306,130 @@ def extract_voiceline_urls(
     return extract_response_urls_from_titles(response_titles)
 
 
+def update_voiceline_urls(
+    previous_responses: dict[str, list[EntityResponse]],
+    previous_revisions: dict[str, int],
+    mediawiki_api=APIWrapper.get_or_create_mediawiki_api(),
+    checkpoint: ScrapeCheckpoint | None = None,
+) -> tuple[dict[str, list[EntityResponse]], dict[str, int]]:
+    """
+    Extract the URLs for all entities with responses, only re-downloading the pages
+    that changed since the previous responses were extracted. Returns the responses
+    and the revision ids of the pages they were extracted from.
+
+    If a checkpoint is given, pages are added to it as they are done, and pages in it
+    that are still at the same revision are not downloaded again.
+    """
+    response_titles = mediawiki_api.categorymembers("Responses", results=None)[0]
+    revisions = APIWrapper.page_revisions(response_titles, mediawiki_api)
+
+    changed_titles = [
+        page_title
+        for page_title in response_titles
+        if page_title not in previous_responses
+        or page_title not in revisions
+        or previous_revisions.get(page_title) != revisions[page_title]
+    ]
+    LOGGER.info(
+        f"{len(changed_titles)} of {len(response_titles)} response pages changed "
+        f"since the last run."
+    )
+
+    changed_responses = {}
+    on_page_done = None
+
+    if checkpoint is not None:
+        for page_title in changed_titles:
+            page_responses = checkpoint.get(page_title, revisions.get(page_title))
+
+            if page_responses is not None:
+                changed_responses[page_title] = page_responses
+
+        LOGGER.info(f"{len(changed_responses)} changed pages are already checkpointed.")
+
+        def checkpoint_page(page_title: str, responses: list[EntityResponse]) -> None:
+            checkpoint.add(page_title, revisions.get(page_title), responses)
+
+        on_page_done = checkpoint_page
+
+    changed_responses.update(
+        extract_response_urls_from_titles(
+            [
+                page_title
+                for page_title in changed_titles
+                if page_title not in changed_responses
+            ],
+            mediawiki_api,
+            on_page_done=on_page_done,
+        )
+    )
+
+    # Pages removed from the category are dropped.
+    responses = {
+        page_title: (
+            changed_responses[page_title]
+            if page_title in changed_responses
+            else previous_responses[page_title]
+        )
+        for page_title in response_titles
+    }
+
+    return responses, revisions
+
+
+def load_previous_data(
+    resource_file: str, revision_file: str
+) -> tuple[dict[str, list[EntityResponse]], dict[str, int]]:
+    """
+    Load the responses and page revisions of a previous run. Both are empty if either
+    is missing or unreadable, so everything is downloaded again.
+    """
+    try:
+        with open(resource_file, "r") as infile:
+            previous_responses = json.load(infile)
+
+        with open(revision_file, "r") as infile:
+            previous_revisions = json.load(infile)
+
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        LOGGER.info(f"No usable data from a previous run ({e}), getting all pages.")
+
+        return {}, {}
+
+    return previous_responses, previous_revisions
+
+
 def save_resource(
     output_file: str = VL_CONFIG["resource_file"],
+    revision_file: str | None = None,
+    previous_resource_file: str | None = None,
+    previous_revision_file: str | None = None,
+    checkpoint: ScrapeCheckpoint | None = None,
 ) -> None:
     """
-    Get table with response entity data and save to output_file.
+    Get table with response entity data and save to output_file. If revision_file is
+    given, the revision ids of the response pages are saved there. Pages unchanged
+    since the responses in previous_resource_file were saved (according to the
+    revision ids in previous_revision_file) are taken from there instead of
+    downloaded again, as are pages already in checkpoint.
     """
     LOGGER.info(f"Getting responses, will be saved to '{output_file}'.")
-    entity_resp_dict = extract_voiceline_urls()
+
+    if revision_file is None:
+        entity_resp_dict = extract_voiceline_urls()
+
+    else:
+        previous_responses, previous_revisions = (
+            load_previous_data(previous_resource_file, previous_revision_file)
+            if previous_resource_file is not None and previous_revision_file is not None
+            else ({}, {})
+        )
+        entity_resp_dict, revisions = update_voiceline_urls(
+            previous_responses, previous_revisions, checkpoint=checkpoint
+        )
+
+        with open(revision_file, "w") as outfile:
+            json.dump(obj=revisions, fp=outfile, indent=2)
 
     with open(output_file, "w") as outfile:
         json.dump(
@@ -254,18 +439,33 @@ def save_resource(
         )
 
 
-def get_response_data() -> None:
+def get_response_data(incremental: bool = True) -> None:
     """
-    Retrieve data on responses and save to configured paths.
+    Retrieve data on responses and save to configured paths. If incremental, only
+    response pages that changed since the last run are downloaded again.
+
+    Response pages are checkpointed as they are done, so if this is interrupted, the
+    next call resumes where it stopped. The checkpoint is removed once the data is in
+    place.
     """
     LOGGER.info("Getting response data...")
 
-    data_filenames = {"entity_data": "entity_data.json", "responses": "responses.json"}
+    data_filenames = {
+        "entity_data": "entity_data.json",
+        "responses": "responses.json",
+        "database": "responses.sqlite",
+        "snapshot": "responses.snapshot",
+        "revisions": "page_revisions.json",
+    }
 
     # To avoid an inconsistent state where entity data doesn't match the response
     # data, we first save both date to a temp_dir and move the files to their place
-    # after everything finished successfully.
-    with TemporaryDirectory() as temp_dir:
+    # after everything finished successfully. The temp dir is next to the final
+    # locations, so moving is an atomic rename and readers never see partial files.
+    target_dir = os.path.dirname(VL_CONFIG["resource_file"]) or "."
+    checkpoint = ScrapeCheckpoint(VL_CONFIG["checkpoint_file"])
+
+    with TemporaryDirectory(dir=target_dir) as temp_dir:
         LOGGER.info(f"Saving data to temp dir ('{temp_dir}')...")
         temp_paths = {
             data_name: temp_dir + "/" + data_filename
@@ -273,8 +473,43 @@ def get_response_data() -> None:
         }
 
         save_entity_table(output_file=temp_paths["entity_data"])
-        save_resource(output_file=temp_paths["responses"])
+        save_resource(
+            output_file=temp_paths["responses"],
+            revision_file=temp_paths["revisions"],
+            previous_resource_file=VL_CONFIG["resource_file"] if incremental else None,
+            previous_revision_file=VL_CONFIG["revision_file"] if incremental else None,
+            checkpoint=checkpoint,
+        )
+
+        # The response database is always written alongside the JSON files, so the
+        # storage backend can be switched without scraping again.
+        with (
+            open(temp_paths["entity_data"], "r") as entity_file,
+            open(temp_paths["responses"], "r") as response_file,
+        ):
+            entity_data = json.load(entity_file)
+            response_data = json.load(response_file)
+
+        ResponseDatabase.write(
+            temp_paths["database"],
+            entity_data=entity_data,
+            response_data=response_data,
+        )
+        # Moving keeps modification time and size of the JSON files, so the snapshot
+        # stays up to date with them.
+        write_snapshot(
+            temp_paths["snapshot"],
+            entity_data=entity_data,
+            corpus=ResponseCorpus(response_data),
+            stamps=source_stamps(temp_paths["entity_data"], temp_paths["responses"]),
+        )
 
         LOGGER.info(f"Done getting data, moving to final locations.")
+        move(temp_paths["database"], VL_CONFIG["database_file"])
+        move(temp_paths["snapshot"], VL_CONFIG["snapshot_file"])
         move(temp_paths["entity_data"], VL_CONFIG["entity_data_file"])
         move(temp_paths["responses"], VL_CONFIG["resource_file"])
+        # Revisions go last, so they never claim pages are up to date that aren't.
+        move(temp_paths["revisions"], VL_CONFIG["revision_file"])
+
+    checkpoint.clear()
@@ -0,0 +1,212 @@
+"""
+Test the disk cache for voiceline audio.
+"""
+
+import asyncio
+import httpx
+import os
+import pytest
+
+from sili_telegram_bot.models.audio_cache import AudioCache
+from sili_telegram_bot.models.exceptions import AudioTooLargeException
+
+
+class FakeWiki:
+    """
+    Serves fixed content for every URL, honoring If-None-Match.
+    """
+
+    def __init__(self, content: bytes = b"audio") -> None:
+        self.content = content
+        self.requests = []
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+
+        if request.headers.get("If-None-Match") == "etag":
+            return httpx.Response(304)
+
+        return httpx.Response(200, content=self.content, headers={"ETag": "etag"})
+
+
+def create_cache(cache_dir, wiki: FakeWiki | None = None, **kwargs) -> AudioCache:
+    return AudioCache(
+        cache_dir=str(cache_dir),
+        max_bytes=kwargs.pop("max_bytes", 1000),
+        revalidate_secs=kwargs.pop("revalidate_secs", 1000),
+        timeout_secs=1,
+        max_connections=1,
+        chunk_bytes=2,
+        transport=httpx.MockTransport((wiki or FakeWiki()).handle),
+    )
+
+
+def get_files(cache: AudioCache, *urls: str) -> list[str]:
+    async def get_all() -> list[str]:
+        try:
+            return [await cache.get_file(url) for url in urls]
+
+        finally:
+            await cache.aclose()
+
+    return asyncio.run(get_all())
+
+
+class TestAudioCache:
+    def test_hit_after_download(self, tmp_path):
+        wiki = FakeWiki()
+        cache = create_cache(tmp_path, wiki)
+        file_paths = get_files(cache, "https://wiki/a.mp3", "https://wiki/a.mp3")
+
+        assert file_paths[0] == file_paths[1]
+        assert len(wiki.requests) == 1
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+        with open(file_paths[0], "rb") as infile:
+            assert infile.read() == b"audio"
+
+    def test_revalidation(self, tmp_path):
+        wiki = FakeWiki()
+        cache = create_cache(tmp_path, wiki, revalidate_secs=0)
+        get_files(cache, "https://wiki/a.mp3", "https://wiki/a.mp3")
+
+        assert wiki.requests[-1].headers["If-None-Match"] == "etag"
+        assert cache.stats()["revalidations"] == 1
+
+    def test_lru_eviction(self, tmp_path):
+        cache = create_cache(tmp_path, max_bytes=10)
+        file_paths = get_files(
+            cache,
+            "https://wiki/a.mp3",
+            "https://wiki/b.mp3",
+            "https://wiki/a.mp3",
+            "https://wiki/c.mp3",
+        )
+
+        assert os.path.exists(file_paths[0])
+        assert not os.path.exists(file_paths[1])
+        assert cache.stats()["n_files"] == 2
+        assert cache.stats()["evictions"] == 1
+
+    def test_persisted(self, tmp_path):
+        get_files(create_cache(tmp_path), "https://wiki/a.mp3")
+        (tmp_path / "leftover.tmp").write_bytes(b"partial")
+        cache = create_cache(tmp_path)
+
+        assert cache.stats()["n_files"] == 1
+        assert not (tmp_path / "leftover.tmp").exists()
+
+    def test_open_file_survives_eviction(self, tmp_path):
+        cache = create_cache(tmp_path, max_bytes=5)
+
+        async def open_and_evict() -> bytes:
+            try:
+                with await cache.open_file("https://wiki/a.mp3") as audio_file:
+                    # Downloading another file evicts the first one.
+                    await cache.get_file("https://wiki/b.mp3")
+
+                    assert cache.cached_file("https://wiki/a.mp3") is None
+
+                    return audio_file.read()
+
+            finally:
+                await cache.aclose()
+
+        assert asyncio.run(open_and_evict()) == b"audio"
+
+    def test_open_cached_file(self, tmp_path):
+        cache = create_cache(tmp_path)
+
+        assert cache.open_cached_file("https://wiki/a.mp3") is None
+
+        get_files(cache, "https://wiki/a.mp3")
+
+        with cache.open_cached_file("https://wiki/a.mp3") as audio_file:
+            assert audio_file.read() == b"audio"
+
+    def test_orphans_removed(self, tmp_path):
+        (tmp_path / f"{AudioCache.key('https://wiki/a.mp3')}.audio").write_text("a")
+        (tmp_path / f"{AudioCache.key('https://wiki/b.mp3')}.json").write_text("{}")
+        create_cache(tmp_path)
+
+        assert list(tmp_path.iterdir()) == []
+
+    def test_foreign_files_kept(self, tmp_path):
+        foreign_files = ["notes.txt", "config.json", "clip.audio", "cache.sqlite"]
+
+        for file_name in foreign_files:
+            (tmp_path / file_name).write_text("keep")
+
+        create_cache(tmp_path)
+
+        assert sorted(path.name for path in tmp_path.iterdir()) == sorted(foreign_files)
+
+    def test_prefetch_budget(self, tmp_path):
+        wiki = FakeWiki()
+        cache = create_cache(tmp_path, wiki)
+        urls = ["https://wiki/a.mp3", "https://wiki/b.mp3", "https://wiki/c.mp3"]
+
+        async def prefetch() -> int:
+            try:
+                return await cache.prefetch(urls, max_bytes=6)
+
+            finally:
+                await cache.aclose()
+
+        # The second 5 byte file would exceed the budget, so it is not downloaded.
+        assert asyncio.run(prefetch()) == 5
+        assert cache.cached_file(urls[0]) is not None
+        assert cache.cached_file(urls[1]) is None
+        assert cache.cached_file(urls[2]) is None
+
+    def test_get_file_too_large(self, tmp_path):
+        cache = create_cache(tmp_path)
+
+        async def get_file() -> str:
+            try:
+                return await cache.get_file("https://wiki/a.mp3", max_bytes=4)
+
+            finally:
+                await cache.aclose()
+
+        with pytest.raises(AudioTooLargeException):
+            asyncio.run(get_file())
+
+        assert cache.cached_file("https://wiki/a.mp3") is None
+        assert not any(
+            name.endswith((".audio", ".tmp")) for name in os.listdir(tmp_path)
+        )
+
+    def test_get_file_too_large_without_content_length(self, tmp_path):
+        async def stream_content():
+            yield b"aud"
+            yield b"io"
+
+        def handle(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, content=stream_content())
+
+        cache = AudioCache(
+            cache_dir=str(tmp_path),
+            max_bytes=1000,
+            revalidate_secs=1000,
+            timeout_secs=1,
+            max_connections=1,
+            chunk_bytes=2,
+            transport=httpx.MockTransport(handle),
+        )
+
+        async def get_file() -> str:
+            try:
+                return await cache.get_file("https://wiki/a.mp3", max_bytes=4)
+
+            finally:
+                await cache.aclose()
+
+        # Dropped while streaming, leaving no temp file behind.
+        with pytest.raises(AudioTooLargeException):
+            asyncio.run(get_file())
+
+        assert not any(
+            name.endswith((".audio", ".tmp")) for name in os.listdir(tmp_path)
+        )
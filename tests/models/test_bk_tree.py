@@ -0,0 +1,57 @@
+"""
+Test the BK-tree used for fuzzy entity name matching.
+"""
+
+import pytest
+
+from test_infrastructure.common_case_infra import (
+    TEST_ENTITY_DATA_FILE,
+    TEST_RESPONSES_FILE,
+)
+
+from sili_telegram_bot.models.bk_tree import BKTree, levenshtein
+from sili_telegram_bot.models.entity_resolver import strip_name
+from sili_telegram_bot.models.responses import Responses
+
+
+def entity_names() -> list[str]:
+    rsp = Responses(
+        entity_data_file=TEST_ENTITY_DATA_FILE, resource_file=TEST_RESPONSES_FILE
+    )
+
+    return [
+        strip_name(entity_name)
+        for type_data in rsp.entity_data.values()
+        for entity_name in type_data
+    ]
+
+
+class TestLevenshtein:
+    def test_success(self):
+        assert levenshtein("windrunner", "windranger") == 2
+        assert levenshtein("", "axe") == 3
+        assert levenshtein("axe", "axe") == 0
+
+    def test_max_dist(self):
+        assert levenshtein("lina", "legioncommander", max_dist=2) == 3
+
+
+class TestBKTree:
+    @pytest.mark.parametrize("query", ["visgae", "brewmastr", "lina", "xyz"])
+    @pytest.mark.parametrize("max_dist", [0, 1, 2, 4])
+    def test_same_as_linear_scan(self, query, max_dist):
+        names = entity_names()
+        tree = BKTree()
+
+        for name in names:
+            tree.add(name, name)
+
+        expected = sorted(
+            (levenshtein(query, name), name)
+            for name in names
+            if levenshtein(query, name) <= max_dist
+        )
+
+        assert [(dist, key) for dist, key, _ in tree.search(query, max_dist)] == (
+            expected
+        )
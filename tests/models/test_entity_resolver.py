@@ -0,0 +1,25 @@
+"""
+Test resolving entity names via aliases and name similarity.
+"""
+
+from pytest_cases import parametrize_with_cases
+
+import test_entity_resolver_cases as case_module
+
+from sili_telegram_bot.models.entity_resolver import EntityResolver
+
+
+def create_resolver() -> EntityResolver:
+    return EntityResolver(case_module.HERO_NAMES, case_module.HERO_ALIASES)
+
+
+class TestResolveExact:
+    @parametrize_with_cases("name,expected", cases=case_module.TestResolveExactCases)
+    def test_success(self, name, expected):
+        assert create_resolver().resolve_exact(name) == expected
+
+
+class TestResolve:
+    @parametrize_with_cases("name,expected", cases=case_module.TestResolveCases)
+    def test_success(self, name, expected):
+        assert create_resolver().resolve(name) == expected
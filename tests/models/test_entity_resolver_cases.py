@@ -0,0 +1,57 @@
+from pytest_cases import parametrize
+
+HERO_NAMES = [
+    "Anti-Mage",
+    "Crystal Maiden",
+    "Keeper of the Light",
+    "Nature's Prophet",
+    "Shadow Shaman",
+    "Storm Spirit",
+    "Windranger",
+]
+
+HERO_ALIASES = {"wr": "Windranger", "ss": "Storm Spirit"}
+
+
+class TestResolveExactCases:
+    @parametrize(
+        "name,expected",
+        [
+            ("Windranger", "Windranger"),
+            ("crystal   maiden", "Crystal Maiden"),
+            ("WR", "Windranger"),
+            ("natures prophet", "Nature's Prophet"),
+            ("Anti Mage", "Anti-Mage"),
+            ("am", "Anti-Mage"),
+            ("kotl", "Keeper of the Light"),
+            ("np", "Nature's Prophet"),
+        ],
+    )
+    def case_success(self, name, expected):
+        return name, expected
+
+    @parametrize(
+        "name,expected",
+        [
+            # Manual aliases beat (ambiguous) initials.
+            ("ss", "Storm Spirit"),
+            # Unknown aliases don't resolve exactly.
+            ("windrunner", None),
+        ],
+    )
+    def case_precedence(self, name, expected):
+        return name, expected
+
+
+class TestResolveCases:
+    @parametrize(
+        "name,expected",
+        [
+            ("windrunner", "Windranger"),
+            ("crystal", "Crystal Maiden"),
+            ("keeper of teh light", "Keeper of the Light"),
+            ("xyz", None),
+        ],
+    )
+    def case_fuzzy(self, name, expected):
+        return name, expected
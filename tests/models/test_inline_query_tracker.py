@@ -0,0 +1,93 @@
+"""
+Test the tracking of in-flight inline queries per user.
+"""
+
+import asyncio
+
+from sili_telegram_bot.models.inline_query_tracker import InlineQueryTracker
+
+
+def run_with_tasks(test, n_tasks: int):
+    """
+    Run test with n_tasks pending tasks on a fresh event loop, cancelling the ones
+    still pending afterwards.
+    """
+
+    async def run():
+        tasks = [asyncio.create_task(asyncio.Event().wait()) for _ in range(n_tasks)]
+
+        try:
+            return await test(*tasks)
+
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return asyncio.run(run())
+
+
+class TestInlineQueryTracker:
+    def test_cancels_previous(self):
+        async def test(first_task, second_task):
+            tracker = InlineQueryTracker()
+            tracker.start(1, first_task)
+            tracker.start(1, second_task)
+            await asyncio.sleep(0)
+
+            assert first_task.cancelled()
+            assert not second_task.done()
+            assert tracker.is_current(1, second_task)
+            assert not tracker.is_current(1, first_task)
+
+        run_with_tasks(test, 2)
+
+    def test_other_users_untouched(self):
+        async def test(first_task, second_task):
+            tracker = InlineQueryTracker()
+            tracker.start(1, first_task)
+            tracker.start(2, second_task)
+            await asyncio.sleep(0)
+
+            assert not first_task.done()
+            assert tracker.is_current(1, first_task)
+            assert tracker.superseded_count == 0
+
+        run_with_tasks(test, 2)
+
+    def test_superseded_count(self):
+        async def test(first_task, second_task, third_task):
+            tracker = InlineQueryTracker()
+            tracker.start(1, first_task)
+            tracker.start(1, second_task)
+            tracker.start(1, third_task)
+
+            assert tracker.superseded_count == 2
+
+        run_with_tasks(test, 3)
+
+    def test_done_previous_not_counted(self):
+        async def test(first_task, second_task):
+            tracker = InlineQueryTracker()
+            tracker.start(1, first_task)
+            first_task.cancel()
+            await asyncio.sleep(0)
+            tracker.start(1, second_task)
+
+            assert tracker.superseded_count == 0
+
+        run_with_tasks(test, 2)
+
+    def test_finish_keeps_newer(self):
+        async def test(first_task, second_task):
+            tracker = InlineQueryTracker()
+            tracker.start(1, first_task)
+            tracker.start(1, second_task)
+            tracker.finish(1, first_task)
+
+            assert tracker.is_current(1, second_task)
+
+            tracker.finish(1, second_task)
+
+            assert not tracker.is_current(1, second_task)
+
+        run_with_tasks(test, 2)
@@ -0,0 +1,52 @@
+"""
+Test the batched requests of the API wrapper against a fake wiki.
+"""
+
+import mediawiki
+import pytest
+
+from test_infrastructure.fake_wiki import FakeWiki
+
+from sili_telegram_bot.models.mediawiki_api import APIWrapper
+
+
+class TestQueryTitles:
+    def test_batches(self):
+        wiki = FakeWiki({f"Page {i}/Responses": i for i in range(5)})
+
+        pages = APIWrapper.query_titles(
+            [*wiki.revisions, "Missing/Responses"], {}, wiki, batch_size=2
+        )
+
+        assert [*pages] == [*wiki.revisions]
+        assert wiki.n_requests == 3
+
+    def test_normalized_titles(self):
+        class NormalizingWiki(FakeWiki):
+            def wiki_request(self, params: dict) -> dict:
+                title = params["titles"]
+                normalized_title = title[0].upper() + title[1:]
+                result = super().wiki_request({**params, "titles": normalized_title})
+                result["query"]["normalized"] = [
+                    {"from": title, "to": normalized_title}
+                ]
+
+                return result
+
+        wiki = NormalizingWiki({"Axe/Responses": 3})
+
+        assert APIWrapper.page_revisions(["axe/Responses"], wiki) == {
+            "axe/Responses": 3
+        }
+
+
+class TestPageHtml:
+    def test_single_request(self):
+        wiki = FakeWiki({"Axe/Responses": 1})
+
+        assert "Line of Axe/Responses" in APIWrapper.page_html("Axe/Responses", wiki)
+        assert wiki.n_requests == 1
+
+    def test_missing_page(self):
+        with pytest.raises(mediawiki.PageError):
+            APIWrapper.page_html("Missing/Responses", FakeWiki({}))
@@ -0,0 +1,36 @@
+"""
+Test the data kept in JSON files across restarts.
+"""
+
+import os
+
+from sili_telegram_bot.models.persistent_json import PersistentJson
+
+
+class TestPersistentJson:
+    def test_saved_on_save_only(self, tmp_path):
+        file_path = str(tmp_path / "data.json")
+        persistent = PersistentJson(file_path, "test data")
+        persistent.data["a"] = 1
+        persistent.changed()
+
+        assert not os.path.exists(file_path)
+
+        persistent.save()
+
+        assert PersistentJson(file_path, "test data").data == {"a": 1}
+
+    def test_unchanged_not_written(self, tmp_path):
+        file_path = tmp_path / "data.json"
+        file_path.write_text('{"a": 1}')
+        persistent = PersistentJson(str(file_path), "test data")
+        file_path.write_text('{"b": 2}')
+        persistent.save()
+
+        assert file_path.read_text() == '{"b": 2}'
+
+    def test_corrupted_file(self, tmp_path):
+        file_path = tmp_path / "data.json"
+        file_path.write_text("{")
+
+        assert PersistentJson(str(file_path), "test data").data == {}
@@ -0,0 +1,28 @@
+"""
+Test the bounded query result cache.
+"""
+
+from sili_telegram_bot.models.query_cache import QueryResultCache
+
+
+class TestQueryResultCache:
+    def test_lru_eviction(self):
+        cache = QueryResultCache(max_size=2, ttl_secs=60)
+        cache.put("a", 1)
+        cache.put("b", 2)
+
+        # Touch "a", so "b" is the least recently used entry.
+        assert cache.get("a") == 1
+
+        cache.put("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+
+    def test_expiry(self):
+        cache = QueryResultCache(max_size=2, ttl_secs=-1)
+        cache.put("a", 1)
+
+        assert cache.get("a") is None
+        assert len(cache) == 0
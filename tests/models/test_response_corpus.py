@@ -0,0 +1,61 @@
+"""
+Test the compact response corpus against the plain JSON data it is created from.
+"""
+
+import json
+
+from test_infrastructure.common_case_infra import (
+    TEST_ENTITY_DATA_FILE,
+    TEST_RESPONSES_FILE,
+)
+
+from sili_telegram_bot.models.response_corpus import ResponseRecordTable
+from sili_telegram_bot.models.responses import Responses
+from sili_telegram_bot.modules.memory_report import (
+    legacy_search_records,
+    memory_report,
+)
+
+TYPE_LOOKUP = {
+    long_name: short_name
+    for short_name, long_name in Responses.entity_type_lookup.items()
+}
+
+
+def load_json(file_path: str):
+    with open(file_path, "r") as infile:
+        return json.load(infile)
+
+
+class TestResponseCorpus:
+    def test_same_data(self):
+        rsp = Responses(
+            entity_data_file=TEST_ENTITY_DATA_FILE, resource_file=TEST_RESPONSES_FILE
+        )
+
+        assert dict(rsp.get_corpus()) == load_json(TEST_RESPONSES_FILE)
+
+    def test_same_records(self):
+        rsp = Responses(
+            entity_data_file=TEST_ENTITY_DATA_FILE, resource_file=TEST_RESPONSES_FILE
+        )
+        record_table = ResponseRecordTable(
+            rsp.get_corpus(), rsp.entity_data, TYPE_LOOKUP
+        )
+        legacy_records = legacy_search_records(
+            load_json(TEST_ENTITY_DATA_FILE),
+            load_json(TEST_RESPONSES_FILE),
+            TYPE_LOOKUP,
+        )
+
+        assert record_table.full_responses == [*legacy_records.keys()]
+        assert [
+            record_table.record(record_id) for record_id in range(len(record_table))
+        ] == [*legacy_records.values()]
+
+    def test_smaller_than_legacy(self):
+        report = memory_report(
+            entity_data_file=TEST_ENTITY_DATA_FILE, resource_file=TEST_RESPONSES_FILE
+        )
+
+        assert report["compact_bytes"] < report["legacy_bytes"]
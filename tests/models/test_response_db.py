@@ -0,0 +1,109 @@
+"""
+Test the SQLite response database against the JSON files it is created from.
+"""
+
+import pytest
+import regex
+
+from pytest_cases import parametrize_with_cases
+
+import test_trigram_index_cases as case_module
+from test_infrastructure.common_case_infra import (
+    TEST_ENTITY_DATA_FILE,
+    TEST_RESPONSES_FILE,
+)
+
+from sili_telegram_bot.models.response_corpus import ResponseRecordTable
+from sili_telegram_bot.models.response_db import (
+    RecordSearchPool,
+    RecordTableView,
+    ResponseDatabase,
+)
+from sili_telegram_bot.models.responses import Responses
+
+
+@pytest.fixture(scope="module")
+def json_responses() -> Responses:
+    return Responses(
+        entity_data_file=TEST_ENTITY_DATA_FILE, resource_file=TEST_RESPONSES_FILE
+    )
+
+
+@pytest.fixture(scope="module")
+def db_responses(tmp_path_factory, json_responses) -> Responses:
+    database_file = str(tmp_path_factory.mktemp("db") / "responses.sqlite")
+    ResponseDatabase.write(
+        database_file, json_responses.entity_data, json_responses.entity_responses
+    )
+
+    return Responses(database_file=database_file)
+
+
+class TestResponseDatabase:
+    def test_same_data(self, json_responses, db_responses):
+        assert db_responses.entity_data == json_responses.entity_data
+        assert dict(db_responses.entity_responses) == dict(
+            json_responses.entity_responses
+        )
+
+    @pytest.mark.parametrize(
+        "entity,line",
+        [
+            ("Legion Commander", "Ten hut"),
+            ("Legion Commander", "Tn hut"),
+            ("Legion Commander", '"^as you"'),
+            ("Legion Commander", "this land will burn"),
+        ],
+    )
+    def test_same_link(self, json_responses, db_responses, entity, line):
+        assert db_responses.get_link(entity, line) == json_responses.get_link(
+            entity, line
+        )
+
+    def test_text_narrows_responses(self, db_responses):
+        title = db_responses.entity_data["Hero responses"]["Legion Commander"]["title"]
+        database = ResponseDatabase(db_responses.database_file)
+
+        all_responses = database.get_page_responses(title)
+        narrowed_responses = database.get_page_responses(title, "land will burn")
+
+        assert 0 < len(narrowed_responses) < len(all_responses)
+
+    def test_same_records(self, json_responses, db_responses):
+        type_lookup = {"Hero responses": "hero"}
+        record_table = ResponseRecordTable(
+            json_responses.get_corpus(), json_responses.entity_data, type_lookup
+        )
+        database = ResponseDatabase(db_responses.database_file)
+        record_view = RecordTableView(database, type_lookup)
+
+        assert database.has_records()
+
+        assert len(record_view) == len(record_table)
+        assert list(record_view.entity_names()) == list(record_table.entity_names())
+
+        for record_id in range(0, len(record_table), 97):
+            assert record_view.record(record_id) == record_table.record(record_id)
+            assert record_view.text(record_id) == record_table.text(record_id)
+
+    @parametrize_with_cases("query", cases=case_module.TestCandidatesCases)
+    def test_no_missed_candidates(self, db_responses, query):
+        """
+        Every record found by a linear fuzzy scan must be among the candidates found
+        via the FTS index, including for queries with pieces shorter than a trigram.
+        """
+        search_pool = RecordSearchPool(ResponseDatabase(db_responses.database_file))
+        pattern = regex.compile(
+            f"(?:{regex.escape(query)}){{e<=1}}", flags=regex.IGNORECASE
+        )
+
+        candidates = list(search_pool.candidates(query, tolerance=1))
+        candidate_ids = [candidate_id for candidate_id, _, _ in candidates]
+        expected_ids = [
+            candidate_id
+            for candidate_id, full_response, _ in search_pool.candidates("")
+            if regex.search(pattern, full_response)
+        ]
+
+        assert candidate_ids == sorted(candidate_ids)
+        assert set(expected_ids) <= set(candidate_ids)
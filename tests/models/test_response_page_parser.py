@@ -0,0 +1,35 @@
+"""
+Test the streaming response page parser against extraction via BeautifulSoup.
+"""
+
+from pytest_cases import parametrize
+
+from test_infrastructure.response_pages import QUIRKS_HTML, response_pages
+
+from sili_telegram_bot.modules import voiceline_scraping
+
+RESPONSE_PAGES = response_pages()
+
+
+class TestResponsePageParser:
+    @parametrize("page_title", [*RESPONSE_PAGES])
+    def test_same_as_soup(self, page_title):
+        page_html = RESPONSE_PAGES[page_title]
+
+        assert voiceline_scraping.extract_entity_response_urls(page_html) == (
+            voiceline_scraping.extract_entity_response_urls_from_soup(page_html)
+        )
+
+    def test_quirks(self):
+        page_html = f'<div class="mw-parser-output">{QUIRKS_HTML}</div>'
+        responses = voiceline_scraping.extract_entity_response_urls(page_html)
+
+        assert responses == (
+            voiceline_scraping.extract_entity_response_urls_from_soup(page_html)
+        )
+        assert [response["urls"] for response in responses] == [
+            ["https://wiki/outer.mp3", "https://wiki/inner.mp3"],
+            ["https://wiki/inner.mp3"],
+            [None, "https://wiki/arcana.mp3"],
+            [None],
+        ]
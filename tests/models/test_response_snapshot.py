@@ -0,0 +1,109 @@
+"""
+Test writing and reading binary snapshots of the response data.
+"""
+
+import json
+import os
+import shutil
+
+from test_infrastructure.common_case_infra import (
+    TEST_ENTITY_DATA_FILE,
+    TEST_RESPONSES_FILE,
+)
+
+from sili_telegram_bot.models.response_corpus import ResponseCorpus
+from sili_telegram_bot.models.response_snapshot import (
+    read_snapshot,
+    source_stamps,
+    write_snapshot,
+)
+from sili_telegram_bot.models.responses import Responses
+from sili_telegram_bot.modules.load_benchmark import load_benchmark
+
+
+def load_json(file_path: str):
+    with open(file_path, "r") as infile:
+        return json.load(infile)
+
+
+def write_test_snapshot(tmp_path) -> tuple[str, str, str]:
+    """
+    Copy the test data to tmp_path and write a snapshot of it.
+    """
+    entity_data_file = str(tmp_path / "entity_data.json")
+    resource_file = str(tmp_path / "responses.json")
+    snapshot_file = str(tmp_path / "responses.snapshot")
+    shutil.copy2(TEST_ENTITY_DATA_FILE, entity_data_file)
+    shutil.copy2(TEST_RESPONSES_FILE, resource_file)
+
+    write_snapshot(
+        snapshot_file,
+        entity_data=load_json(entity_data_file),
+        corpus=ResponseCorpus(load_json(resource_file)),
+        stamps=source_stamps(entity_data_file, resource_file),
+    )
+
+    return entity_data_file, resource_file, snapshot_file
+
+
+class TestResponseSnapshot:
+    def test_round_trip(self, tmp_path):
+        entity_data_file, resource_file, snapshot_file = write_test_snapshot(tmp_path)
+        snapshot = read_snapshot(
+            snapshot_file, source_stamps(entity_data_file, resource_file)
+        )
+
+        assert snapshot.entity_data == load_json(TEST_ENTITY_DATA_FILE)
+        assert dict(snapshot.corpus) == load_json(TEST_RESPONSES_FILE)
+
+    def test_responses_prefer_snapshot(self, tmp_path):
+        entity_data_file, resource_file, snapshot_file = write_test_snapshot(tmp_path)
+        rsp_json = Responses(
+            entity_data_file=entity_data_file, resource_file=resource_file
+        )
+        rsp_snapshot = Responses(
+            entity_data_file=entity_data_file,
+            resource_file=resource_file,
+            snapshot_file=snapshot_file,
+        )
+
+        assert rsp_snapshot.get_link("Legion Commander", "Ten hut") == (
+            rsp_json.get_link("Legion Commander", "Ten hut")
+        )
+
+    def test_missing_snapshot(self, tmp_path):
+        assert read_snapshot(str(tmp_path / "missing.snapshot"), []) is None
+
+    def test_stale_snapshot(self, tmp_path):
+        entity_data_file, resource_file, snapshot_file = write_test_snapshot(tmp_path)
+        stat = os.stat(resource_file)
+        os.utime(resource_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        assert (
+            read_snapshot(snapshot_file, source_stamps(entity_data_file, resource_file))
+            is None
+        )
+
+    def test_corrupted_snapshot(self, tmp_path):
+        entity_data_file, resource_file, snapshot_file = write_test_snapshot(tmp_path)
+
+        with open(snapshot_file, "r+b") as snapshot:
+            snapshot.seek(-1, os.SEEK_END)
+            last_byte = snapshot.read(1)
+            snapshot.seek(-1, os.SEEK_END)
+            snapshot.write(bytes([last_byte[0] ^ 0xFF]))
+
+        assert (
+            read_snapshot(snapshot_file, source_stamps(entity_data_file, resource_file))
+            is None
+        )
+
+    def test_load_benchmark(self):
+        report = load_benchmark(
+            entity_data_file=TEST_ENTITY_DATA_FILE,
+            resource_file=TEST_RESPONSES_FILE,
+            n_runs=1,
+        )
+
+        assert report["json_secs"] > 0
+        assert report["snapshot_secs"] > 0
@@ -0,0 +1,40 @@
+"""
+Test the shared, hot-reloadable response store.
+"""
+
+import os
+import shutil
+
+from test_infrastructure.common_case_infra import (
+    TEST_ENTITY_DATA_FILE,
+    TEST_RESPONSES_FILE,
+)
+
+from sili_telegram_bot.models.response_store import ResponseStore
+
+
+def copy_test_data(dest_dir) -> ResponseStore:
+    entity_data_file = os.path.join(dest_dir, "entity_data.json")
+    resource_file = os.path.join(dest_dir, "responses.json")
+    shutil.copy(TEST_ENTITY_DATA_FILE, entity_data_file)
+    shutil.copy(TEST_RESPONSES_FILE, resource_file)
+
+    return ResponseStore(entity_data_file=entity_data_file, resource_file=resource_file)
+
+
+class TestResponseStore:
+    def test_shared_while_unchanged(self, tmp_path):
+        store = copy_test_data(tmp_path)
+
+        assert store.get_responses() is store.get_responses()
+        assert store.get_snapshot().generation == 1
+
+    def test_reload_on_change(self, tmp_path):
+        store = copy_test_data(tmp_path)
+        first_responses = store.get_responses()
+
+        stat = os.stat(store.resource_file)
+        os.utime(store.resource_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        assert store.get_responses() is not first_responses
+        assert store.get_snapshot().generation == 2
@@ -0,0 +1,24 @@
+"""
+Test the persistent usage counts of voicelines.
+"""
+
+from sili_telegram_bot.models.response_usage import ResponseUsage
+
+
+class TestResponseUsage:
+    def test_top(self, tmp_path):
+        usage = ResponseUsage(str(tmp_path / "usage.json"))
+
+        for url in ["a", "b", "b", "c", "c", "c"]:
+            usage.record(url)
+
+        assert usage.top(2) == ["c", "b"]
+        assert usage.top(5) == ["c", "b", "a"]
+
+    def test_persisted(self, tmp_path):
+        usage_path = str(tmp_path / "usage.json")
+        usage = ResponseUsage(usage_path)
+        usage.record("a")
+        usage.save()
+
+        assert ResponseUsage(usage_path).count("a") == 1
@@ -2,6 +2,8 @@
 Test the Response class.
 """
 
+import json
+
 from pytest import raises
 from pytest_cases import parametrize_with_cases
 
@@ -12,7 +14,11 @@ from test_infrastructure.common_case_infra import (
 )
 
 from sili_telegram_bot.models.exceptions import MissingResponseUrlException
-from sili_telegram_bot.models.responses import parse_voiceline_args, Responses
+from sili_telegram_bot.models.responses import (
+    compile_line_pattern,
+    parse_voiceline_args,
+    Responses,
+)
 
 
 class TestFirstVoiceline:
@@ -52,6 +58,53 @@ class TestCrummyWizard:
         assert resp_url is not None
 
 
+class TestGetLink:
+    def write_responses(self, tmp_path, texts: list[str]) -> Responses:
+        entity_data = {
+            "Hero responses": {
+                "Axe": {"name": "Axe", "url": "https://wiki/Axe", "title": "Axe"}
+            }
+        }
+        response_data = {
+            "Axe": [
+                {"text": text, "urls": [f"https://wiki/{i}.mp3"]}
+                for i, text in enumerate(texts)
+            ]
+        }
+        entity_data_file = tmp_path / "entity_data.json"
+        resource_file = tmp_path / "responses.json"
+        entity_data_file.write_text(json.dumps(entity_data))
+        resource_file.write_text(json.dumps(response_data))
+
+        return Responses(entity_data_file=entity_data_file, resource_file=resource_file)
+
+    def test_exact_before_fuzzy(self, tmp_path) -> None:
+        rsp = self.write_responses(tmp_path, ["Axe is all", "Axe is ax!"])
+
+        assert rsp.get_link("Axe", "is ax") == "https://wiki/1.mp3"
+        assert rsp.get_link("Axe", "is al") == "https://wiki/0.mp3"
+        assert rsp.get_link("Axe", "is alx") == "https://wiki/0.mp3"
+
+    def test_pattern_cached(self) -> None:
+        pattern = compile_line_pattern("Crummy wizard", fuzziness=1)
+
+        assert compile_line_pattern("Crummy wizard", fuzziness=1) is pattern
+        assert compile_line_pattern("Crummy wizard") is not pattern
+
+
+class TestEntityCandidates:
+    def test_ranked(self) -> None:
+        rsp = Responses(
+            entity_data_file=TEST_ENTITY_DATA_FILE, resource_file=TEST_RESPONSES_FILE
+        )
+
+        assert rsp.get_entity_candidates("brewmastr")[0] == "Brewmaster"
+        assert rsp.get_entity_candidates("dragon knight", "voice_pack") == [
+            "Davion of Dragon Hold (Dragon Knight)",
+            "Slyrak, the Elder Dragon (Dragon Knight)",
+        ]
+
+
 class TestParseVoicelineArgs:
     @parametrize_with_cases(
         "input,expected",
@@ -0,0 +1,48 @@
+"""
+Test checkpointing scraped response pages.
+"""
+
+from sili_telegram_bot.models.scrape_checkpoint import ScrapeCheckpoint
+
+RESPONSES = [{"text": "Ten hut!", "urls": ["https://wiki/ten_hut.mp3", None]}]
+
+
+class TestScrapeCheckpoint:
+    def test_persistence(self, tmp_path):
+        checkpoint_file = str(tmp_path / "checkpoint.jsonl")
+        ScrapeCheckpoint(checkpoint_file).add("Axe/Responses", 3, RESPONSES)
+        checkpoint = ScrapeCheckpoint(checkpoint_file)
+
+        assert checkpoint.get("Axe/Responses", 3) == RESPONSES
+        # The page changed since it was checkpointed.
+        assert checkpoint.get("Axe/Responses", 4) is None
+        assert checkpoint.get("Axe/Responses", None) is None
+
+    def test_unknown_revision(self, tmp_path):
+        checkpoint = ScrapeCheckpoint(str(tmp_path / "checkpoint.jsonl"))
+        checkpoint.add("Axe/Responses", None, RESPONSES)
+
+        assert len(checkpoint) == 0
+
+    def test_partial_line(self, tmp_path):
+        checkpoint_file = tmp_path / "checkpoint.jsonl"
+        ScrapeCheckpoint(str(checkpoint_file)).add("Axe/Responses", 3, RESPONSES)
+
+        with open(checkpoint_file, "a") as outfile:
+            outfile.write('{"title": "Visage/Resp')
+
+        checkpoint = ScrapeCheckpoint(str(checkpoint_file))
+        checkpoint.add("Visage/Responses", 5, RESPONSES)
+        reloaded = ScrapeCheckpoint(str(checkpoint_file))
+
+        assert len(reloaded) == 2
+        assert reloaded.get("Visage/Responses", 5) == RESPONSES
+
+    def test_clear(self, tmp_path):
+        checkpoint_file = tmp_path / "checkpoint.jsonl"
+        checkpoint = ScrapeCheckpoint(str(checkpoint_file))
+        checkpoint.add("Axe/Responses", 3, RESPONSES)
+        checkpoint.clear()
+
+        assert len(checkpoint) == 0
+        assert not checkpoint_file.exists()
@@ -0,0 +1,85 @@
+"""
+Test running searches off the event loop, within a deadline.
+"""
+
+import asyncio
+import threading
+import time
+
+from pytest import raises
+
+from sili_telegram_bot.models.exceptions import SearchTimeoutException
+from sili_telegram_bot.models.search_executor import SearchExecutor
+
+
+class TestSearchExecutor:
+    def test_result(self):
+        executor = SearchExecutor(kind="thread", max_workers=1, deadline_secs=5)
+
+        assert asyncio.run(executor.run(sum, [1, 2], start=3)) == 6
+
+    def test_unknown_kind(self):
+        with raises(ValueError):
+            SearchExecutor(kind="fiber")
+
+    def test_deadline(self):
+        executor = SearchExecutor(kind="thread", max_workers=1, deadline_secs=0.05)
+        release = threading.Event()
+
+        try:
+            with raises(SearchTimeoutException):
+                asyncio.run(executor.run(release.wait))
+
+        finally:
+            release.set()
+
+    def test_busy_with_abandoned(self):
+        """
+        While every worker is stuck on a timed out search, new searches fail without
+        waiting for the deadline, and succeed again once a worker is free.
+        """
+        executor = SearchExecutor(kind="thread", max_workers=1, deadline_secs=0.05)
+        release = threading.Event()
+        n_calls = []
+
+        try:
+            with raises(SearchTimeoutException):
+                asyncio.run(executor.run(release.wait))
+
+            with raises(SearchTimeoutException):
+                asyncio.run(executor.run(n_calls.append, 1))
+
+        finally:
+            release.set()
+
+        # The worker is only freed once the stuck search has returned.
+        while executor._abandoned:
+            time.sleep(0.01)
+
+        executor.deadline_secs = 5
+
+        assert asyncio.run(executor.run(n_calls.append, 2)) is None
+        assert n_calls == [2]
+
+    def test_cancelled_search_stopped(self):
+        """
+        Cancelling the caller abandons the search, and asks it to stop.
+        """
+        executor = SearchExecutor(kind="thread", max_workers=1, deadline_secs=5)
+        stopped = threading.Event()
+
+        def search(cancel_event: threading.Event) -> None:
+            cancel_event.wait()
+            stopped.set()
+
+        async def cancel_search() -> None:
+            task = asyncio.create_task(executor.run(search, cancellable=True))
+            await asyncio.sleep(0.05)
+            task.cancel()
+
+            with raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(cancel_search())
+
+        assert stopped.wait(5)
@@ -0,0 +1,70 @@
+"""
+Test the trigram index used to narrow down inline search candidates.
+"""
+
+import regex
+
+from pytest_cases import parametrize_with_cases
+
+import test_trigram_index_cases as case_module
+from test_infrastructure.common_case_infra import (
+    TEST_ENTITY_DATA_FILE,
+    TEST_RESPONSES_FILE,
+)
+
+from sili_telegram_bot.models.response_corpus import ResponseRecordTable
+from sili_telegram_bot.models.responses import Responses
+from sili_telegram_bot.models.trigram_index import TrigramIndex, split_query
+
+
+def full_response_keys() -> list[str]:
+    rsp = Responses(
+        entity_data_file=TEST_ENTITY_DATA_FILE, resource_file=TEST_RESPONSES_FILE
+    )
+
+    return ResponseRecordTable(
+        rsp.get_corpus(), rsp.entity_data, type_lookup={}
+    ).full_responses
+
+
+class TestSplitQuery:
+    def test_success(self):
+        assert split_query("abcdefg", 2) == ["abcd", "efg"]
+        assert "".join(split_query("abcdefg", 3)) == "abcdefg"
+
+
+class TestCandidates:
+    @parametrize_with_cases("query", cases=case_module.TestCandidatesCases)
+    def test_no_missed_matches(self, query):
+        """
+        Every string found by a linear fuzzy scan must be among the candidates.
+        """
+        keys = full_response_keys()
+        index = TrigramIndex(keys)
+        pattern = regex.compile(
+            f"(?:{regex.escape(query)}){{e<=1}}", flags=regex.IGNORECASE
+        )
+
+        expected_ids = [i for i, key in enumerate(keys) if regex.search(pattern, key)]
+        candidate_ids = set(index.candidates(query, tolerance=1))
+
+        assert all(expected_id in candidate_ids for expected_id in expected_ids)
+
+    def test_short_queries_narrowed(self):
+        """
+        Queries with pieces shorter than a trigram are still narrowed down.
+        """
+        keys = full_response_keys()
+        index = TrigramIndex(keys)
+
+        for query in ["haste", "pudge", "zzzq"]:
+            assert len(index.candidates(query, tolerance=1)) < len(keys) / 2
+
+    def test_single_char_query(self):
+        """
+        A query that can't be split into enough pieces can't be narrowed down.
+        """
+        index = TrigramIndex(["abc", "xyz"])
+
+        assert list(index.candidates("a", tolerance=1)) == [0, 1]
+        assert list(index.candidates("ab", tolerance=1)) == [0]
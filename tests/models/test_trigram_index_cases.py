@@ -0,0 +1,34 @@
+from pytest_cases import parametrize
+
+import test_infrastructure.common_case_infra as case_infra
+
+
+class TestCandidatesCases:
+    def case_first_voiceline(self):
+        """
+        The first voiceline of the default hero, verbatim.
+        """
+        return case_infra.first_voiceline(
+            case_infra.hero_name_to_tile(case_infra.default_hero())
+        )
+
+    @parametrize(
+        "query",
+        [
+            "Crummy wizard",
+            "crumy wizard",
+            "CRUMMY WIZARDS",
+            "Legion Commander: Ten hut",
+            "As you wer.",
+            "axe",
+            "haste",
+            "pudge",
+            "zzzq",
+            "ha",
+            "a",
+            "(laughs",
+            "zzzzzzzzzz",
+        ],
+    )
+    def case_misc_queries(self, query):
+        return query
@@ -0,0 +1,35 @@
+"""
+Test the persistent cache of Telegram file ids of voicelines.
+"""
+
+from sili_telegram_bot.models.voice_file_cache import VoiceFileCache
+
+
+class TestVoiceFileCache:
+    def test_persisted(self, tmp_path):
+        cache_path = str(tmp_path / "voice_file_ids.json")
+        cache = VoiceFileCache(cache_path)
+        cache.put("https://wiki/a.mp3", "file-a")
+
+        assert VoiceFileCache(cache_path).get("https://wiki/a.mp3") is None
+
+        cache.save()
+
+        assert VoiceFileCache(cache_path).get("https://wiki/a.mp3") == "file-a"
+
+    def test_remove(self, tmp_path):
+        cache_path = str(tmp_path / "voice_file_ids.json")
+        cache = VoiceFileCache(cache_path)
+        cache.put("https://wiki/a.mp3", "file-a")
+        cache.save()
+        cache.remove("https://wiki/a.mp3")
+        cache.save()
+
+        assert cache.get("https://wiki/a.mp3") is None
+        assert len(VoiceFileCache(cache_path)) == 0
+
+    def test_corrupted_file(self, tmp_path):
+        cache_path = tmp_path / "voice_file_ids.json"
+        cache_path.write_text("{")
+
+        assert len(VoiceFileCache(str(cache_path))) == 0
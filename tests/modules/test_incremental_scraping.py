@@ -0,0 +1,78 @@
+"""
+Test scraping response pages against a fake wiki.
+"""
+
+import pytest
+
+from test_infrastructure.fake_wiki import FakeWiki
+
+from sili_telegram_bot.models.scrape_checkpoint import ScrapeCheckpoint
+from sili_telegram_bot.modules import voiceline_scraping
+
+
+class TestUpdateVoicelineUrls:
+    def test_only_changed_pages(self):
+        wiki = FakeWiki({"A/Responses": 1, "B/Responses": 1, "C/Responses": 1})
+        responses, revisions = voiceline_scraping.update_voiceline_urls({}, {}, wiki)
+
+        assert wiki.fetched_titles == [*wiki.revisions]
+
+        wiki.fetched_titles = []
+        wiki.n_requests = 0
+        wiki.revisions = {"A/Responses": 1, "B/Responses": 2, "D/Responses": 1}
+        new_responses, new_revisions = voiceline_scraping.update_voiceline_urls(
+            responses, revisions, wiki
+        )
+
+        assert wiki.fetched_titles == ["B/Responses", "D/Responses"]
+        # Category listing, one batch of revisions, and one request per changed page.
+        assert wiki.n_requests == 1 + 1 + 2
+        assert new_revisions == wiki.revisions
+        assert [*new_responses] == [*wiki.revisions]
+        assert new_responses["A/Responses"] == responses["A/Responses"]
+        assert new_responses["B/Responses"][0]["text"] == "Line of B/Responses 2."
+
+
+class TestExtractResponseUrlsFromTitles:
+    def test_pipelined_same_as_sequential(self):
+        wiki = FakeWiki({f"Page {i}/Responses": i for i in range(5)})
+
+        pipelined = voiceline_scraping.extract_response_urls_from_titles(
+            [*wiki.revisions], wiki, parse_workers=2
+        )
+        sequential = voiceline_scraping.extract_response_urls_from_titles(
+            [*wiki.revisions], wiki, parse_workers=0
+        )
+
+        assert pipelined == sequential
+        assert [*pipelined] == [*wiki.revisions]
+
+
+class TestResumeScrape:
+    def test_resume_after_error(self, tmp_path):
+        class FailingWiki(FakeWiki):
+            def wiki_request(self, params: dict) -> dict:
+                if params.get("page") == "C/Responses" and self.fail:
+                    raise ConnectionError("Wiki went away.")
+
+                return super().wiki_request(params)
+
+        wiki = FailingWiki({"A/Responses": 1, "B/Responses": 1, "C/Responses": 1})
+        wiki.fail = True
+        checkpoint = ScrapeCheckpoint(str(tmp_path / "checkpoint.jsonl"))
+
+        with pytest.raises(ConnectionError):
+            voiceline_scraping.update_voiceline_urls({}, {}, wiki, checkpoint)
+
+        assert len(checkpoint) == 2
+
+        wiki.fail = False
+        wiki.fetched_titles = []
+        wiki.revisions["B/Responses"] = 2
+        responses, _ = voiceline_scraping.update_voiceline_urls(
+            {}, {}, wiki, ScrapeCheckpoint(checkpoint.checkpoint_file)
+        )
+
+        # A is still current, B changed since it was checkpointed.
+        assert wiki.fetched_titles == ["B/Responses", "C/Responses"]
+        assert [*responses] == [*wiki.revisions]
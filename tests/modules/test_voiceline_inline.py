@@ -0,0 +1,402 @@
+"""
+Test the search behind inline voiceline queries.
+"""
+
+import asyncio
+import regex
+import threading
+
+from pytest import fixture, MonkeyPatch, raises
+from types import SimpleNamespace
+from pytest_cases import parametrize
+
+from test_infrastructure.common_case_infra import (
+    TEST_ENTITY_DATA_FILE,
+    TEST_RESPONSES_FILE,
+)
+
+from sili_telegram_bot.models.exceptions import (
+    SearchCancelledException,
+    SearchTimeoutException,
+)
+from sili_telegram_bot.models.inline_query_tracker import InlineQueryTracker
+from sili_telegram_bot.models.response_db import RecordTableView, ResponseDatabase
+from sili_telegram_bot.models.response_store import ResponseStore
+from sili_telegram_bot.models.responses import Responses
+from sili_telegram_bot.modules import voiceline_inline
+
+
+@fixture(scope="module")
+def search_data():
+    """
+    Provide search data built from the test responses. The response store and search
+    data are restored afterwards, so other test modules don't see them.
+    """
+    lazy_dict = voiceline_inline.LazyResponseDict
+
+    with MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(
+            lazy_dict,
+            "_RESPONSE_STORE",
+            ResponseStore(
+                entity_data_file=TEST_ENTITY_DATA_FILE,
+                resource_file=TEST_RESPONSES_FILE,
+            ),
+        )
+        monkeypatch.setattr(lazy_dict, "_SOURCE_SNAPSHOT", lazy_dict._SOURCE_SNAPSHOT)
+        monkeypatch.setattr(lazy_dict, "_SEARCH_DATA", lazy_dict._SEARCH_DATA)
+        lazy_dict.update_full_response_dict()
+
+        yield lazy_dict.get_or_create_search_data()
+
+
+@fixture(scope="module")
+def db_search_data(tmp_path_factory, search_data):
+    """
+    Provide search data read from a response database of the test responses. Depends
+    on search_data, so the generations of both differ. The search data of the test
+    responses is current again afterwards.
+    """
+    lazy_dict = voiceline_inline.LazyResponseDict
+    database_file = str(tmp_path_factory.mktemp("db") / "responses.sqlite")
+    responses = Responses(
+        entity_data_file=TEST_ENTITY_DATA_FILE, resource_file=TEST_RESPONSES_FILE
+    )
+    ResponseDatabase.write(
+        database_file, responses.entity_data, responses.entity_responses
+    )
+
+    with MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(
+            lazy_dict, "_RESPONSE_STORE", ResponseStore(database_file=database_file)
+        )
+        monkeypatch.setattr(lazy_dict, "_SOURCE_SNAPSHOT", lazy_dict._SOURCE_SNAPSHOT)
+        monkeypatch.setattr(lazy_dict, "_SEARCH_DATA", lazy_dict._SEARCH_DATA)
+        lazy_dict.update_full_response_dict()
+        db_search_data = lazy_dict.get_or_create_search_data()
+
+    return db_search_data
+
+
+def all_pages(search_data, query: str, page_size: int) -> list[list]:
+    pages = []
+    offset = ""
+
+    while True:
+        page = voiceline_inline.search_records(search_data, query, offset, page_size)
+        pages.append(page.records)
+        offset = page.next_offset
+
+        if not offset:
+            return pages
+
+
+class TestSearchRecords:
+    @parametrize("query,page_size", [("haste", 7), ("i am", 50)])
+    def test_pages_continue(self, search_data, query, page_size):
+        """
+        Paging through results yields the same records as fetching them at once.
+        """
+        pages = all_pages(search_data, query, page_size)
+        single_page = all_pages(search_data, query, 10000)
+
+        assert len(pages) > 1
+        assert [record for page in pages for record in page] == single_page[0]
+
+    def test_later_pages_from_cache(self, search_data):
+        """
+        Pages after the first are sliced from the cached ranks of all matches.
+        """
+        cache_key = (search_data.generation, "you")
+        first_page = voiceline_inline.search_records(search_data, "you", "", 50)
+
+        assert voiceline_inline.RANKED_MATCH_CACHE.get(cache_key) is None
+
+        voiceline_inline.search_records(search_data, "you", first_page.next_offset, 50)
+        ranks = voiceline_inline.RANKED_MATCH_CACHE.get(cache_key)
+
+        assert ranks is not None
+        assert list(ranks) == sorted(ranks)
+
+    def test_outdated_offset(self, search_data):
+        outdated_offset = f"{search_data.generation - 1}-10"
+        page = voiceline_inline.search_records(search_data, "haste", outdated_offset, 5)
+
+        assert page.records == []
+        assert page.next_offset == ""
+
+
+class TestGetSubstringMatches:
+    def test_same_matches_as_linear_scan(self, search_data):
+        """
+        Ranking changes the order, but not which responses match.
+        """
+        query = "crumy wizard"
+        pattern = regex.compile(
+            f"(?:{regex.escape(query)}){{e<=1}}", flags=regex.IGNORECASE
+        )
+        expected = {
+            key for key in search_data.search_pool.texts if regex.search(pattern, key)
+        }
+
+        match_ids, next_rank = voiceline_inline.get_substring_matches(
+            query, search_data.search_pool, max_n=len(search_data.search_pool)
+        )
+
+        assert next_rank is None
+        assert {search_data.search_pool.texts[i] for i in match_ids} == expected
+
+    @parametrize("query", ["haste", "i am", "the"])
+    def test_pages_same_as_unpaged(self, search_data, query):
+        """
+        Resuming from the rank returned by the previous page yields the same matches
+        as one unpaged search, also for fuzzy matches starting at punctuation.
+        """
+        search_pool = search_data.search_pool
+        unpaged_ids, _ = voiceline_inline.get_substring_matches(
+            query, search_pool, max_n=len(search_pool)
+        )
+        paged_ids = []
+        start_rank = 0
+
+        while start_rank is not None:
+            page_ids, start_rank = voiceline_inline.get_substring_matches(
+                query, search_pool, max_n=50, start_rank=start_rank
+            )
+            paged_ids += page_ids
+
+        assert paged_ids == unpaged_ids
+
+    @parametrize(
+        "candidate,expected_class",
+        [
+            ("Hastr: Fast.", "entity_prefix"),
+            ("Lina: hastr!", "text_prefix"),
+            ("Lina: So, hastr!", "text_word"),
+            ("Lina: Chastr, hastr!", "text_word"),
+            ("Lina: Chastr!", "text_infix"),
+        ],
+    )
+    def test_fuzzy_match_class(self, candidate, expected_class):
+        pattern = regex.compile("(?:haste){e<=1}", flags=regex.IGNORECASE)
+        word_pattern = regex.compile(r"\m(?:haste){e<=1}", flags=regex.IGNORECASE)
+        match_pos = pattern.search(candidate).start()
+        position_class = voiceline_inline.fuzzy_match_class(
+            candidate, match_pos, word_pattern, candidate.index(": ") + 2
+        )
+
+        assert voiceline_inline.MATCH_CLASSES[position_class] == expected_class
+
+    def test_cancelled(self, search_data):
+        cancel_event = threading.Event()
+        cancel_event.set()
+
+        with raises(SearchCancelledException):
+            voiceline_inline.get_substring_matches(
+                "haste", search_data.search_pool, cancel_event=cancel_event
+            )
+
+    def test_exact_before_fuzzy(self, search_data):
+        match_ids, _ = voiceline_inline.get_substring_matches(
+            "haste", search_data.search_pool, max_n=len(search_data.search_pool)
+        )
+        is_exact = [
+            "haste" in search_data.search_pool.texts[i].lower() for i in match_ids
+        ]
+
+        assert is_exact == sorted(is_exact, reverse=True)
+
+    def test_prefix_first(self, search_data):
+        match_ids, _ = voiceline_inline.get_substring_matches(
+            "haste", search_data.search_pool, max_n=1
+        )
+
+        best_match = search_data.search_pool.texts[match_ids[0]]
+
+        assert best_match.split(": ", 1)[1].lower().startswith("haste")
+
+
+class TestEntityQueries:
+    def test_entity_only(self, search_data):
+        page = voiceline_inline.search_records(search_data, "visage", "", 10000)
+
+        assert len(page.records) > 0
+        assert all(record.entity == "Visage" for record in page.records)
+
+    def test_entity_and_text(self, search_data):
+        page = voiceline_inline.search_records(
+            search_data, "visage: crummy wizard", "", 10000
+        )
+
+        assert [record.full_response for record in page.records] == [
+            "Visage: Crummy wizard!"
+        ]
+
+    def test_unknown_entity(self, search_data):
+        """
+        Queries not starting with an entity search all responses.
+        """
+        page = voiceline_inline.search_records(search_data, "crummy wizard", "", 10000)
+
+        assert len({record.entity for record in page.records}) > 1
+
+
+class TestDatabaseSearch:
+    def test_records_not_in_memory(self, db_search_data):
+        assert isinstance(db_search_data.record_table, RecordTableView)
+
+    @parametrize(
+        "query",
+        ["haste", "i am", "crumy wizard", "ax", "a", "zzzq", "visage: crummy", ""],
+    )
+    def test_same_pages_as_in_memory(self, search_data, db_search_data, query):
+        """
+        Narrowing down candidates via the FTS index of the response database yields
+        the same results as the in-memory index.
+        """
+        assert all_pages(db_search_data, query, 200) == all_pages(
+            search_data, query, 200
+        )
+
+    def test_candidates_narrowed(self, db_search_data):
+        search_pool = db_search_data.search_pool
+
+        assert 0 < len(list(search_pool.candidates("crumy wizard"))) < len(search_pool)
+
+
+@fixture
+def blocking_handler(monkeypatch):
+    """
+    Make inline query handling block until cancelled, with a fresh query tracker.
+    """
+
+    async def answer_forever(query, context, task) -> None:
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(voiceline_inline, "answer_inline_vl_query", answer_forever)
+    monkeypatch.setattr(voiceline_inline, "QUERY_TRACKER", InlineQueryTracker())
+
+
+def inline_query_update(user_id: int, query_text: str) -> SimpleNamespace:
+    return SimpleNamespace(
+        inline_query=SimpleNamespace(
+            query=query_text, from_user=SimpleNamespace(id=user_id)
+        )
+    )
+
+
+def start_handling(user_id: int, query_text: str) -> asyncio.Task:
+    context = SimpleNamespace(
+        application=SimpleNamespace(bot_data={"inline_whitelist": [str(user_id)]})
+    )
+
+    return asyncio.create_task(
+        voiceline_inline.handle_inline_vl_query(
+            inline_query_update(user_id, query_text), context
+        )
+    )
+
+
+class TestHandleInlineVlQuery:
+    def test_superseded_query_cancelled(self, blocking_handler):
+        async def test() -> None:
+            first_task = start_handling(1, "haste")
+            await asyncio.sleep(0)
+            second_task = start_handling(1, "hastes")
+            await asyncio.sleep(0)
+
+            # The superseded handler swallows its cancellation.
+            assert await first_task is None
+            assert not first_task.cancelled()
+            assert not second_task.done()
+            assert voiceline_inline.QUERY_TRACKER.superseded_count == 1
+            assert voiceline_inline.QUERY_TRACKER.is_current(1, second_task)
+
+            second_task.cancel()
+
+        asyncio.run(test())
+
+    def test_shutdown_cancellation_raised(self, blocking_handler):
+        async def test() -> None:
+            task = start_handling(1, "haste")
+            await asyncio.sleep(0)
+            task.cancel()
+
+            with raises(asyncio.CancelledError):
+                await task
+
+            assert not voiceline_inline.QUERY_TRACKER.is_current(1, task)
+
+        asyncio.run(test())
+
+
+class FakeInlineQuery:
+    def __init__(self, user_id: int, query_text: str) -> None:
+        self.query = query_text
+        self.offset = ""
+        self.from_user = SimpleNamespace(id=user_id)
+        self.answers = []
+
+    async def answer(self, **kwargs) -> None:
+        self.answers.append(kwargs)
+
+
+class TestAnswerInlineVlQuery:
+    def test_timeout_not_cached(self, search_data, monkeypatch):
+        """
+        Telegram must not hand out the empty answer to a timed out query to anyone.
+        """
+
+        async def search_timeout(*args, **kwargs) -> None:
+            raise SearchTimeoutException("Too slow.")
+
+        monkeypatch.setattr(
+            voiceline_inline, "search_records_in_executor", search_timeout
+        )
+        monkeypatch.setattr(voiceline_inline, "QUERY_TRACKER", InlineQueryTracker())
+        query = FakeInlineQuery(1, "an uncached query")
+
+        async def test() -> None:
+            task = asyncio.current_task()
+            voiceline_inline.QUERY_TRACKER.start(1, task)
+            await voiceline_inline.answer_inline_vl_query(query, None, task)
+
+        asyncio.run(test())
+
+        assert query.answers == [{"results": [], "cache_time": 0, "is_personal": True}]
+
+
+class BlockingResponseStore:
+    """
+    Response store that blocks on getting the response data until released, like
+    the store does while another thread is loading changed data.
+    """
+
+    def __init__(self, response_store) -> None:
+        self.response_store = response_store
+        self.release = threading.Event()
+
+    def get_snapshot(self):
+        self.release.wait()
+
+        return self.response_store.get_snapshot()
+
+
+class TestSearchDataNonblocking:
+    def test_last_data_while_loading(self, search_data, monkeypatch):
+        lazy_dict = voiceline_inline.LazyResponseDict
+        blocking_store = BlockingResponseStore(lazy_dict._RESPONSE_STORE)
+        monkeypatch.setattr(lazy_dict, "_RESPONSE_STORE", blocking_store)
+        monkeypatch.setattr(lazy_dict, "_REFRESH_FUTURE", None)
+
+        async def test() -> None:
+            try:
+                assert await lazy_dict.get_search_data_nonblocking() is search_data
+                assert not lazy_dict._REFRESH_FUTURE.done()
+
+            finally:
+                blocking_store.release.set()
+
+            assert await lazy_dict._REFRESH_FUTURE is search_data
+
+        asyncio.run(test())
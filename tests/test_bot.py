@@ -0,0 +1,142 @@
+"""
+Test sending voicelines, with the fallbacks for when Telegram rejects a way of sending.
+"""
+
+import asyncio
+import httpx
+
+from pytest import fixture, raises
+from telegram import error
+from types import SimpleNamespace
+
+from sili_telegram_bot.models.audio_cache import AudioCache
+from sili_telegram_bot.models.voice_file_cache import VoiceFileCache
+from sili_telegram_bot.modules.config import config
+
+# The bot module needs its secrets when it is imported.
+for secret_name, test_value in [("bot_token", "123:abc"), ("chat_id", "1")]:
+    if not config["secrets"][secret_name]:
+        config["secrets"][secret_name] = test_value
+
+from sili_telegram_bot import bot
+
+VL_LINK = "https://wiki/a.mp3"
+
+
+class FakeBot:
+    """
+    Records the voices sent, and rejects the ways of sending listed in failing: by
+    "file_id", by "url", or as "upload".
+    """
+
+    def __init__(self, failing: set[str]) -> None:
+        self.failing = failing
+        self.sent = []
+
+    async def send_voice(self, chat_id: int, voice) -> SimpleNamespace:
+        if hasattr(voice, "read"):
+            self.sent.append(("upload", voice.read()))
+
+        elif voice.startswith("https://"):
+            self.sent.append(("url", voice))
+
+        else:
+            self.sent.append(("file_id", voice))
+
+        if self.sent[-1][0] in self.failing:
+            raise error.BadRequest(f"Rejected {self.sent[-1][0]}.")
+
+        return SimpleNamespace(voice=SimpleNamespace(file_id=f"id-{len(self.sent)}"))
+
+
+@fixture
+def caches(tmp_path, monkeypatch):
+    """
+    Give the bot an empty file id cache and audio cache, the latter downloading from a
+    fake wiki.
+    """
+    voice_file_cache = VoiceFileCache(str(tmp_path / "voice_file_ids.json"))
+    audio_cache = AudioCache(
+        cache_dir=str(tmp_path / "audio"),
+        max_bytes=1000,
+        revalidate_secs=1000,
+        timeout_secs=1,
+        max_connections=1,
+        chunk_bytes=2,
+        transport=httpx.MockTransport(
+            lambda request: httpx.Response(200, content=b"audio")
+        ),
+    )
+    monkeypatch.setattr(bot, "default_voice_file_cache", voice_file_cache)
+    monkeypatch.setattr(bot, "default_audio_cache", audio_cache)
+    monkeypatch.setitem(bot.VL_CONFIG, "send_mode", "url")
+
+    return voice_file_cache, audio_cache
+
+
+def send_voiceline(fake_bot: FakeBot, audio_cache: AudioCache) -> None:
+    async def send() -> None:
+        try:
+            await bot.send_voiceline(SimpleNamespace(bot=fake_bot), VL_LINK)
+
+        finally:
+            await audio_cache.aclose()
+
+    asyncio.run(send())
+
+
+class TestSendVoiceline:
+    def test_file_id(self, caches):
+        voice_file_cache, audio_cache = caches
+        voice_file_cache.put(VL_LINK, "known-id")
+        fake_bot = FakeBot(failing=set())
+        send_voiceline(fake_bot, audio_cache)
+
+        assert fake_bot.sent == [("file_id", "known-id")]
+
+    def test_stale_file_id_sent_by_url(self, caches):
+        voice_file_cache, audio_cache = caches
+        voice_file_cache.put(VL_LINK, "stale-id")
+        fake_bot = FakeBot(failing={"file_id"})
+        send_voiceline(fake_bot, audio_cache)
+
+        assert fake_bot.sent == [("file_id", "stale-id"), ("url", VL_LINK)]
+        assert voice_file_cache.get(VL_LINK) == "id-2"
+
+    def test_url_rejected_uploaded(self, caches):
+        voice_file_cache, audio_cache = caches
+        voice_file_cache.put(VL_LINK, "stale-id")
+        fake_bot = FakeBot(failing={"file_id", "url"})
+        send_voiceline(fake_bot, audio_cache)
+
+        assert fake_bot.sent == [
+            ("file_id", "stale-id"),
+            ("url", VL_LINK),
+            ("upload", b"audio"),
+        ]
+        assert voice_file_cache.get(VL_LINK) == "id-3"
+        assert audio_cache.cached_file(VL_LINK) is not None
+
+    def test_cached_audio_uploaded(self, caches):
+        """
+        Voicelines in the audio cache are uploaded from there, without trying the URL.
+        """
+        voice_file_cache, audio_cache = caches
+        # Uploading a voiceline puts it into the audio cache.
+        send_voiceline(FakeBot(failing={"url"}), audio_cache)
+        voice_file_cache.remove(VL_LINK)
+        fake_bot = FakeBot(failing=set())
+        send_voiceline(fake_bot, audio_cache)
+
+        assert fake_bot.sent == [("upload", b"audio")]
+        assert voice_file_cache.get(VL_LINK) == "id-1"
+
+    def test_upload_rejected(self, caches):
+        voice_file_cache, audio_cache = caches
+        fake_bot = FakeBot(failing={"url", "upload"})
+
+        with raises(error.BadRequest):
+            send_voiceline(fake_bot, audio_cache)
+
+        assert fake_bot.sent == [("url", VL_LINK), ("upload", b"audio")]
+        assert voice_file_cache.get(VL_LINK) is None
@@ -0,0 +1,54 @@
+"""
+Fake of the `mediawiki.MediaWiki` API object, serving response pages without any
+network access.
+"""
+
+PAGE_HTML = (
+    '<div class="mw-parser-output"><ul><li>'
+    '<span><audio><source src="https://wiki/{title}.mp3"></audio>'
+    '<a class="ext-audiobutton" data-state="play"></a></span>'
+    "Link▶️ Line of {title} {revision}.</li></ul></div>"
+)
+
+
+class FakeWiki:
+    """
+    Serves response pages with the given revision ids, and logs the requests made and
+    the pages fetched.
+    """
+
+    def __init__(self, revisions: dict[str, int]) -> None:
+        self.revisions = revisions
+        self.fetched_titles = []
+        self.n_requests = 0
+
+    def categorymembers(self, category: str, results=None) -> tuple[list, list]:
+        self.n_requests += 1
+
+        return [*self.revisions], []
+
+    def wiki_request(self, params: dict) -> dict:
+        self.n_requests += 1
+
+        if params["action"] == "parse":
+            title = params["page"]
+
+            if title not in self.revisions:
+                return {"error": {"code": "missingtitle"}}
+
+            self.fetched_titles.append(title)
+            html = PAGE_HTML.format(title=title, revision=self.revisions[title])
+
+            return {"parse": {"title": title, "text": html}}
+
+        pages = []
+
+        for title in params["titles"].split("|"):
+            if title in self.revisions:
+                revisions = [{"revid": self.revisions[title]}]
+                pages.append({"title": title, "revisions": revisions})
+
+            else:
+                pages.append({"title": title, "missing": True})
+
+        return {"query": {"pages": pages}}
@@ -0,0 +1,43 @@
+"""
+Benchmark parsing response pages with the streaming parser against the full
+BeautifulSoup tree, in pages per second.
+Run as `PYTHONPATH="tests" python3 tests/test_infrastructure/parse_benchmark.py`
+"""
+
+import time
+
+from test_infrastructure.response_pages import response_pages
+from sili_telegram_bot.modules import voiceline_scraping as vl_scrape
+
+
+def pages_per_sec(extract_func, page_htmls: list[str], n_runs: int = 5) -> float:
+    """
+    Get the pages parsed per second by extract_func, in the fastest of n_runs.
+    """
+    timings = []
+
+    for _ in range(n_runs):
+        start = time.perf_counter()
+
+        for page_html in page_htmls:
+            extract_func(page_html)
+
+        timings.append(time.perf_counter() - start)
+
+    return len(page_htmls) / min(timings)
+
+
+def main() -> None:
+    page_htmls = [*response_pages().values()]
+    n_bytes = sum(len(page_html) for page_html in page_htmls)
+    print(f"{len(page_htmls)} pages, {n_bytes / 2**20:.2f} MiB of html.")
+
+    for name, extract_func in (
+        ("BeautifulSoup", vl_scrape.extract_entity_response_urls_from_soup),
+        ("Streaming", vl_scrape.extract_entity_response_urls),
+    ):
+        print(f"{name + ':':14} {pages_per_sec(extract_func, page_htmls):8.1f} pages/s")
+
+
+if __name__ == "__main__":
+    main()
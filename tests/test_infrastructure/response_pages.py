@@ -0,0 +1,96 @@
+"""
+Response pages in the layout of the wiki, re-created from the test responses, to
+test and benchmark parsing without network access. Responses are spread over bullet
+lists, tabs and tables, with the markup the wiki puts around them.
+"""
+
+import html
+import json
+
+from test_infrastructure.common_case_infra import TEST_RESPONSES_FILE
+
+PLAY_BUTTON = (
+    '<span><audio hidden="" class="ext-audiobutton" preload="metadata" '
+    'data-volume="1"><source src="{url}" type="audio/mpeg"><a href="{url}">Link</a>'
+    '</audio><a class="ext-audiobutton" data-state="play" title="Play/Pause">'
+    "▶️</a></span>"
+)
+MISSING_BUTTON = (
+    '<a class="ext-audiobutton" data-state="error" title="File not found"></a>'
+)
+
+# Markup the selectors have to handle, independent of the test responses.
+QUIRKS_HTML = """
+<ul>
+<li>Infusing Aghanim's Scepter into an ally triggers their "thanks" response.</li>
+<li><span><audio><source src="https://wiki/outer.mp3"></audio>
+<a class="ext-audiobutton" data-state="play"></a></span> Outer &amp; <b>bold</b>
+<ul><li><span><audio><source src="https://wiki/inner.mp3"></audio>
+<a class="ext-audiobutton" data-state="play"></a></span> Inner&nbsp;line<br/></li>
+</ul></li>
+<li><a class="ext-audiobutton" data-state="error"></a> <span><audio>
+<source src="https://wiki/arcana.mp3"></audio><a class="ext-audiobutton"
+data-state="play"></a></span> Unclosed <i>tags <small>here.
+</ul>
+<div><ul><li><span><audio><source src="https://wiki/not_bullet.mp3"></audio>
+<a class="ext-audiobutton" data-state="play"></a></span> Not a bullet.</li></ul></div>
+<table class="wikitable"><tr><td><ul><li><a class="ext-audiobutton"
+data-state="error"></a> rem Table line.<script>ignored()</script></li></ul></td></tr>
+</table>
+"""
+
+
+def response_item(response: dict) -> str:
+    buttons = "".join(
+        MISSING_BUTTON if url is None else PLAY_BUTTON.format(url=html.escape(url))
+        for url in response["urls"]
+    )
+
+    return f"<li>{buttons} {html.escape(response['text'])}</li>\n"
+
+
+def response_page_html(responses: list[dict]) -> str:
+    """
+    Create the html of a response page, with the first half of the responses in
+    bullet lists, then a quarter each in tabs and a table.
+    """
+    half = len(responses) // 2
+    three_quarters = len(responses) * 3 // 4
+    sections = []
+
+    for section_start in range(0, half, 10):
+        section_responses = responses[section_start : min(section_start + 10, half)]
+        sections.append(
+            f'<h2><span class="mw-headline">Section {section_start}</span></h2>\n'
+            f"<ul>\n{''.join(map(response_item, section_responses))}</ul>\n"
+        )
+
+    sections.append(
+        '<div class="tabs-dynamic"><ul class="tabs"><li>Tab</li></ul>'
+        '<div class="tabs-content"><div class="content1"><ul>\n'
+        f"{''.join(map(response_item, responses[half:three_quarters]))}"
+        "</ul></div></div></div>\n"
+    )
+    sections.append(
+        '<table class="wikitable"><tbody><tr><td><ul>\n'
+        f"{''.join(map(response_item, responses[three_quarters:]))}"
+        "</ul></td></tr></tbody></table>\n"
+    )
+
+    return (
+        '<div class="mw-parser-output"><div class="toc"><ul><li>Contents</li></ul>'
+        f"</div>\n{''.join(sections)}{QUIRKS_HTML}</div>"
+    )
+
+
+def response_pages(resource_file: str = TEST_RESPONSES_FILE) -> dict[str, str]:
+    """
+    Get the html of a response page for every page in the test responses.
+    """
+    with open(resource_file, "r") as infile:
+        response_data = json.load(infile)
+
+    return {
+        page_title: response_page_html(responses)
+        for page_title, responses in response_data.items()
+    }